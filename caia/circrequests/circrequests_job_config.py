@@ -1,22 +1,15 @@
 import logging
 import os
 from typing import Dict, List
-import json
 
+from caia.circrequests.denied_keys_store import create_empty_denied_keys_store
+from caia.core.io import write_to_file
 from caia.core.job_config import JobConfig
+from caia.core.last_success import get_last_success
 
 logger = logging.getLogger(__name__)
 
 
-def get_last_success_filepath(last_success_lookup: str) -> str:
-    """
-    Returns the filepath containing the last successful source response
-    """
-    with open(last_success_lookup) as fp:
-        last_success_filepath = fp.readline().strip()
-        return last_success_filepath
-
-
 class CircrequestsJobConfig(JobConfig):
     def __init__(self, config: Dict[str, str], job_id_prefix: str = '', timestamp: str = ""):
         super().__init__(config, job_id_prefix, timestamp)
@@ -28,6 +21,10 @@ class CircrequestsJobConfig(JobConfig):
         diff_result_filepath = self.generate_filepath(storage_dir, "diff_result", "json")
         self['diff_result_filepath'] = diff_result_filepath
 
+        source_response_snapshot_filepath = self.generate_filepath(storage_dir, "source_response_snapshot", "bin",
+                                                                   compressed=False)
+        self['source_response_snapshot_filepath'] = source_response_snapshot_filepath
+
         dest_request_body_filepath = self.generate_filepath(storage_dir, "dest_request_body", "json")
         self['dest_request_body_filepath'] = dest_request_body_filepath
 
@@ -44,17 +41,16 @@ class CircrequestsJobConfig(JobConfig):
             if not os.path.exists(last_success_lookup_filepath):
                 logger.warning(f"last_success_lookup file at '{last_success_lookup_filepath} was not found. "
                                "Creating default.")
-                with open(last_success_lookup_filepath, "w") as fp:
-                    fp.write("etc/circrequests_FIRST.json")
+                write_to_file(last_success_lookup_filepath, "etc/circrequests_FIRST.json")
 
         last_success_lookup = config['last_success_lookup']
-        self["last_success_filepath"] = get_last_success_filepath(last_success_lookup)
-
-        # Generate an empty "denied_keys" file, if it does not exist
+        last_success_filepath, last_success_metadata = get_last_success(last_success_lookup)
+        self["last_success_filepath"] = last_success_filepath
+        self["last_success_snapshot_filepath"] = last_success_metadata.get('snapshot', '')
+        self["last_success_digest"] = last_success_metadata.get('digest', '')
+        self["last_success_etag"] = last_success_metadata.get('etag', '')
+        self["last_success_last_modified"] = last_success_metadata.get('last_modified', '')
+
+        # Generate an empty "denied_keys" store, if it does not exist
         if self['denied_keys_filepath']:
-            denied_keys_filepath = self['denied_keys_filepath']
-            if not os.path.exists(denied_keys_filepath):
-                logger.warning(f"denied_keys_filepath file at '{denied_keys_filepath} was not found. Creating default.")
-                denied_keys: Dict[str, str] = {}
-                with open(denied_keys_filepath, "w") as fp:
-                    json.dump(denied_keys, fp)
+            create_empty_denied_keys_store(self)
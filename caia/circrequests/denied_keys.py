@@ -0,0 +1,85 @@
+import datetime
+from array import array
+from bisect import bisect_left
+from typing import Iterator, List, Mapping, Optional
+
+EPOCH = datetime.datetime(1970, 1, 1)
+ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def to_epoch_microseconds(timestamp: datetime.datetime) -> int:
+    """
+    Returns the given (naive) datetime as a whole number of microseconds since
+    the epoch.
+    """
+    return (timestamp - EPOCH) // ONE_MICROSECOND
+
+
+class DeniedKeys(Mapping[str, str]):
+    """
+    Read-only mapping of denied keys to the (ISO format) timestamp of their
+    last deny, as stored in the "denied keys" file.
+
+    Each timestamp is parsed once, on creation, into microseconds since the
+    epoch. The keys are held ordered by deny timestamp, with the timestamps
+    in a compact array, so that the wait interval check is a comparison
+    against a single cutoff, rather than datetime arithmetic on each key.
+
+    If the deny times (in microseconds since the epoch) are already known
+    (such as when read from a store that records them), they can be
+    provided as "deny_times", and the timestamps are not parsed.
+    """
+    def __init__(self, denied_keys: Mapping[str, str], deny_times: Optional[Mapping[str, int]] = None):
+        self.timestamps = dict(denied_keys)
+
+        if deny_times is None:
+            deny_times = {
+                key: to_epoch_microseconds(datetime.datetime.fromisoformat(timestamp))
+                for key, timestamp in self.timestamps.items()
+            }
+
+        by_age = sorted((deny_times[key], key) for key in self.timestamps)
+        self.keys_by_age: List[str] = [key for epoch_microseconds, key in by_age]
+        self.deny_times = array('q', [epoch_microseconds for epoch_microseconds, key in by_age])
+        self.index = {key: i for i, key in enumerate(self.keys_by_age)}
+
+    def __getitem__(self, key: str) -> str:
+        return self.timestamps[key]
+
+    def __contains__(self, key: object) -> bool:
+        # Checked for every current entry when diffing, so not left to the
+        # (exception-based) Mapping default
+        return key in self.timestamps
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.timestamps)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @staticmethod
+    def cutoff(current_time: datetime.datetime, wait_period_in_seconds: int) -> int:
+        """
+        Returns the deny time (in microseconds since the epoch) before which
+        denied keys are due for resubmission.
+        """
+        return to_epoch_microseconds(current_time) - wait_period_in_seconds * 1_000_000
+
+    def is_due(self, key: str, cutoff: int) -> bool:
+        """
+        Returns True if the given denied key was last denied before the given
+        cutoff, False otherwise.
+        """
+        return self.deny_times[self.index[key]] < cutoff
+
+    def keys_due(self, current_time: datetime.datetime, wait_period_in_seconds: int) -> List[str]:
+        """
+        Returns the List of all denied keys whose elapsed time since their
+        last deny date is greater than the given wait period, oldest first.
+        """
+        count = bisect_left(self.deny_times, self.cutoff(current_time, wait_period_in_seconds))
+        return self.keys_by_age[:count]
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[{len(self)} keys]"
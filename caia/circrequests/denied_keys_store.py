@@ -0,0 +1,334 @@
+import abc
+import contextlib
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from caia.circrequests.denied_keys import DeniedKeys, to_epoch_microseconds
+from caia.core.io import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# The supported values for the "denied_keys_store" configuration setting
+JSON_STORE = 'json'
+SQLITE_STORE = 'sqlite'
+
+# The number of keys looked up in the SQLite store by a single query (kept
+# below the default SQLite limit of 999 parameters per query)
+SQLITE_LOOKUP_CHUNK_SIZE = 500
+
+
+def deny_time(timestamp: str) -> int:
+    """
+    Returns the given ISO format timestamp as microseconds since the epoch
+    """
+    return to_epoch_microseconds(datetime.datetime.fromisoformat(timestamp))
+
+
+class DeniedKeysStore(metaclass=abc.ABCMeta):
+    """
+    Persistent store of denied keys, and the (ISO format) timestamp of their
+    last deny.
+    """
+    @abc.abstractmethod
+    def load(self) -> DeniedKeys:
+        """
+        Returns all the denied keys in the store.
+        """
+        pass
+
+    def load_for_entries(self, entries: Iterable[Dict[str, str]],
+                         key_field: str) -> Tuple[Iterator[Dict[str, str]], Mapping[str, str]]:
+        """
+        Returns a tuple of an iterator over the given entries, and the denied
+        keys (with their timestamps) among the keys of the entries.
+
+        The denied keys may be looked up as the entries are iterated over, so
+        the denied keys of an entry are only available once the entry has
+        been returned by the iterator, and all the denied keys only once the
+        iterator is exhausted. By default, all the denied keys are loaded.
+        """
+        return iter(entries), self.load()
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the timestamp of the last deny of the given key, or None if
+        the key is not in the store.
+        """
+        pass
+
+    @abc.abstractmethod
+    def keys_denied_before(self, cutoff: datetime.datetime) -> List[str]:
+        """
+        Returns the List of keys last denied before the given time, oldest
+        first.
+        """
+        pass
+
+    @abc.abstractmethod
+    def upsert(self, denied_keys: Mapping[str, str]) -> None:
+        """
+        Adds the given denied keys to the store, replacing the timestamps of
+        any keys already in the store.
+        """
+        pass
+
+    @abc.abstractmethod
+    def delete(self, keys: Iterable[str]) -> None:
+        """
+        Removes the given keys (if present) from the store.
+        """
+        pass
+
+    @abc.abstractmethod
+    def replace(self, denied_keys: Mapping[str, str]) -> None:
+        """
+        Replaces the contents of the store with the given denied keys.
+        """
+        pass
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}"
+
+
+class JsonDeniedKeysStore(DeniedKeysStore):
+    """
+    Denied keys store backed by a JSON file containing a single Dictionary of
+    keys to timestamps. Every change (atomically) rewrites the whole file.
+
+    The parsed denied keys are kept in memory, and only parsed again if the
+    file is changed by another process, so that repeated loads (such as by
+    each run of a long-running process) do not re-read the file.
+    """
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.cached_denied_keys: Optional[DeniedKeys] = None
+        self.cached_file_stat: Optional[Tuple[int, int, int]] = None
+        self.lock = threading.Lock()
+
+    def file_stat(self) -> Tuple[int, int, int]:
+        """
+        Returns the inode, size and modification time of the file, which
+        change whenever the file is replaced or modified
+        """
+        file_stat = os.stat(self.filepath)
+        return file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns
+
+    def read(self) -> Dict[str, str]:
+        with open(self.filepath) as fp:
+            return dict(json.load(fp))
+
+    def write(self, denied_keys: Mapping[str, str]) -> None:
+        with self.lock:
+            with atomic_write(self.filepath) as fp:
+                json.dump(dict(denied_keys), fp)
+            self.cached_denied_keys = DeniedKeys(denied_keys)
+            self.cached_file_stat = self.file_stat()
+
+    def load(self) -> DeniedKeys:
+        with self.lock:
+            file_stat = self.file_stat()
+            if self.cached_denied_keys is None or self.cached_file_stat != file_stat:
+                self.cached_denied_keys = DeniedKeys(self.read())
+                self.cached_file_stat = file_stat
+            return self.cached_denied_keys
+
+    def get(self, key: str) -> Optional[str]:
+        return self.load().get(key)
+
+    def keys_denied_before(self, cutoff: datetime.datetime) -> List[str]:
+        return self.load().keys_due(cutoff, 0)
+
+    def upsert(self, denied_keys: Mapping[str, str]) -> None:
+        current = self.read()
+        current.update(denied_keys)
+        self.write(current)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        current = self.read()
+        for key in keys:
+            current.pop(key, None)
+        self.write(current)
+
+    def replace(self, denied_keys: Mapping[str, str]) -> None:
+        self.write(denied_keys)
+
+
+class SqliteDeniedKeysStore(DeniedKeysStore):
+    """
+    Denied keys store backed by a SQLite database, indexed by key and by
+    deny time.
+
+    The denied keys of the entries of a job are looked up by key (see
+    "load_for_entries"), and replacing the contents of the store only writes
+    the keys that were added, changed or removed (in a single transaction),
+    so neither reads every denied key into memory.
+    """
+    SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS denied_keys ("
+        " key TEXT PRIMARY KEY,"
+        " timestamp TEXT NOT NULL,"
+        " deny_time INTEGER NOT NULL"
+        ") WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS denied_keys_deny_time ON denied_keys (deny_time)"
+    ]
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        try:
+            with self.connect() as connection:
+                for statement in self.SCHEMA:
+                    connection.execute(statement)
+        except sqlite3.DatabaseError as ex:
+            # Such as the JSON file of the "json" store
+            raise ValueError(f"Denied keys file '{filepath}' is not a SQLite database: {ex}") from ex
+
+    @contextlib.contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Yields a connection to the database, committing any changes (as a
+        single transaction) if no exception is raised.
+        """
+        connection = sqlite3.connect(self.filepath)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def load(self) -> DeniedKeys:
+        timestamps = {}
+        deny_times = {}
+        with self.connect() as connection:
+            for key, timestamp, key_deny_time in connection.execute(
+                    "SELECT key, timestamp, deny_time FROM denied_keys"):
+                timestamps[key] = timestamp
+                deny_times[key] = key_deny_time
+        return DeniedKeys(timestamps, deny_times)
+
+    def load_for_entries(self, entries: Iterable[Dict[str, str]],
+                         key_field: str) -> Tuple[Iterator[Dict[str, str]], Mapping[str, str]]:
+        denied_keys: Dict[str, str] = {}
+
+        def entries_with_lookups() -> Iterator[Dict[str, str]]:
+            iterator = iter(entries)
+            with self.connect() as connection:
+                while True:
+                    chunk = list(islice(iterator, SQLITE_LOOKUP_CHUNK_SIZE))
+                    if not chunk:
+                        return
+                    keys = [entry[key_field] for entry in chunk]
+                    denied_keys.update(connection.execute(
+                        f"SELECT key, timestamp FROM denied_keys WHERE key IN ({','.join('?' * len(keys))})", keys))
+                    yield from chunk
+
+        return entries_with_lookups(), denied_keys
+
+    def get(self, key: str) -> Optional[str]:
+        with self.connect() as connection:
+            row = connection.execute("SELECT timestamp FROM denied_keys WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def keys_denied_before(self, cutoff: datetime.datetime) -> List[str]:
+        with self.connect() as connection:
+            rows = connection.execute("SELECT key FROM denied_keys WHERE deny_time < ? ORDER BY deny_time, key",
+                                      (to_epoch_microseconds(cutoff),)).fetchall()
+        return [row[0] for row in rows]
+
+    def upsert(self, denied_keys: Mapping[str, str]) -> None:
+        with self.connect() as connection:
+            self._upsert(connection, denied_keys)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        with self.connect() as connection:
+            self._delete(connection, keys)
+
+    def replace(self, denied_keys: Mapping[str, str]) -> None:
+        # The given denied keys are written to a temporary table, so that the
+        # keys to remove, add or change are found by the database (using the
+        # index on the key), rather than by reading every denied key
+        with self.connect() as connection:
+            connection.execute("CREATE TEMP TABLE replacement_keys (key TEXT PRIMARY KEY, timestamp TEXT NOT NULL)")
+            connection.executemany("INSERT INTO replacement_keys (key, timestamp) VALUES (?, ?)",
+                                   denied_keys.items())
+
+            removed_count = connection.execute(
+                "DELETE FROM denied_keys WHERE key NOT IN (SELECT key FROM replacement_keys)").rowcount
+            changed_keys = dict(connection.execute(
+                "SELECT replacement_keys.key, replacement_keys.timestamp FROM replacement_keys"
+                " LEFT JOIN denied_keys ON denied_keys.key = replacement_keys.key"
+                " WHERE denied_keys.timestamp IS NOT replacement_keys.timestamp"))
+            self._upsert(connection, changed_keys)
+
+        logger.debug(f"Denied keys store updated: {len(changed_keys)} added/changed, {removed_count} removed")
+
+    @staticmethod
+    def _upsert(connection: sqlite3.Connection, denied_keys: Mapping[str, str]) -> None:
+        connection.executemany("INSERT OR REPLACE INTO denied_keys (key, timestamp, deny_time) VALUES (?, ?, ?)",
+                               [(key, timestamp, deny_time(timestamp)) for key, timestamp in denied_keys.items()])
+
+    @staticmethod
+    def _delete(connection: sqlite3.Connection, keys: Iterable[str]) -> None:
+        connection.executemany("DELETE FROM denied_keys WHERE key = ?", [(key,) for key in keys])
+
+
+# Process-wide denied keys stores, keyed by their type and absolute filepath
+_denied_keys_stores: Dict[Tuple[str, str], DeniedKeysStore] = {}
+_denied_keys_stores_lock = threading.Lock()
+
+
+def create_denied_keys_store(config: Mapping[str, str]) -> DeniedKeysStore:
+    """
+    Returns the denied keys store for the "denied_keys_filepath" in the given
+    configuration, of the type given by the (optional) "denied_keys_store"
+    setting ("json", the default, or "sqlite").
+
+    Stores are shared by all jobs in the process, so that the denied keys a
+    store keeps in memory are reused. A new store is created if the file no
+    longer exists.
+    """
+    store_type = (config.get('denied_keys_store') or JSON_STORE).lower()
+    filepath = config['denied_keys_filepath']
+    if store_type not in (JSON_STORE, SQLITE_STORE):
+        raise ValueError(f"Unknown denied keys store: '{store_type}'")
+
+    key = (store_type, os.path.abspath(filepath))
+    with _denied_keys_stores_lock:
+        store = _denied_keys_stores.get(key)
+        if store is None or not os.path.exists(filepath):
+            store = JsonDeniedKeysStore(filepath) if store_type == JSON_STORE else SqliteDeniedKeysStore(filepath)
+            _denied_keys_stores[key] = store
+        return store
+
+
+def keys_due_for_resubmission(config: Mapping[str, str], current_time: datetime.datetime) -> List[str]:
+    """
+    Returns the List of keys in the denied keys store for the given
+    configuration that are due for resubmission at the given time (given the
+    "denied_items_wait_interval" setting), oldest first.
+    """
+    denied_items_wait_interval = int(config['denied_items_wait_interval'])
+    cutoff = current_time - datetime.timedelta(seconds=denied_items_wait_interval)
+    return create_denied_keys_store(config).keys_denied_before(cutoff)
+
+
+def create_empty_denied_keys_store(config: Mapping[str, str]) -> None:
+    """
+    Creates an empty denied keys store for the given configuration, if the
+    "denied_keys_filepath" does not exist.
+    """
+    filepath = config['denied_keys_filepath']
+    if os.path.exists(filepath):
+        return
+
+    logger.warning(f"denied_keys_filepath file at '{filepath} was not found. Creating default.")
+    store = create_denied_keys_store(config)
+    if isinstance(store, JsonDeniedKeysStore):
+        store.write({})
@@ -1,19 +1,31 @@
 from __future__ import annotations  # Needed for Python typing on "from_dict" static method
 
-from typing import Dict, List, Set, Union, cast
+from typing import Any, Collection, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union, cast
 import datetime
+import logging
+
+from caia.circrequests.denied_keys import DeniedKeys
+from caia.circrequests.snapshot import fingerprint
+
+logger = logging.getLogger(__name__)
 
 
 class DiffResult:
     """
     Encapsulates the result of diffing two source responses
+
+    The (optional) "current_fingerprints" Dictionary contains the key and
+    fingerprint of every entry in the current source response, for recording
+    in a snapshot. It is not included in the Dictionary representation.
     """
     def __init__(self, new_entries: List[Dict[str, str]], modified_entries: List[Dict[str, str]],
-                 deleted_entries: List[Dict[str, str]], denied_keys_to_persist: Dict[str, str]):
+                 deleted_entries: List[Dict[str, str]], denied_keys_to_persist: Dict[str, str],
+                 current_fingerprints: Optional[Dict[str, int]] = None):
         self.new_entries = new_entries
         self.modified_entries = modified_entries
         self.deleted_entries = deleted_entries
         self.denied_keys_to_persist = denied_keys_to_persist
+        self.current_fingerprints = current_fingerprints
 
     def as_dict(self) -> Dict[str, Union[List[Dict[str, str]], Dict[str, str]]]:
         """
@@ -48,84 +60,176 @@ class DiffResult:
                f"denied_keys_to_persist: {self.denied_keys_to_persist}]"
 
 
-def denied_keys_to_resubmit(possible_keys: Set[str], denied_keys: Dict[str, str],
+def denied_keys_to_resubmit(possible_keys: Iterable[str], denied_keys: Mapping[str, str],
                             current_time: datetime.datetime, wait_period_in_seconds: int) -> List[str]:
     """
     Return a List of keys from the given Dictionary that should be resubmitted
     because the elapsed time since their last deny date is greater than the
     given wait period.
+
+    The deny dates are only parsed if the given denied keys are not already
+    a DeniedKeys instance.
     """
-    result = []
-    for possible_key in possible_keys:
-        last_deny_date_str = denied_keys[possible_key]
-        last_deny_date = datetime.datetime.fromisoformat(last_deny_date_str)
-        time_diff = current_time - last_deny_date
-        if wait_period_in_seconds < time_diff.total_seconds():
-            result.append(possible_key)
+    if not denied_keys:
+        return []
 
-    return result
+    if not isinstance(denied_keys, DeniedKeys):
+        denied_keys = DeniedKeys(denied_keys)
 
+    cutoff = DeniedKeys.cutoff(current_time, wait_period_in_seconds)
+    return [possible_key for possible_key in possible_keys if denied_keys.is_due(possible_key, cutoff)]
 
-def diff(key_field: str, previous: List[Dict[str, str]], current: List[Dict[str, str]],
-         denied_keys: Dict[str, str], current_time: datetime.datetime, denied_items_wait_interval: int) -> DiffResult:
+
+def diff(key_field: str, previous: Iterable[Dict[str, str]], current: Iterable[Dict[str, str]],
+         denied_keys: Mapping[str, str], current_time: datetime.datetime,
+         denied_items_wait_interval: int, with_fingerprints: bool = False) -> DiffResult:
     """
-    Compares Dictionary entries in the lists based on the given key_field,
-    returning a DiffResult of new/modified/deleted entries.
+    Compares Dictionary entries in the given iterables (which may be lists, or
+    iterators incrementally parsed from a source response) based on the given
+    key_field, returning a DiffResult of new/modified/deleted entries.
+
+    Each iterable is consumed exactly once. The current entries are compared
+    directly against the previous entries, so unchanged current entries are
+    not retained. The current entries are only fingerprinted (for recording in
+    a snapshot, see "DiffResult") if "with_fingerprints" is True.
     """
-    previous_as_dict = {entry[key_field]: entry for entry in previous}
-    current_as_dict = {entry[key_field]: entry for entry in current}
-    previous_keys = previous_as_dict.keys()
-    current_keys = current_as_dict.keys()
-
-    # Keys in current only (new)
-    new_keys = list(set(current_keys) - set(previous_keys))
-    new_entries = []
-    for key in new_keys:
-        new_entries.append(current_as_dict[key])
-
-    # Keys in previous only (deleted)
-    deleted_keys = list(set(previous_keys) - set(current_keys))
-    deleted_entries = []
-    for key in deleted_keys:
-        deleted_entries.append(previous_as_dict[key])
-
-    # Keys in both lists (modified?)
-    possibly_modified_keys = list(set(previous_keys) & set(current_keys))
-    modified_entries = []
-    modified_keys = []
-    for key in possibly_modified_keys:
-        list1_value = previous_as_dict[key]
-        list2_value = current_as_dict[key]
-
-        if list1_value != list2_value:
-            modified_entries.append(current_as_dict[key])
-            modified_keys.append(key)
+    previous_entries = {entry[key_field]: entry for entry in previous}
 
-    # Handle denied keys
+    current_keys, current_fingerprints, new_entries, modified_entries, retained_entries = \
+        compare_entries(key_field, previous_entries, current, denied_keys, False, with_fingerprints)
+
+    deleted_entries = [entry for key, entry in previous_entries.items() if key not in current_keys]
+
+    return diff_result_with_denied_keys(current_fingerprints, retained_entries, new_entries, modified_entries,
+                                        deleted_entries, denied_keys, current_time, denied_items_wait_interval)
+
+
+def diff_against_snapshot(key_field: str, previous_fingerprints: Dict[str, int], current: Iterable[Dict[str, str]],
+                          denied_keys: Mapping[str, str], current_time: datetime.datetime,
+                          denied_items_wait_interval: int) -> DiffResult:
+    """
+    Compares the Dictionary entries in the given iterable against the given
+    snapshot of the previous entries (a Dictionary of entry keys to entry
+    fingerprints), based on the given key_field, returning a DiffResult of
+    new/modified/deleted entries.
+
+    As the snapshot does not contain the previous entries, each deleted entry
+    only contains the key_field.
+    """
+    current_fingerprints, new_entries, modified_entries, retained_entries = \
+        compare_fingerprints(key_field, previous_fingerprints, current, denied_keys)
 
-    # Denied keys present in current list
-    denied_keys_list = denied_keys.keys()
-    denied_keys_in_current_set = set(current_keys).intersection(set(denied_keys_list))
+    deleted_entries = [{key_field: key} for key in previous_fingerprints if key not in current_fingerprints]
 
-    # Combine new and modified keys into a single set
-    new_or_modified_keys_set = set(new_keys) | set(modified_keys)
+    return diff_result_with_denied_keys(current_fingerprints, retained_entries, new_entries, modified_entries,
+                                        deleted_entries, denied_keys, current_time, denied_items_wait_interval)
+
+
+def compare_fingerprints(key_field: str, previous_fingerprints: Dict[str, int], current: Iterable[Dict[str, str]],
+                         denied_keys: Mapping[str, str]) -> Tuple[Dict[str, int], Dict[str, Dict[str, str]],
+                                                                  Dict[str, Dict[str, str]], Dict[str, Dict[str, str]]]:
+    """
+    Fingerprints each entry in the given iterable, comparing it against the
+    given fingerprints of the previous entries.
+
+    Returns a tuple of the fingerprints of the current entries, the new
+    entries, the modified entries, and the retained entries (the new and
+    modified entries, plus any entries with a denied key), each keyed by the
+    key_field. Other (unchanged) entries are not retained.
+
+    If a key occurs more than once, the last entry wins.
+    """
+    _, current_fingerprints, new_entries, modified_entries, retained_entries = \
+        compare_entries(key_field, previous_fingerprints, current, denied_keys, True, True)
+    return cast(Dict[str, int], current_fingerprints), new_entries, modified_entries, retained_entries
+
+
+def compare_entries(key_field: str, previous: Mapping[str, Any], current: Iterable[Dict[str, str]],
+                    denied_keys: Mapping[str, str], by_fingerprint: bool, with_fingerprints: bool) -> \
+        Tuple[Collection[str], Optional[Dict[str, int]], Dict[str, Dict[str, str]], Dict[str, Dict[str, str]],
+              Dict[str, Dict[str, str]]]:
+    """
+    Compares each entry in the given iterable against the previous entry with
+    the same key, from the given Dictionary of either the previous entries,
+    or (if "by_fingerprint" is True) their fingerprints. The entries are only
+    fingerprinted if "by_fingerprint" or "with_fingerprints" is True.
+
+    Returns a tuple of the keys of the current entries, followed by the same
+    tuple as "compare_fingerprints" (with None instead of the fingerprints of
+    the current entries, if they were not fingerprinted).
+    """
+    current_keys: Set[str] = set()
+    current_fingerprints: Dict[str, int] = {}
+    new_entries: Dict[str, Dict[str, str]] = {}
+    modified_entries: Dict[str, Dict[str, str]] = {}
+    retained_entries: Dict[str, Dict[str, str]] = {}
+    with_fingerprints = with_fingerprints or by_fingerprint
+
+    for entry in current:
+        key = entry[key_field]
+        previous_entry = previous.get(key)
+        if with_fingerprints:
+            current_fingerprint = fingerprint(entry)
+
+        if key in current_keys:
+            # An earlier entry with the key is retained, unless it is
+            # unchanged from the previous entry
+            if by_fingerprint:
+                differing = current_fingerprints[key] != current_fingerprint
+            else:
+                differing = retained_entries.get(key, previous_entry) != entry
+            if differing:
+                logger.warning(f"Duplicate key '{key}' with differing content, using the last entry")
+            new_entries.pop(key, None)
+            modified_entries.pop(key, None)
+            retained_entries.pop(key, None)
+        current_keys.add(key)
+        if with_fingerprints:
+            current_fingerprints[key] = current_fingerprint
+
+        if previous_entry is None:
+            new_entries[key] = entry
+        elif previous_entry != (current_fingerprint if by_fingerprint else entry):
+            modified_entries[key] = entry
+        elif key not in denied_keys:
+            continue
+        retained_entries[key] = entry
+
+    return current_keys, current_fingerprints if with_fingerprints else None, new_entries, modified_entries, \
+        retained_entries
+
+
+def diff_result_with_denied_keys(current_fingerprints: Optional[Dict[str, int]],
+                                 retained_entries: Dict[str, Dict[str, str]],
+                                 new_entries: Dict[str, Dict[str, str]], modified_entries: Dict[str, Dict[str, str]],
+                                 deleted_entries: List[Dict[str, str]], denied_keys: Mapping[str, str],
+                                 current_time: datetime.datetime, denied_items_wait_interval: int) -> DiffResult:
+    """
+    Returns the DiffResult for the given new/modified/deleted entries, adding
+    any denied keys in the current entries that should be resubmitted to the
+    new entries.
+    """
+    # Handle denied keys
 
-    # Denied keys in current, and not already in "new or modified" set need to be added
-    possible_denied_keys_to_add = denied_keys_in_current_set - new_or_modified_keys_set
+    # Denied keys in current, and not already new or modified, are the only
+    # retained entries not in "new_entries" or "modified_entries"
+    possible_denied_keys_to_add = [key for key in retained_entries
+                                   if key not in new_entries and key not in modified_entries]
 
     denied_keys_to_add = denied_keys_to_resubmit(possible_denied_keys_to_add, denied_keys,
                                                  current_time, denied_items_wait_interval)
 
-    # Generate a list of denied keys that are still in the list, but will not
-    # be resubmitted. These keys (and their associated timestamp) will be
-    # persisted in the "denied_keys" file.
-    denied_keys_to_persist_list = possible_denied_keys_to_add.difference(denied_keys_to_add)
-    denied_keys_to_persist = {}
-    for key in denied_keys_to_persist_list:
-        denied_keys_to_persist[key] = denied_keys[key]
+    # Denied keys that are still in the list, but will not be resubmitted.
+    # These keys (and their associated timestamp) will be persisted in the
+    # "denied_keys" file.
+    resubmitted_keys = set(denied_keys_to_add)
+    denied_keys_to_persist = {key: denied_keys[key] for key in possible_denied_keys_to_add
+                              if key not in resubmitted_keys}
 
+    new_entries_list = list(new_entries.values())
     for key in denied_keys_to_add:
-        new_entries.append(current_as_dict[key])
+        new_entries_list.append(retained_entries[key])
 
-    diff_result = DiffResult(new_entries, modified_entries, deleted_entries, denied_keys_to_persist)
+    diff_result = DiffResult(new_entries_list, list(modified_entries.values()), deleted_entries,
+                             denied_keys_to_persist, current_fingerprints)
     return diff_result
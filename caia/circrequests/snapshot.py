@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import struct
+from itertools import chain
+from typing import Dict, Optional, Tuple
+
+from caia.core.io import SyncGroup, atomic_write
+
+# Identifies (and versions) the snapshot file format, and its fingerprints
+SNAPSHOT_MAGIC = b'CAIASNP2'
+
+# Header: magic, followed by the number of entries. The header is followed by
+# the fingerprint of each entry, and then the UTF-8 encoded keys of the entries
+# (in the same order), separated by KEY_SEPARATOR
+HEADER = struct.Struct(f"<{len(SNAPSHOT_MAGIC)}sI")
+FINGERPRINT_FORMAT = "Q"
+FINGERPRINT_SIZE = struct.calcsize(FINGERPRINT_FORMAT)
+KEY_SEPARATOR = '\x00'
+
+# Separates the keys and values of an entry in its canonical form
+FIELD_SEPARATOR = '\x1f'
+
+# Encodes entries with non-string keys or values in their canonical (sorted
+# keys, compact) JSON form
+CANONICAL_ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def fingerprint(entry: Dict[str, str]) -> int:
+    """
+    Returns a 64-bit hash of the canonical representation of the given
+    entry: its keys and values, sorted by key, separated by the (ASCII unit
+    separator) FIELD_SEPARATOR. An entry with non-string keys or values is
+    represented by its canonical (sorted keys, compact) JSON instead.
+    """
+    try:
+        canonical = FIELD_SEPARATOR.join(chain.from_iterable(sorted(entry.items())))
+    except TypeError:
+        canonical = CANONICAL_ENCODER.encode(entry)
+    digest = hashlib.blake2b(canonical.encode('utf-8'), digest_size=FINGERPRINT_SIZE).digest()
+    return int.from_bytes(digest, 'big')
+
+
+# The filepath, file inode/size/modification time, and fingerprints of the
+# most recently written (or loaded) snapshot, so that in a long-running process
+# each job diffs against the snapshot of the previous job without reading it
+_latest_snapshot: Optional[Tuple[str, Tuple[int, int, int], Dict[str, int]]] = None
+
+
+def snapshot_file_stat(filepath: str) -> Tuple[int, int, int]:
+    file_stat = os.stat(filepath)
+    return file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns
+
+
+def write_snapshot(filepath: str, fingerprints: Dict[str, int], sync_group: Optional[SyncGroup] = None) -> None:
+    """
+    Writes the given Dictionary of entry keys to entry fingerprints to the
+    given file, as a compact binary snapshot, sorted by key. The file is
+    written atomically (see "atomic_write").
+
+    The fingerprints are kept in memory (and so should not be modified) as
+    the latest snapshot.
+    """
+    global _latest_snapshot
+    keys = sorted(fingerprints)
+    keys_str = KEY_SEPARATOR.join(keys)
+    if keys_str.count(KEY_SEPARATOR) != max(len(keys) - 1, 0):
+        raise ValueError(f"Snapshot keys may not contain {KEY_SEPARATOR!r}")
+
+    with atomic_write(filepath, "wb", sync_group) as fp:
+        fp.write(HEADER.pack(SNAPSHOT_MAGIC, len(keys)))
+        fp.write(struct.pack(f"<{len(keys)}{FINGERPRINT_FORMAT}", *[fingerprints[key] for key in keys]))
+        fp.write(keys_str.encode('utf-8'))
+
+    _latest_snapshot = (os.path.abspath(filepath), snapshot_file_stat(filepath), fingerprints)
+
+
+def read_snapshot(filepath: str) -> Dict[str, int]:
+    """
+    Returns the Dictionary of entry keys to entry fingerprints from the given
+    snapshot file.
+    """
+    with open(filepath, "rb") as fp:
+        data = fp.read()
+
+    magic, count = HEADER.unpack_from(data, 0) if len(data) >= HEADER.size else (None, 0)
+    fingerprints_end = HEADER.size + count * FINGERPRINT_SIZE
+    if magic != SNAPSHOT_MAGIC or len(data) < fingerprints_end:
+        raise ValueError(f"'{filepath}' is not a snapshot file (of the current format)")
+
+    entry_fingerprints = struct.unpack_from(f"<{count}{FINGERPRINT_FORMAT}", data, HEADER.size)
+    keys = data[fingerprints_end:].decode('utf-8').split(KEY_SEPARATOR) if count else []
+    if len(keys) != count:
+        raise ValueError(f"'{filepath}' is not a snapshot file (of the current format)")
+
+    return dict(zip(keys, entry_fingerprints))
+
+
+def load_snapshot(filepath: str) -> Dict[str, int]:
+    """
+    Returns the Dictionary of entry keys to entry fingerprints from the given
+    snapshot file (see "read_snapshot").
+
+    If the file is the latest snapshot, and is unchanged, the fingerprints
+    kept in memory are returned (and so should not be modified). Otherwise,
+    the snapshot read from the file becomes the latest snapshot.
+    """
+    global _latest_snapshot
+    file_stat = snapshot_file_stat(filepath)
+    latest_snapshot = _latest_snapshot
+    if latest_snapshot is not None and latest_snapshot[0] == os.path.abspath(filepath) \
+            and latest_snapshot[1] == file_stat:
+        return latest_snapshot[2]
+
+    fingerprints = read_snapshot(filepath)
+    _latest_snapshot = (os.path.abspath(filepath), file_stat, fingerprints)
+    return fingerprints
@@ -0,0 +1,51 @@
+import datetime
+import logging
+from typing import List
+
+from caia.circrequests.circrequests_job_config import CircrequestsJobConfig
+from caia.circrequests.denied_keys_store import keys_due_for_resubmission
+from caia.core.http import ResponseFile
+from caia.core.step import Step, StepResult
+
+logger = logging.getLogger(__name__)
+
+
+class CheckSourceUnchanged(Step):
+    """
+    Checks whether the source response is byte-identical to the last
+    successful source response, by comparing their digests.
+
+    The result is True if the source response is unchanged, and no denied
+    keys are due for resubmission, so that the job has nothing to do. The
+    check is skipped (with a result of False) if "skip_unchanged_source" is
+    "false".
+    """
+    def __init__(self, job_config: CircrequestsJobConfig, source_response: ResponseFile,
+                 current_time: datetime.datetime):
+        self.job_config = job_config
+        self.source_response = source_response
+        self.current_time = current_time
+        self.errors: List[str] = []
+
+    def execute(self) -> StepResult:
+        if (self.job_config.get('skip_unchanged_source') or 'true').lower() == 'false':
+            return StepResult(True, False)
+
+        last_success_digest = self.job_config.get('last_success_digest', '')
+        if not last_success_digest or last_success_digest != self.source_response.digest:
+            return StepResult(True, False)
+
+        # Denied keys are resubmitted by the diff, so any denied keys due for
+        # resubmission require a diff, even if the source is unchanged
+        due_denied_keys = keys_due_for_resubmission(self.job_config, self.current_time)
+        if due_denied_keys:
+            logger.info(f"Source response is unchanged, but {len(due_denied_keys)} denied key(s) are due "
+                        "for resubmission.")
+            return StepResult(True, False)
+
+        logger.info(f"Source response is unchanged since the last success (digest: {last_success_digest})")
+        return StepResult(True, True)
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}"
@@ -65,7 +65,7 @@ class CreateDestRequest(Step):
         return json_str
 
     def execute(self) -> StepResult:
-        source_key_field = self.job_config.application_config['circrequests']['source_key_field']
+        source_key_field = self.job_config.application_config.circrequests_source_key_field
 
         request_body = self.dest_post_request_body(self.diff_result, source_key_field)
         step_result = StepResult(True, request_body)
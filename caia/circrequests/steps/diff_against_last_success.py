@@ -1,10 +1,14 @@
 import datetime
-import json
 import logging
-from typing import Any, Dict, List, cast
+import os
+from typing import Dict, Iterator, List, TextIO
 
 from caia.circrequests.circrequests_job_config import CircrequestsJobConfig
-from caia.circrequests.diff import diff
+from caia.circrequests.denied_keys_store import create_denied_keys_store
+from caia.circrequests.diff import diff, diff_against_snapshot
+from caia.circrequests.snapshot import load_snapshot
+from caia.core.io import open_artifact
+from caia.core.json_stream import iter_json_array
 from caia.core.step import Step, StepResult
 
 logger = logging.getLogger(__name__)
@@ -21,44 +25,61 @@ class DiffAgainstLastSuccess(Step):
         self.errors: List[str] = []
 
     @staticmethod
-    def parse_source_response(response: Dict[Any, Any]) -> List[Dict[str, str]]:
+    def parse_source_response(fp: TextIO) -> Iterator[Dict[str, str]]:
         """
-        Parses a source response for diffing
+        Incrementally parses a source response file for diffing, yielding
+        the entries in its "holds" array one at a time
         """
-        if 'holds' in response:
-            # the "cast" is for Python type hinting
-            return cast(List[Dict[str, str]], response['holds'])
-        return []
+        return iter_json_array(fp, 'holds')
 
     def execute(self) -> StepResult:
         last_success_filepath = self.job_config['last_success_filepath']
         logger.info(f"Diffing against: {last_success_filepath}")
 
-        # Retrieve source response from last success
-        with open(last_success_filepath) as fp:
-            last_success_response = json.load(fp)
-            last_success = self.parse_source_response(last_success_response)
+        denied_keys_store = create_denied_keys_store(self.job_config)
+        key_field = self.job_config.application_config.circrequests_source_key_field
 
-        # Retrieve source response from current load
+        # Generate the diff result
+        denied_items_wait_interval = int(self.job_config['denied_items_wait_interval'])
         source_response_body_filepath = self.job_config['source_response_body_filepath']
-        with open(source_response_body_filepath) as fp:
-            source_response = json.load(fp)
-            current = self.parse_source_response(source_response)
+        last_success_snapshot_filepath = self.job_config.get('last_success_snapshot_filepath', '')
 
-        # Retrieve the list of denied keys
-        denied_keys_filepath = self.job_config['denied_keys_filepath']
-        with open(denied_keys_filepath) as fp:
-            denied_keys = json.load(fp)
+        # The current entries are fingerprinted whenever a snapshot of them
+        # is to be recorded (even without a snapshot of the last success,
+        # such as for the first job), so that the next job can use it
+        with_fingerprints = bool(self.job_config.get('source_response_snapshot_filepath'))
 
-        if len(denied_keys):
-            logger.debug(f"{len(denied_keys)} found.")
+        last_success_fingerprints = None
+        if last_success_snapshot_filepath and os.path.exists(last_success_snapshot_filepath):
+            try:
+                last_success_fingerprints = load_snapshot(last_success_snapshot_filepath)
+            except ValueError as ex:
+                # Such as a snapshot written in an earlier format
+                logger.warning(f"Not using snapshot: {ex}")
 
-        key_field = self.job_config.application_config['circrequests']['source_key_field']
+        if last_success_fingerprints is not None:
+            # Diff against the snapshot of the last success, streaming the
+            # entries from the current load
+            logger.info(f"Using snapshot: {last_success_snapshot_filepath}")
+            with open_artifact(source_response_body_filepath) as source_fp:
+                current, denied_keys = denied_keys_store.load_for_entries(self.parse_source_response(source_fp),
+                                                                          key_field)
+                diff_result = diff_against_snapshot(key_field, last_success_fingerprints, current, denied_keys,
+                                                    self.current_time, denied_items_wait_interval)
+        else:
+            # Stream the entries from the source response of the last success,
+            # and from the current load, into the diff
+            with open_artifact(last_success_filepath) as last_success_fp, \
+                    open_artifact(source_response_body_filepath) as source_fp:
+                last_success = self.parse_source_response(last_success_fp)
+                current, denied_keys = denied_keys_store.load_for_entries(self.parse_source_response(source_fp),
+                                                                          key_field)
+                diff_result = diff(key_field, last_success, current, denied_keys, self.current_time,
+                                   denied_items_wait_interval, with_fingerprints)
 
-        # Generate the diff result
-        denied_items_wait_interval = int(self.job_config['denied_items_wait_interval'])
-        diff_result = diff(key_field, last_success, current, denied_keys,
-                           self.current_time, denied_items_wait_interval)
+        # The denied keys among the current entries (looked up while diffing)
+        if len(denied_keys):
+            logger.debug(f"{len(denied_keys)} found.")
 
         step_result = StepResult(True, diff_result)
         return step_result
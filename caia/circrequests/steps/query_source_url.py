@@ -1,8 +1,9 @@
 import logging
+import os
 from typing import List
 
 from caia.circrequests.circrequests_job_config import CircrequestsJobConfig
-from caia.core.http import http_get_request
+from caia.core.http import conditional_request_headers, http_get_request
 from caia.core.step import Step, StepResult
 
 logger = logging.getLogger(__name__)
@@ -11,16 +12,44 @@ logger = logging.getLogger(__name__)
 class QuerySourceUrl(Step):
     """
     Queries the source url and stores a successful response.
+
+    If "stream_to_file" is True, the response body is streamed directly to
+    the "source_response_body_filepath" file, and the step result is a
+    ResponseFile, instead of the response body.
+
+    If "conditional" is True, the request is conditional on the validators
+    (ETag and Last-Modified) of the last successful source response, if any,
+    so that an unchanged source response is a "304 Not Modified" response,
+    without a body (and no response body file is kept).
     """
-    def __init__(self, job_config: CircrequestsJobConfig):
+    def __init__(self, job_config: CircrequestsJobConfig, stream_to_file: bool = False, conditional: bool = False):
         self.job_config = job_config
+        self.stream_to_file = stream_to_file
+        self.conditional = conditional
         self.errors: List[str] = []
 
     def execute(self) -> StepResult:
         source_url = self.job_config['source_url']
         headers = {'Content-Type': 'application/json'}
+        if self.conditional:
+            headers.update(conditional_request_headers(self.job_config.get('last_success_etag', ''),
+                                                       self.job_config.get('last_success_last_modified', '')))
+
+        output_filepath = None
+        if self.stream_to_file:
+            output_filepath = self.job_config['source_response_body_filepath']
+
+        step_result = http_get_request(source_url, headers, None, self.job_config.http_session_manager,
+                                       self.job_config.retry_policy('source'), self.job_config.retry_budget,
+                                       output_filepath, self.job_config.artifact_writer.open_for_write)
+
+        if output_filepath is not None:
+            if step_result.was_successful() and step_result.get_result().was_not_modified():
+                os.remove(output_filepath)
+            else:
+                self.job_config.artifact_writer.add_file(output_filepath)
 
-        return http_get_request(source_url, headers)
+        return step_result
 
     def __str__(self) -> str:
         fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
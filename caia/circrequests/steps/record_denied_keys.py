@@ -4,6 +4,7 @@ import logging
 from typing import cast, Dict, List
 
 from caia.circrequests.circrequests_job_config import CircrequestsJobConfig
+from caia.circrequests.denied_keys_store import create_denied_keys_store
 from caia.core.step import Step, StepResult
 from caia.circrequests.diff import DiffResult
 
@@ -42,9 +43,7 @@ class RecordDeniedKeys(Step):
             denied_keys_to_persist[denied_key] = self.current_time.isoformat()
 
         # Always write out denied keys, even if there are none
-        denied_keys_filepath = self.job_config['denied_keys_filepath']
-        with open(denied_keys_filepath, "w") as fp:
-            json.dump(denied_keys_to_persist, fp)
+        create_denied_keys_store(self.job_config).replace(denied_keys_to_persist)
 
         step_result = StepResult(True, denied_keys_to_persist)
         return step_result
@@ -1,8 +1,11 @@
 import logging
 
-from typing import List
+from typing import Collection, Dict, List, Optional
 
 from caia.circrequests.circrequests_job_config import CircrequestsJobConfig
+from caia.circrequests.snapshot import write_snapshot
+from caia.core.http import ResponseFile, response_validators
+from caia.core.last_success import record_last_success
 from caia.core.step import Step, StepResult
 
 logger = logging.getLogger(__name__)
@@ -11,20 +14,69 @@ logger = logging.getLogger(__name__)
 class UpdateLastSuccess(Step):
     """
     Records the filepath of the last successful source response.
+
+    If "current_fingerprints" (the key and fingerprint of every entry in the
+    source response) is provided, a compact snapshot of the source response
+    is also written, and recorded along with the filepath.
+
+    If the (streamed) "source_response" is provided, its digest and
+    validators (ETag and Last-Modified) are also recorded.
+
+    The "unsent_keys" are the keys of entries that were not accepted by the
+    destination (such as when a batch of the request failed). They are left
+    out of the snapshot, and the digest and validators are not recorded, so
+    that the next job sends those entries again. Without "current_fingerprints"
+    there is no snapshot to leave them out of, so the last success is not
+    updated at all (and the next job sends every entry again, other than
+    those recorded as denied).
     """
-    def __init__(self, job_config: CircrequestsJobConfig):
+    def __init__(self, job_config: CircrequestsJobConfig, current_fingerprints: Optional[Dict[str, int]] = None,
+                 source_response: Optional[ResponseFile] = None, unsent_keys: Collection[str] = ()):
         self.job_config = job_config
+        self.current_fingerprints = current_fingerprints
+        self.source_response = source_response
+        self.unsent_keys = unsent_keys
         self.errors: List[str] = []
 
     def execute(self) -> StepResult:
+        if self.current_fingerprints is None and self.unsent_keys:
+            logger.warning(f"{len(self.unsent_keys)} unsent key(s), and no snapshot to leave them out of, so the "
+                           "last success is not updated")
+            return StepResult(True, None)
+
         last_success_lookup = self.job_config['last_success_lookup']
 
         storage_dir = self.job_config['storage_dir']
         last_success_filepath = self.job_config.generate_filepath(storage_dir, "source_response_body", "json")
         self.job_config['last_success_filepath'] = last_success_filepath
-        with open(last_success_lookup, "w") as fp:
-            last_success = self.job_config['last_success_filepath']
-            fp.write(last_success)
+
+        fingerprints = self.current_fingerprints
+        if fingerprints is not None and self.unsent_keys:
+            logger.info(f"{len(self.unsent_keys)} unsent key(s) will be sent by the next job")
+            unsent_keys = set(self.unsent_keys)
+            fingerprints = {key: value for key, value in fingerprints.items() if key not in unsent_keys}
+
+        snapshot_filepath = ''
+        if fingerprints is not None:
+            snapshot_filepath = self.job_config['source_response_snapshot_filepath']
+            write_snapshot(snapshot_filepath, fingerprints, self.job_config.sync_group)
+            self.job_config.artifact_writer.add_file(snapshot_filepath)
+        self.job_config['last_success_snapshot_filepath'] = snapshot_filepath
+
+        digest = ''
+        validators = {'etag': '', 'last_modified': ''}
+        if self.source_response is not None and not self.unsent_keys:
+            digest = self.source_response.digest
+            validators = response_validators(self.source_response.headers)
+        self.job_config['last_success_digest'] = digest
+        self.job_config['last_success_etag'] = validators['etag']
+        self.job_config['last_success_last_modified'] = validators['last_modified']
+
+        # The artifacts of the job (including the snapshot) are flushed to
+        # disk before the last success that refers to them is recorded
+        self.job_config.sync_group.commit()
+        record_last_success(last_success_lookup, last_success_filepath,
+                            {'snapshot': snapshot_filepath, 'digest': digest, **validators})
 
         logger.info(f"Last success filepath updated to {last_success_filepath}")
         step_result = StepResult(True, None)
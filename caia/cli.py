@@ -7,13 +7,12 @@ import logging.config
 import os
 import sys
 from datetime import datetime
-from importlib import import_module
-from pkgutil import iter_modules
 from typing import Dict, Any
 
 from dotenv import load_dotenv
 
-from caia import commands, version
+from caia import version
+from caia.commands import COMMANDS
 from caia.logging import DEFAULT_LOGGING_OPTIONS
 
 load_dotenv()
@@ -51,13 +50,10 @@ def main() -> None:
 
     subparsers = parser.add_subparsers(title='commands')
 
-    # load all defined subcommands from the caia.commands package
-    command_modules = {}
-    for finder, name, ispkg in iter_modules(commands.__path__):  # type: ignore[attr-defined]
-        module = import_module(commands.__name__ + '.' + name)
-        if hasattr(module, 'configure_cli'):
-            module.configure_cli(subparsers)  # type: ignore[attr-defined]
-            command_modules[name] = module
+    # configure the subcommands declared in the caia.commands package
+    # The command modules are not imported until a command is selected
+    for command_spec in COMMANDS.values():
+        command_spec.configure_cli(subparsers)
 
     # parse command line args
     args = parser.parse_args()
@@ -93,7 +89,7 @@ def main() -> None:
     logging.config.dictConfig(logging_options)
 
     # get the selected subcommand
-    command = command_modules[args.cmd_name].Command()  # type: ignore[attr-defined]
+    command = COMMANDS[args.cmd_name].create_command()
 
     logger.info(f"Starting {args.cmd_name} at {now} with args: {args}")
 
@@ -0,0 +1,51 @@
+from importlib import import_module
+from typing import Dict
+
+from caia.core.command import Command
+
+
+class CommandSpec:
+    """
+    Declares a CLI command (its name and description), and the module
+    implementing it, so that the CLI can be configured without importing the
+    implementations of the commands (and their dependencies).
+    """
+    def __init__(self, name: str, description: str, module_name: str):
+        self.name = name
+        self.description = description
+        self.module_name = module_name
+
+    def configure_cli(self, subparsers) -> None:  # type: ignore
+        """
+        Configures the CLI arguments for this command
+        """
+        parser = subparsers.add_parser(
+            name=self.name,
+            description=self.description
+        )
+        parser.set_defaults(cmd_name=self.name)
+
+    def create_command(self) -> Command:
+        """
+        Imports the module implementing this command, and returns a new
+        instance of its Command
+        """
+        module = import_module(self.module_name)
+        command: Command = module.Command()
+        return command
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[name: {self.name}, module_name: {self.module_name}]"
+
+
+# The commands available from the CLI, by name
+COMMANDS: Dict[str, CommandSpec] = {
+    spec.name: spec for spec in [
+        CommandSpec('circrequests', 'Retrieve hold requests from Aleph and send to CaiaSoft',
+                    'caia.commands.circrequests'),
+        CommandSpec('items', 'Retrieve new/updated items from Aleph and send to CaiaSoft', 'caia.commands.items'),
+        CommandSpec('serve', 'Run the commands on a schedule, in a single long-running process',
+                    'caia.commands.serve'),
+    ]
+}
@@ -3,9 +3,13 @@ import datetime
 import json
 import logging
 import os
+from typing import Optional, Set, cast
 
 import caia.core.command
 from caia.circrequests.circrequests_job_config import CircrequestsJobConfig
+from caia.circrequests.denied_keys_store import keys_due_for_resubmission
+from caia.circrequests.diff import DiffResult
+from caia.circrequests.steps.check_source_unchanged import CheckSourceUnchanged
 from caia.circrequests.steps.create_dest_request import CreateDestRequest
 from caia.circrequests.steps.diff_against_last_success import DiffAgainstLastSuccess
 from caia.circrequests.steps.query_source_url import QuerySourceUrl
@@ -13,24 +17,16 @@ from caia.circrequests.steps.record_denied_keys import RecordDeniedKeys
 from caia.circrequests.steps.send_to_dest import SendToDest
 from caia.circrequests.steps.update_last_success import UpdateLastSuccess
 from caia.circrequests.steps.validate_job_preconditions import ValidateJobPreconditions
+from caia.core.batching import AcceptedBatches, batch_config_from_env, write_request_batches
 from caia.core.command import CommandResult
-from caia.core.io import write_to_file
-from caia.core.step import run_step
+from caia.core.http import http_config_from_env
+from caia.core.io import read_artifact, storage_config_from_env
+from caia.core.pipeline import Pipeline
+from caia.core.step import StepResult
 
 logger = logging.getLogger(__name__)
 
 
-def configure_cli(subparsers) -> None:  # type: ignore
-    """
-    Configures the CLI arguments for this command
-    """
-    parser = subparsers.add_parser(
-        name='circrequests',
-        description='Retrieve hold requests from Aleph and send to CaiaSoft'
-    )
-    parser.set_defaults(cmd_name='circrequests')
-
-
 def create_job_configuration(start_time: str) -> CircrequestsJobConfig:
     """
     Creates the new job configuration
@@ -43,8 +39,13 @@ def create_job_configuration(start_time: str) -> CircrequestsJobConfig:
         'storage_dir': os.getenv('CIRCREQUESTS_STORAGE_DIR', default=""),
         'last_success_lookup': os.getenv('CIRCREQUESTS_LAST_SUCCESS_LOOKUP', default=""),
         'denied_keys_filepath': os.getenv('CIRCREQUESTS_DENIED_KEYS', default=""),
+        'denied_keys_store': os.getenv('CIRCREQUESTS_DENIED_KEYS_STORE', default="json"),
+        'skip_unchanged_source': os.getenv('CIRCREQUESTS_SKIP_UNCHANGED_SOURCE', default="true"),
         'denied_items_wait_interval':
-            os.getenv('CIRCREQUESTS_DENIED_ITEMS_WAIT_INTERVAL', default="604800")  # Default: 7 days
+            os.getenv('CIRCREQUESTS_DENIED_ITEMS_WAIT_INTERVAL', default="604800"),  # Default: 7 days
+        **http_config_from_env(),
+        **batch_config_from_env(),
+        **storage_config_from_env()
     }
 
     job_id_prefix = "caia.circrequests"
@@ -56,62 +57,151 @@ def create_job_configuration(start_time: str) -> CircrequestsJobConfig:
     return job_config
 
 
-class Command(caia.core.command.Command):
-    def __call__(self, start_time: str, args: argparse.Namespace) -> caia.core.command.CommandResult:
-        # Create job configuration
-        job_config = create_job_configuration(start_time)
+def has_changes(diff_result: DiffResult) -> bool:
+    """
+    Returns True if the given diff result has new or modified entries to send
+    to CaiaSoft, False otherwise
+    """
+    if (len(diff_result.new_entries) == 0) and (len(diff_result.modified_entries) == 0):
+        logger.info("No new or modified entries found, no CaiaSoft update required.")
+        return False
+    return True
 
-        # Validate preconditions
-        step_result = run_step(ValidateJobPreconditions(job_config))
-        if not step_result.was_successful():
-            return CommandResult(step_result.was_successful(), step_result.get_errors())
 
-        # Query source URL
-        step_result = run_step(QuerySourceUrl(job_config))
-        write_to_file(job_config["source_response_body_filepath"], step_result.result)
-        if not step_result.was_successful():
-            return CommandResult(step_result.was_successful(), step_result.get_errors())
+def accepted_response_body(send_result: Optional[StepResult]) -> Optional[str]:
+    """
+    Returns the response body of the requests accepted by CaiaSoft, given
+    the StepResult of the "send_to_dest" step, or None if the step was
+    skipped, or no requests were accepted.
 
-        # Diff against last success
-        current_time = datetime.datetime.strptime(start_time, '%Y%m%d%H%M%S')
-        step_result = run_step(DiffAgainstLastSuccess(job_config, current_time))
-        if not step_result.was_successful():
-            return CommandResult(step_result.was_successful(), step_result.get_errors())
+    If a batch of the request failed, the response body is the aggregate of
+    the responses to the batches that were accepted.
+    """
+    if send_result is None:
+        return None
+    if send_result.was_successful():
+        return str(send_result.get_result())
+    accepted_batches: AcceptedBatches = send_result.get_result()
+    return accepted_batches.response_body
 
-        diff_result = step_result.get_result()
 
-        # Write diff result to a file
-        write_to_file(job_config['diff_result_filepath'], json.dumps(diff_result.as_dict()))
+def unsent_keys(job_config: CircrequestsJobConfig, diff_result: DiffResult,
+                send_result: Optional[StepResult]) -> Set[str]:
+    """
+    Returns the keys of the new and modified entries in the given diff
+    result that were not accepted by CaiaSoft (because a batch of the request
+    failed), given the StepResult of the "send_to_dest" step.
+    """
+    if send_result is None or send_result.was_successful():
+        return set()
 
-        if (len(diff_result.new_entries) == 0) and (len(diff_result.modified_entries) == 0):
-            logger.info("No new or modified entries found, no CaiaSoft update required.")
-            # No new entries, so nothing to send to CaiaSoft
-            # Record job as successful
-            step_result = run_step(UpdateLastSuccess(job_config))
-            return CommandResult(step_result.was_successful(), step_result.get_errors())
+    key_field = job_config.application_config.circrequests_source_key_field
 
-        # Create POST body
-        step_result = run_step(CreateDestRequest(job_config, diff_result))
-        if not step_result.was_successful():
-            return CommandResult(step_result.was_successful(), step_result.get_errors())
+    accepted_keys: Set[str] = set()
+    accepted_batches: AcceptedBatches = send_result.get_result()
+    for request_body_filepath in accepted_batches.request_body_filepaths:
+        request_body = json.loads(read_artifact(request_body_filepath))
+        accepted_keys.update(request['barcode'] for request in request_body['requests'])
 
-        # Write POST request body to file
-        write_to_file(job_config['dest_request_body_filepath'], step_result.get_result())
+    entries = diff_result.new_entries + diff_result.modified_entries
+    return {entry[key_field] for entry in entries if entry[key_field] not in accepted_keys}
 
-        # Send POST data to destination
-        step_result = run_step(SendToDest(job_config))
 
-        if not step_result.was_successful():
-            return CommandResult(step_result.was_successful(), step_result.get_errors())
+def create_pipeline(job_config: CircrequestsJobConfig, current_time: datetime.datetime) -> Pipeline:
+    """
+    Returns the pipeline of steps for the given job configuration
+    """
+    pipeline = Pipeline(job_config.artifact_writer)
+
+    # Validate preconditions
+    pipeline.add('validate_job_preconditions', lambda results: ValidateJobPreconditions(job_config))
+
+    # Query source URL
+    # The response body is streamed to the "source_response_body_filepath"
+    # The query is only conditional on the last success if no denied keys
+    # are due for resubmission, as those need a diff even if the source
+    # response has not changed
+    pipeline.add('query_source_url',
+                 lambda results: QuerySourceUrl(job_config, stream_to_file=True,
+                                                conditional=not keys_due_for_resubmission(job_config, current_time)),
+                 depends_on=['validate_job_preconditions'],
+                 stop_if=lambda source_response: source_response.was_not_modified())
+
+    # Skip the job if the source response is identical to the last success
+    pipeline.add('check_source_unchanged',
+                 lambda results: CheckSourceUnchanged(job_config, results['query_source_url'], current_time),
+                 depends_on=['query_source_url'],
+                 stop_if=bool)
+
+    # Diff against last success, writing the diff result to a file
+    pipeline.add('diff_against_last_success',
+                 lambda results: DiffAgainstLastSuccess(job_config, current_time),
+                 depends_on=['check_source_unchanged'],
+                 artifact=(job_config['diff_result_filepath'], lambda diff_result: json.dumps(diff_result.as_dict())))
+
+    # Create POST body, if there are new or modified entries
+    pipeline.add('create_dest_request',
+                 lambda results: CreateDestRequest(job_config, results['diff_against_last_success']),
+                 depends_on=['diff_against_last_success'],
+                 when=lambda results: has_changes(results['diff_against_last_success']))
+
+    # Write POST request body to file(s), split into batches if necessary, and
+    # send POST data to destination
+    # If a batch fails, the progress made by the batches that were accepted
+    # is still recorded (see "accepted_response_body" and "unsent_keys"), so
+    # that the next job does not send them again
+    pipeline.add('send_to_dest',
+                 lambda results: SendToDest(job_config, write_request_batches(
+                     job_config, job_config['dest_request_body_filepath'], results['create_dest_request'])),
+                 depends_on=['create_dest_request'],
+                 when=lambda results: results['create_dest_request'] is not None,
+                 stop_on_failure=False)
+
+    # Record denied keys (if any)
+    pipeline.add('record_denied_keys',
+                 lambda results: RecordDeniedKeys(job_config,
+                                                  cast(str, accepted_response_body(results['send_to_dest'])),
+                                                  current_time, results['diff_against_last_success']),
+                 depends_on=['diff_against_last_success', 'send_to_dest'],
+                 when=lambda results: accepted_response_body(results['send_to_dest']) is not None)
+
+    # Record job as successful (unless nothing was accepted by CaiaSoft)
+    pipeline.add('update_last_success',
+                 lambda results: UpdateLastSuccess(job_config,
+                                                   results['diff_against_last_success'].current_fingerprints,
+                                                   results['query_source_url'],
+                                                   unsent_keys(job_config, results['diff_against_last_success'],
+                                                               results['send_to_dest'])),
+                 depends_on=['query_source_url', 'diff_against_last_success', 'send_to_dest', 'record_denied_keys'],
+                 when=lambda results: results['send_to_dest'] is None or
+                 accepted_response_body(results['send_to_dest']) is not None)
+
+    return pipeline
+
+
+class Command(caia.core.command.Command):
+    def __call__(self, start_time: str, args: argparse.Namespace) -> caia.core.command.CommandResult:
+        # Create job configuration
+        job_config = create_job_configuration(start_time)
 
-        # Record denied keys (if any)
-        dest_response_body = step_result.get_result()
-        step_result = run_step(RecordDeniedKeys(job_config, dest_response_body, current_time,
-                                                diff_result))
+        current_time = datetime.datetime.strptime(start_time, '%Y%m%d%H%M%S')
 
+        step_result = create_pipeline(job_config, current_time).run()
         if not step_result.was_successful():
             return CommandResult(step_result.was_successful(), step_result.get_errors())
 
-        # Record job as successful
-        step_result = run_step(UpdateLastSuccess(job_config))
-        return CommandResult(step_result.was_successful(), step_result.get_errors())
+        results = step_result.get_result()
+        send_result = results.get('send_to_dest')
+        if send_result is not None and not send_result.was_successful():
+            return CommandResult(send_result.was_successful(), send_result.get_errors())
+
+        source_response = results.get('query_source_url')
+        if source_response is not None and source_response.was_not_modified():
+            logger.info("Source response not modified, no CaiaSoft update required.")
+        elif results.get('check_source_unchanged'):
+            logger.info("Source response unchanged, no CaiaSoft update required.")
+            # The source response is identical to the last success, so is not
+            # kept, and the last success is not updated
+            os.remove(source_response.filepath)
+
+        return CommandResult(True, [])
@@ -1,17 +1,22 @@
 import argparse
 import logging
 import os
+from typing import Optional
 
 import caia.core.command
+from caia.core.batching import batch_config_from_env, write_request_batches
 from caia.core.command import CommandResult
-from caia.core.io import write_to_file
-from caia.core.step import run_step
+from caia.core.http import ResponseFile, http_config_from_env
+from caia.core.io import storage_config_from_env
+from caia.core.pipeline import Pipeline
+from caia.core.step import StepResult, run_step
 from caia.items.items_job_config import ItemsJobConfig
+from caia.items.source_items import SourceItems
 from caia.items.steps.create_dest_request import CreateDestNewItemsRequest
 from caia.items.steps.create_dest_request import CreateDestUpdatedItemsRequest
 from caia.items.steps.get_last_timestamp import GetLastTimestamp
 from caia.items.steps.parse_source_response import ParseSourceResponse
-from caia.items.steps.query_source_url import QuerySourceUrl
+from caia.items.steps.query_source_url import PrefetchSourceUrl, QuerySourceUrl
 from caia.items.steps.send_new_items_to_dest import SendNewItemsToDest
 from caia.items.steps.send_updated_items_to_dest import SendUpdatedItemsToDest
 from caia.items.steps.update_last_success import UpdateLastSuccess
@@ -20,17 +25,6 @@ from caia.items.steps.validate_job_preconditions import ValidateJobPreconditions
 logger = logging.getLogger(__name__)
 
 
-def configure_cli(subparsers) -> None:  # type: ignore
-    """
-    Configures the CLI arguments for this command
-    """
-    parser = subparsers.add_parser(
-        name='items',
-        description='Retrieve new/updated items from Aleph and send to CaiaSoft'
-    )
-    parser.set_defaults(cmd_name='items')
-
-
 def create_job_configuration(start_time: str) -> ItemsJobConfig:
     """
     Creates the new job configuration
@@ -42,7 +36,12 @@ def create_job_configuration(start_time: str) -> ItemsJobConfig:
         'dest_updates_url': os.getenv("ITEMS_DEST_UPDATES_URL", default=""),
         'caiasoft_api_key': os.getenv('CAIASOFT_API_KEY', default=""),
         'storage_dir': os.getenv('ITEMS_STORAGE_DIR', default=""),
-        'last_success_lookup': os.getenv('ITEMS_LAST_SUCCESS_LOOKUP', default="")
+        'last_success_lookup': os.getenv('ITEMS_LAST_SUCCESS_LOOKUP', default=""),
+        'parallel_sends': os.getenv('ITEMS_PARALLEL_SENDS', default="false"),
+        'prefetch': os.getenv('ITEMS_PREFETCH', default="false"),
+        **http_config_from_env(),
+        **batch_config_from_env(),
+        **storage_config_from_env()
     }
 
     job_id_prefix = "caia.items"
@@ -54,6 +53,108 @@ def create_job_configuration(start_time: str) -> ItemsJobConfig:
     return job_config
 
 
+def has_new_items(source_items: SourceItems) -> bool:
+    """
+    Returns True if there are new items to send to CaiaSoft, False otherwise
+    """
+    new_item_count = len(source_items.get_new_items())
+    if new_item_count == 0:
+        logger.info("No new entries found, skipping CaiaSoft new items request.")
+        return False
+
+    logger.info(f"Sending {new_item_count} new item(s) to CaiaSoft.")
+    return True
+
+
+def has_updated_items(source_items: SourceItems) -> bool:
+    """
+    Returns True if there are updated items to send to CaiaSoft, False
+    otherwise
+    """
+    updated_item_count = len(source_items.get_updated_items())
+    if updated_item_count == 0:
+        logger.info("No updated entries found, skipping CaiaSoft updated items request.")
+        return False
+
+    logger.info(f"Sending {updated_item_count} updated item(s) to CaiaSoft.")
+    return True
+
+
+def create_iteration_pipeline(job_config: ItemsJobConfig, source_response: ResponseFile, last_timestamp: str,
+                              iteration_count: int) -> Pipeline:
+    """
+    Returns the pipeline of steps for an iteration, sending the new and
+    updated items in the given source response to CaiaSoft.
+
+    If "prefetch" is enabled, the source response for the next iteration (if
+    any) is queried while the items are sent, with the StepResult of the
+    query as the result of the "prefetch_source_url" step. A failed prefetch
+    does not fail the iteration.
+    """
+    pipeline = Pipeline(job_config.artifact_writer)
+
+    # Parse source response
+    pipeline.add('parse_source_response', lambda results: ParseSourceResponse(source_response))
+
+    if (job_config.get('prefetch') or 'false').lower() == 'true':
+        # The last success is only updated once this iteration has been
+        # sent, so a failed prefetch (which never raises) does not stop this
+        # iteration
+        pipeline.add('prefetch_source_url',
+                     lambda results: PrefetchSourceUrl(
+                         job_config, last_timestamp, results['parse_source_response'].get_end_time(),
+                         results['parse_source_response'].get_next_item(), stream_to_file=True,
+                         output_filepath=job_config.generate_filepath(
+                             job_config['storage_dir'], "source_response_body", "json", iteration_count + 1)),
+                     depends_on=['parse_source_response'],
+                     when=lambda results: results['parse_source_response'].get_next_item() is not None,
+                     stop_on_failure=False)
+
+    # Create new items POST body
+    pipeline.add('create_dest_new_items_request',
+                 lambda results: CreateDestNewItemsRequest(results['parse_source_response']),
+                 depends_on=['parse_source_response'],
+                 when=lambda results: has_new_items(results['parse_source_response']))
+
+    # Create updated items POST body
+    pipeline.add('create_dest_updated_items_request',
+                 lambda results: CreateDestUpdatedItemsRequest(results['parse_source_response']),
+                 depends_on=['parse_source_response'],
+                 when=lambda results: has_updated_items(results['parse_source_response']))
+
+    # The new and updated items requests are sent to different endpoints,
+    # and do not depend on each other, so with "parallel_sends" both are sent
+    # concurrently, once both have been created. Otherwise, the updated items
+    # are only sent once the new items have been sent successfully.
+    parallel_sends = (job_config.get('parallel_sends') or 'false').lower() == 'true'
+    create_requests = ['create_dest_new_items_request', 'create_dest_updated_items_request']
+
+    # Write new items request body to file(s), split into batches if
+    # necessary, and send POST new items data to destination
+    pipeline.add('send_new_items_to_dest',
+                 lambda results: SendNewItemsToDest(job_config, write_request_batches(
+                     job_config, job_config['dest_new_items_request_body_filepath'],
+                     results['create_dest_new_items_request'])),
+                 depends_on=create_requests if parallel_sends else ['create_dest_new_items_request'],
+                 when=lambda results: results['create_dest_new_items_request'] is not None)
+
+    # Write updated items request body to file(s), split into batches if
+    # necessary, and send POST updated items data to destination
+    pipeline.add('send_updated_items_to_dest',
+                 lambda results: SendUpdatedItemsToDest(job_config, write_request_batches(
+                     job_config, job_config['dest_updated_items_request_body_filepath'],
+                     results['create_dest_updated_items_request'])),
+                 depends_on=create_requests if parallel_sends else create_requests + ['send_new_items_to_dest'],
+                 when=lambda results: results['create_dest_updated_items_request'] is not None)
+
+    # Record iteration as successful
+    pipeline.add('update_last_success',
+                 lambda results: UpdateLastSuccess(job_config, results['parse_source_response'].get_end_time()),
+                 depends_on=['parse_source_response', 'send_new_items_to_dest', 'send_updated_items_to_dest'])
+
+    return pipeline
+
+
 class Command(caia.core.command.Command):
     def __call__(self, start_time: str, args: argparse.Namespace) -> caia.core.command.CommandResult:
         # Create job configuration
@@ -70,77 +171,44 @@ class Command(caia.core.command.Command):
             return CommandResult(step_result.was_successful(), step_result.get_errors())
 
         last_timestamp = step_result.get_result()
+
         end_time = None
         next_item = None
         iteration_count = 1
+        prefetched_step_result: Optional[StepResult] = None
 
         while True:
             logger.info(f"---- Running iteration {iteration_count} ----")
             job_config.set_iteration(iteration_count)
 
-            # Query source URL
-            step_result = run_step(QuerySourceUrl(job_config, last_timestamp, end_time, next_item))
-            write_to_file(job_config["source_response_body_filepath"], step_result.result)
+            # Query source URL (unless already successfully prefetched)
+            # The response body is streamed to the "source_response_body_filepath"
+            if prefetched_step_result is not None and prefetched_step_result.was_successful():
+                step_result = prefetched_step_result
+            else:
+                if prefetched_step_result is not None:
+                    logger.info(f"Prefetch failed with errors: {prefetched_step_result.get_errors()}. "
+                                "Querying the source URL again.")
+                step_result = run_step(
+                    QuerySourceUrl(job_config, last_timestamp, end_time, next_item, stream_to_file=True))
             if not step_result.was_successful():
                 return CommandResult(step_result.was_successful(), step_result.get_errors())
 
             source_response = step_result.get_result()
 
-            # Parse source response
-            step_result = run_step(ParseSourceResponse(source_response))
+            step_result = create_iteration_pipeline(job_config, source_response, last_timestamp,
+                                                    iteration_count).run()
             if not step_result.was_successful():
                 return CommandResult(step_result.was_successful(), step_result.get_errors())
 
-            source_items = step_result.get_result()
-            new_item_count = len(source_items.get_new_items())
-            updated_item_count = len(source_items.get_updated_items())
+            results = step_result.get_result()
+            source_items = results['parse_source_response']
             next_item = source_items.get_next_item()
             end_time = source_items.get_end_time()
-
-            if new_item_count == 0:
-                logger.info("No new entries found, skipping CaiaSoft new items request.")
-            else:
-                logger.info(f"Sending {new_item_count} new item(s) to CaiaSoft.")
-                # Create new items POST body
-                step_result = run_step(CreateDestNewItemsRequest(source_items))
-                if not step_result.was_successful():
-                    return CommandResult(step_result.was_successful(), step_result.get_errors())
-
-                # Write new items request body to file
-                write_to_file(job_config['dest_new_items_request_body_filepath'], step_result.get_result())
-
-                # Send POST new items data to destination
-                step_result = run_step(SendNewItemsToDest(job_config))
-
-                if not step_result.was_successful():
-                    return CommandResult(step_result.was_successful(), step_result.get_errors())
-
-            if updated_item_count == 0:
-                logger.info("No updated entries found, skipping CaiaSoft updated items request.")
-            else:
-                logger.info(f"Sending {updated_item_count} updated item(s) to CaiaSoft.")
-                # Create updated items POST body
-                step_result = run_step(CreateDestUpdatedItemsRequest(source_items))
-                if not step_result.was_successful():
-                    return CommandResult(step_result.was_successful(), step_result.get_errors())
-
-                # Write updated items request body to file
-                write_to_file(job_config['dest_updated_items_request_body_filepath'], step_result.get_result())
-
-                # Send POST updated items data to destination
-                step_result = run_step(SendUpdatedItemsToDest(job_config))
-
-                if not step_result.was_successful():
-                    return CommandResult(step_result.was_successful(), step_result.get_errors())
-
-                if not step_result.was_successful():
-                    return CommandResult(step_result.was_successful(), step_result.get_errors())
-
-            # Record job as successful
-            step_result = run_step(UpdateLastSuccess(job_config))
+            prefetched_step_result = results.get('prefetch_source_url')
 
             if next_item is None:
-                return CommandResult(step_result.was_successful(), step_result.get_errors())
+                return CommandResult(True, [])
             else:
                 logger.info(f"next_item is '{next_item}'. Commencing next iteration.")
                 iteration_count = iteration_count + 1
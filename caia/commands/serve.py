@@ -0,0 +1,51 @@
+import argparse
+import logging
+import os
+import signal
+import threading
+from typing import List
+
+import caia.core.command
+from caia.commands import COMMANDS
+from caia.core.command import CommandResult
+from caia.core.scheduler import ScheduledCommand, Scheduler
+
+logger = logging.getLogger(__name__)
+
+# The commands that can be scheduled, and the environment variables holding
+# their intervals
+SCHEDULE_INTERVALS = {
+    'circrequests': 'SERVE_CIRCREQUESTS_INTERVAL',
+    'items': 'SERVE_ITEMS_INTERVAL',
+}
+
+
+def create_schedule() -> List[ScheduledCommand]:
+    """
+    Returns the commands to schedule, for each command with an interval (in
+    seconds) greater than 0
+    """
+    schedule = []
+    for name, interval_variable in SCHEDULE_INTERVALS.items():
+        interval = float(os.getenv(interval_variable, default="0") or 0)
+        if interval > 0:
+            logger.info(f"Scheduling {name} every {interval} seconds")
+            schedule.append(ScheduledCommand(name, COMMANDS[name].create_command(), interval))
+    return schedule
+
+
+class Command(caia.core.command.Command):
+    def __call__(self, start_time: str, args: argparse.Namespace) -> caia.core.command.CommandResult:
+        schedule = create_schedule()
+        if not schedule:
+            variables = ', '.join(SCHEDULE_INTERVALS.values())
+            return CommandResult(False, [f"No commands are scheduled. Set at least one of: {variables}"])
+
+        scheduler = Scheduler(schedule)
+
+        # Stop after the current run on SIGTERM (as sent by service managers)
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+
+        scheduler.run(args)
+        return CommandResult(True, [])
@@ -0,0 +1,106 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# The application configuration file used if no filepath is given, and the
+# "CAIA_CONFIG" environment variable is not set
+DEFAULT_APPLICATION_CONFIG_FILEPATH = 'etc/config.yaml'
+
+# Use the C-accelerated (libyaml) loader, if PyYAML was built with it
+YamlLoader = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+
+
+class ApplicationConfig(Mapping[str, Any]):
+    """
+    Read-only mapping of the application configuration parsed from a YAML
+    file (such as "etc/config.yaml"), with typed accessors for the settings
+    used by the commands.
+    """
+    def __init__(self, config: Mapping[str, Any], filepath: str = '', mtime_ns: int = 0):
+        self.config = dict(config or {})
+        self.filepath = filepath
+        self.mtime_ns = mtime_ns
+
+        circrequests_config = self.config.get('circrequests') or {}
+        source_key_field = circrequests_config.get('source_key_field')
+        self._circrequests_source_key_field = None if source_key_field is None else str(source_key_field)
+
+    @property
+    def circrequests_source_key_field(self) -> str:
+        """
+        Returns the field in the circrequests source response that uniquely
+        identifies a record, raising a KeyError if it is not configured.
+        """
+        if self._circrequests_source_key_field is None:
+            raise KeyError(f"'circrequests.source_key_field' is not configured in '{self.filepath}'")
+        return self._circrequests_source_key_field
+
+    def __getitem__(self, key: str) -> Any:
+        return self.config[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.config)
+
+    def __len__(self) -> int:
+        return len(self.config)
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[filepath: {self.filepath}]"
+
+
+def application_config_filepath(filepath: Optional[str] = None) -> str:
+    """
+    Returns the absolute filepath of the application configuration file,
+    which is the given filepath, or (if not provided) the "CAIA_CONFIG"
+    environment variable, or "etc/config.yaml".
+    """
+    return os.path.abspath(filepath or os.getenv('CAIA_CONFIG') or DEFAULT_APPLICATION_CONFIG_FILEPATH)
+
+
+def load_application_config(filepath: str) -> ApplicationConfig:
+    """
+    Returns the ApplicationConfig parsed from the given YAML file
+    """
+    mtime_ns = os.stat(filepath).st_mtime_ns
+    with open(filepath) as fp:
+        config = yaml.load(fp, Loader=YamlLoader)
+
+    logger.debug(f"Loaded application configuration from '{filepath}'")
+    return ApplicationConfig(config, filepath, mtime_ns)
+
+
+# Process-wide application configurations, keyed by their absolute filepaths
+_application_configs: Dict[str, ApplicationConfig] = {}
+_application_configs_lock = threading.Lock()
+
+
+def get_application_config(filepath: Optional[str] = None) -> ApplicationConfig:
+    """
+    Returns the shared ApplicationConfig for the given (or default, see
+    "application_config_filepath") configuration file, so that the file is
+    only parsed once by all jobs in the process. The file is parsed again if
+    its modification time has changed since it was last parsed.
+    """
+    filepath = application_config_filepath(filepath)
+    mtime_ns = os.stat(filepath).st_mtime_ns
+    with _application_configs_lock:
+        application_config = _application_configs.get(filepath)
+        if application_config is None or application_config.mtime_ns != mtime_ns:
+            application_config = load_application_config(filepath)
+            _application_configs[filepath] = application_config
+        return application_config
+
+
+def clear_application_configs() -> None:
+    """
+    Removes all the shared ApplicationConfigs, so that configuration files
+    are parsed again when next requested.
+    """
+    with _application_configs_lock:
+        _application_configs.clear()
@@ -0,0 +1,290 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from caia.core.http import http_post_file
+from caia.core.io import COMPRESSION_EXTENSIONS
+from caia.core.job_config import JobConfig
+from caia.core.step import StepResult
+
+logger = logging.getLogger(__name__)
+
+# Length (in bytes) of the separator between entries in a JSON list
+ENTRY_SEPARATOR_SIZE = len(', ')
+
+
+def batch_config_from_env() -> Dict[str, str]:
+    """
+    Returns the request batching settings from the environment, for inclusion
+    in a job configuration.
+    """
+    return {
+        'dest_batch_max_items': os.getenv('DEST_BATCH_MAX_ITEMS', default="0"),
+        'dest_batch_max_bytes': os.getenv('DEST_BATCH_MAX_BYTES', default="0"),
+        'dest_max_in_flight': os.getenv('DEST_MAX_IN_FLIGHT', default="1"),
+    }
+
+
+def batch_limits(config: Dict[str, str]) -> Tuple[int, int]:
+    """
+    Returns the maximum number of entries, and maximum size (in bytes), of a
+    request batch from the given configuration, where 0 is unlimited.
+    """
+    return int(config.get('dest_batch_max_items') or 0), int(config.get('dest_batch_max_bytes') or 0)
+
+
+def batch_entries(entries: Sequence[Any], max_items: int = 0, max_bytes: int = 0,
+                  overhead: int = 0) -> List[List[Any]]:
+    """
+    Splits the given entries into batches of at most "max_items" entries,
+    whose JSON list (plus the given "overhead" bytes) is at most "max_bytes"
+    bytes. A limit of 0 is unlimited.
+
+    An entry larger than "max_bytes" is placed in a batch by itself.
+    """
+    batches: List[List[Any]] = []
+    batch: List[Any] = []
+    batch_size = overhead
+    for entry in entries:
+        entry_size = len(json.dumps(entry).encode('utf-8'))
+        if batch:
+            entry_size = entry_size + ENTRY_SEPARATOR_SIZE
+            too_many = 0 < max_items <= len(batch)
+            too_big = 0 < max_bytes < batch_size + entry_size
+            if too_many or too_big:
+                batches.append(batch)
+                batch = []
+                batch_size = overhead
+                entry_size = entry_size - ENTRY_SEPARATOR_SIZE
+        batch.append(entry)
+        batch_size = batch_size + entry_size
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def split_request_body(request_body: str, max_items: int = 0, max_bytes: int = 0) -> List[str]:
+    """
+    Returns the request bodies of the batches of the given JSON request body,
+    which is an object with a single list of entries (such as
+    {"requests": [...]}). Each batch has the same form, with a subset of the
+    entries.
+
+    The request body is returned unchanged, as the only batch, if it is
+    within the given limits (where 0 is unlimited).
+    """
+    if max_items <= 0 and (max_bytes <= 0 or len(request_body.encode('utf-8')) <= max_bytes):
+        return [request_body]
+
+    request = json.loads(request_body)
+    list_key = next(key for key, value in request.items() if isinstance(value, list))
+    overhead = len(json.dumps({**request, list_key: []}).encode('utf-8'))
+    batches = batch_entries(request[list_key], max_items, max_bytes, overhead)
+    if len(batches) <= 1:
+        return [request_body]
+
+    return [json.dumps({**request, list_key: batch}) for batch in batches]
+
+
+def batch_filepath(filepath: str, batch_number: int) -> str:
+    """
+    Returns the filepath of the numbered batch of the artifact at the given
+    filepath, by appending "-batch-<batch_number>" to its file descriptor,
+    i.e. "<job_id>.dest_request_body.json" becomes
+    "<job_id>.dest_request_body-batch-1.json"
+    """
+    directory, filename = os.path.split(filepath)
+
+    compression_extension = ''
+    for extension in COMPRESSION_EXTENSIONS.values():
+        if extension and filename.endswith(extension):
+            compression_extension = extension
+            filename = filename[:-len(extension)]
+
+    base_filename, separator, file_extension = filename.rpartition('.')
+    return os.path.join(directory, f"{base_filename}-batch-{batch_number}.{file_extension}{compression_extension}")
+
+
+def write_request_batches(job_config: JobConfig, request_body_filepath: str, request_body: str) -> List[str]:
+    """
+    Splits the given request body into batches (using the
+    "dest_batch_max_items" and "dest_batch_max_bytes" limits of the given
+    JobConfig), and writes each batch as a numbered artifact, returning the
+    List of batch filepaths.
+
+    A request body that does not need to be split is written to the given
+    filepath.
+    """
+    max_items, max_bytes = batch_limits(job_config)
+    request_bodies = split_request_body(request_body, max_items, max_bytes)
+    if len(request_bodies) == 1:
+        job_config.artifact_writer.write_text(request_body_filepath, request_bodies[0])
+        return [request_body_filepath]
+
+    logger.info(f"Request body split into {len(request_bodies)} batches")
+    filepaths = []
+    for batch_number, batch_request_body in enumerate(request_bodies, start=1):
+        filepath = batch_filepath(request_body_filepath, batch_number)
+        job_config.artifact_writer.write_text(filepath, batch_request_body)
+        filepaths.append(filepath)
+    return filepaths
+
+
+def merge_responses(response_bodies: List[str], count_fields: Sequence[str] = (),
+                    list_fields: Sequence[str] = ()) -> str:
+    """
+    Returns a single JSON response body aggregating the given (batch)
+    response bodies, with the given count fields summed, the given list
+    fields concatenated, "success" True only if all responses were
+    successful, and any "error" messages joined. Any other fields are those
+    of the first response.
+
+    A single response body is returned unchanged.
+    """
+    if len(response_bodies) == 1:
+        return response_bodies[0]
+
+    responses = [json.loads(response_body) for response_body in response_bodies]
+    merged = dict(responses[0])
+
+    for field in count_fields:
+        total = sum(int(response.get(field, 0)) for response in responses)
+        merged[field] = str(total) if isinstance(merged.get(field), str) else total
+
+    for field in list_fields:
+        merged[field] = [entry for response in responses for entry in response.get(field, [])]
+
+    if 'success' in merged:
+        merged['success'] = all(response.get('success', False) for response in responses)
+
+    if 'error' in merged:
+        merged['error'] = '; '.join(response['error'] for response in responses if response.get('error'))
+
+    return json.dumps(merged)
+
+
+class AcceptedBatches:
+    """
+    The result of "post_batches" when a batch fails: the request body
+    filepaths of the batches that were accepted (i.e., sent successfully),
+    and their response bodies aggregated using the "merge" function (None if
+    no batches were accepted), so that the progress made can be recorded.
+    """
+    def __init__(self, request_body_filepaths: List[str], response_body: Optional[str]):
+        self.request_body_filepaths = request_body_filepaths
+        self.response_body = response_body
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[request_body_filepaths: {self.request_body_filepaths}]"
+
+
+def post_batches(job_config: JobConfig, url: str, headers: Dict[str, str], request_body_filepaths: List[str],
+                 response_body_filepath: str, merge: Callable[[List[str]], str]) -> StepResult:
+    """
+    Sends each of the given request body files as a POST request to the
+    given URL, with up to "dest_max_in_flight" (default 1) requests sent
+    concurrently. Batches are started in order. Once a batch fails, batches
+    that have not started are cancelled, and those already in flight are
+    completed.
+
+    The result of the returned StepResult is the response body or, if more
+    than one batch was sent, the response bodies (in batch order) aggregated
+    using the given "merge" function. If a batch fails, the result is the
+    AcceptedBatches (including any accepted after the failure, while in
+    flight), and the errors are those of every failed batch (including any
+    that raised an exception, such as a network error). Each batch
+    response is written as a numbered artifact, with the aggregated response
+    (of the accepted batches, if a batch failed) written to the given
+    response body filepath.
+    """
+    # Shared by all the batches, so obtained before any are sent
+    session_manager = job_config.http_session_manager
+    retry_policy = job_config.retry_policy('dest')
+    retry_budget = job_config.retry_budget
+    artifact_writer = job_config.artifact_writer
+    content_encoding = job_config.get('dest_content_encoding', '')
+
+    batch_count = len(request_body_filepaths)
+    if batch_count == 1:
+        step_result = http_post_file(url, headers, request_body_filepaths[0], session_manager, retry_policy,
+                                     retry_budget, content_encoding)
+
+        # Write the response body to a file
+        artifact_writer.write_text(response_body_filepath, step_result.get_result())
+        if not step_result.was_successful():
+            return StepResult(False, AcceptedBatches([], None), step_result.get_errors())
+        return step_result
+
+    failed = threading.Event()
+
+    def post_batch(batch_number: int, request_body_filepath: str) -> Optional[StepResult]:
+        if failed.is_set():
+            logger.info(f"Skipping batch {batch_number} of {batch_count}, as an earlier batch failed")
+            return None
+
+        logger.info(f"Sending batch {batch_number} of {batch_count}")
+        try:
+            batch_step_result = http_post_file(url, headers, request_body_filepath, session_manager, retry_policy,
+                                               retry_budget, content_encoding)
+        except Exception as ex:
+            # Such as a network error that persists after retries, which fails
+            # the batch (as a failed response does), so that the batches
+            # already accepted are still returned
+            logger.warning(f"Batch {batch_number} of {batch_count} failed: {ex}")
+            failed.set()
+            return StepResult(False, None, [f"POST to '{url}' failed: {ex}"])
+
+        if not batch_step_result.was_successful():
+            failed.set()
+
+        # Write the batch response body to a file
+        artifact_writer.write_text(batch_filepath(response_body_filepath, batch_number),
+                                   batch_step_result.get_result())
+        return batch_step_result
+
+    max_in_flight = min(max(int(job_config.get('dest_max_in_flight') or 1), 1), batch_count)
+    accepted_request_body_filepaths: List[str] = []
+    response_bodies: List[str] = []
+    errors: List[str] = []
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='post_batches') as executor:
+        futures = [executor.submit(post_batch, batch_number, request_body_filepath)
+                   for batch_number, request_body_filepath in enumerate(request_body_filepaths, start=1)]
+
+        for batch_number, (request_body_filepath, future) in enumerate(zip(request_body_filepaths, futures), start=1):
+            # Cancelled, or skipped (having started after a batch failed)
+            if future.cancelled():
+                continue
+            batch_result = future.result()
+            if batch_result is None:
+                continue
+
+            if not batch_result.was_successful():
+                if not errors:
+                    # Batches that have not started are cancelled, while those
+                    # in flight are waited for, so their responses are kept
+                    cancelled_count = sum(pending_future.cancel() for pending_future in futures)
+                    logger.info(f"Cancelled {cancelled_count} batch(es) of {batch_count}, as batch {batch_number} "
+                                "failed")
+                errors.extend(f"Batch {batch_number} of {batch_count}: {error}" for error in batch_result.get_errors())
+                continue
+
+            accepted_request_body_filepaths.append(request_body_filepath)
+            response_bodies.append(batch_result.get_result())
+
+    if errors:
+        # Record the responses of the batches that were accepted
+        accepted_response_body = None
+        if response_bodies:
+            accepted_response_body = merge(response_bodies)
+            artifact_writer.write_text(response_body_filepath, accepted_response_body)
+        accepted_batches = AcceptedBatches(accepted_request_body_filepaths, accepted_response_body)
+        return StepResult(False, accepted_batches, errors)
+
+    merged_response_body = merge(response_bodies)
+    artifact_writer.write_text(response_body_filepath, merged_response_body)
+    return StepResult(True, merged_response_body)
@@ -1,35 +1,581 @@
+import datetime
+import email.utils
+import hashlib
 import logging
-from typing import Dict, Optional
+import os
+import random
+import threading
+import time
+import zlib
+from typing import Any, BinaryIO, Callable, ContextManager, Dict, Mapping, Optional, Set, Tuple
+from urllib.parse import urlparse
 
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 
+from caia.core.io import open_artifact, read_artifact
 from caia.core.step import StepResult
 
 logger = logging.getLogger(__name__)
 
+# Default number of per-host connection pools to cache, and the maximum
+# number of connections to keep in each pool
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
 
-def http_get_request(url: str, headers: Dict[str, str], query_params: Optional[Dict[str, str]] = None) -> StepResult:
+# Default retry settings
+DEFAULT_RETRY_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF_FACTOR = 0.5
+DEFAULT_RETRY_BACKOFF_MAX = 30.0
+DEFAULT_RETRY_JITTER = 0.1
+DEFAULT_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+DEFAULT_RETRY_BUDGET = 120.0
+
+# Default time (in seconds) to wait for a connection to be established, and
+# for the server to send data (between bytes, not for the whole response)
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 120.0
+
+# Size (in bytes) of the chunks used when streaming a response body to a file
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Exceptions indicating a (possibly) transient network failure
+RETRYABLE_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+# HTTP methods whose requests can safely be sent again, even if the server
+# may have already processed them
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# Status codes of responses to requests that the server declined to process,
+# so that other (non-idempotent) requests can be sent again, if the response
+# says when (with a "Retry-After" header)
+NOT_PROCESSED_STATUS_CODES = (429, 503)
+
+# Request headers making a GET request conditional on the response validators
+CONDITIONAL_REQUEST_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+# The supported request body content encodings, and the zlib "wbits" for
+# each ("deflate" is the zlib format, "gzip" adds the gzip header)
+IDENTITY = 'identity'
+CONTENT_ENCODING_WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+
+# Status codes with which a destination may reject a compressed request body
+CONTENT_ENCODING_REJECTED_STATUS_CODES = (400, 415)
+
+
+def http_config_from_env() -> Dict[str, str]:
+    """
+    Returns the HTTP connection pool and retry settings from the environment,
+    for inclusion in a job configuration.
+    """
+    return {
+        'http_pool_connections': os.getenv('HTTP_POOL_CONNECTIONS', default=str(DEFAULT_POOL_CONNECTIONS)),
+        'http_pool_maxsize': os.getenv('HTTP_POOL_MAXSIZE', default=str(DEFAULT_POOL_MAXSIZE)),
+        'http_keep_alive': os.getenv('HTTP_KEEP_ALIVE', default="true"),
+        'http_retry_budget': os.getenv('HTTP_RETRY_BUDGET', default=str(DEFAULT_RETRY_BUDGET)),
+        'source_retry_max_attempts': os.getenv('SOURCE_RETRY_MAX_ATTEMPTS', default=""),
+        'source_retry_backoff_factor': os.getenv('SOURCE_RETRY_BACKOFF_FACTOR', default=""),
+        'source_retry_status_codes': os.getenv('SOURCE_RETRY_STATUS_CODES', default=""),
+        'source_connect_timeout': os.getenv('SOURCE_CONNECT_TIMEOUT', default=""),
+        'source_read_timeout': os.getenv('SOURCE_READ_TIMEOUT', default=""),
+        'dest_retry_max_attempts': os.getenv('DEST_RETRY_MAX_ATTEMPTS', default=""),
+        'dest_retry_backoff_factor': os.getenv('DEST_RETRY_BACKOFF_FACTOR', default=""),
+        'dest_retry_status_codes': os.getenv('DEST_RETRY_STATUS_CODES', default=""),
+        'dest_connect_timeout': os.getenv('DEST_CONNECT_TIMEOUT', default=""),
+        'dest_read_timeout': os.getenv('DEST_READ_TIMEOUT', default=""),
+        'dest_content_encoding': os.getenv('DEST_CONTENT_ENCODING', default=IDENTITY),
+    }
+
+
+class RetryPolicy:
+    """
+    Determines how long each attempt of an HTTP request may wait for the
+    server, and whether, and after what delay, a failed request should be
+    retried.
+
+    max_attempts: The total number of attempts, including the first one. A
+                  value of 1 disables retries.
+    backoff_factor: The delay (in seconds) before the first retry. The delay
+                    doubles for each subsequent retry.
+    backoff_max: The maximum delay (in seconds) between attempts.
+    jitter: The fraction of the delay to randomly add or subtract, so that
+            clients do not retry in lockstep.
+    retry_status_codes: The HTTP status codes that should be retried
+    respect_retry_after: If True, the delay given by a "Retry-After" response
+                         header is used instead of the backoff delay.
+    connect_timeout: The time (in seconds) to wait for a connection to be
+                     established. An attempt that times out is retried.
+    read_timeout: The time (in seconds) to wait for the server to send data
+                  (between bytes, not for the whole response). An attempt
+                  that times out is retried.
+
+    Requests that are not idempotent (such as POSTs) are only retried if they
+    were not processed by the server (see "send_request").
+    """
+    def __init__(self, max_attempts: int = DEFAULT_RETRY_MAX_ATTEMPTS,
+                 backoff_factor: float = DEFAULT_RETRY_BACKOFF_FACTOR,
+                 backoff_max: float = DEFAULT_RETRY_BACKOFF_MAX,
+                 jitter: float = DEFAULT_RETRY_JITTER,
+                 retry_status_codes: Tuple[int, ...] = DEFAULT_RETRY_STATUS_CODES,
+                 respect_retry_after: bool = True,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT):
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.retry_status_codes = retry_status_codes
+        self.respect_retry_after = respect_retry_after
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    @staticmethod
+    def from_config(config: Dict[str, str], endpoint: str) -> 'RetryPolicy':
+        """
+        Returns a RetryPolicy from the "<endpoint>_retry_*" (and the
+        "<endpoint>_connect_timeout" and "<endpoint>_read_timeout") values in
+        the given configuration, using defaults for missing or empty values.
+        """
+        def value(name: str) -> str:
+            return config.get(f"{endpoint}_retry_{name}") or ""
+
+        max_attempts = int(value('max_attempts') or DEFAULT_RETRY_MAX_ATTEMPTS)
+        backoff_factor = float(value('backoff_factor') or DEFAULT_RETRY_BACKOFF_FACTOR)
+        backoff_max = float(value('backoff_max') or DEFAULT_RETRY_BACKOFF_MAX)
+        jitter = float(value('jitter') or DEFAULT_RETRY_JITTER)
+        retry_status_codes: Tuple[int, ...] = DEFAULT_RETRY_STATUS_CODES
+        if value('status_codes'):
+            retry_status_codes = tuple(int(code) for code in value('status_codes').split(',') if code.strip())
+        respect_retry_after = (value('respect_retry_after') or 'true').lower() != 'false'
+        connect_timeout = float(config.get(f"{endpoint}_connect_timeout") or DEFAULT_CONNECT_TIMEOUT)
+        read_timeout = float(config.get(f"{endpoint}_read_timeout") or DEFAULT_READ_TIMEOUT)
+
+        return RetryPolicy(max_attempts, backoff_factor, backoff_max, jitter, retry_status_codes,
+                           respect_retry_after, connect_timeout, read_timeout)
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """
+        Returns the (connect, read) timeout of each attempt, as used by the
+        "timeout" argument of "requests"
+        """
+        return self.connect_timeout, self.read_timeout
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        return status_code in self.retry_status_codes
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Returns the delay (in seconds) to wait after the given (1-based)
+        failed attempt, before the next attempt is made.
+        """
+        if self.respect_retry_after and retry_after is not None:
+            return max(retry_after, 0.0)
+
+        delay = min(self.backoff_factor * (2 ** (attempt - 1)), self.backoff_max)
+        if self.jitter:
+            delay = delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        return float(max(delay, 0.0))
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[max_attempts: {self.max_attempts}, backoff_factor: {self.backoff_factor}, " \
+               f"backoff_max: {self.backoff_max}, jitter: {self.jitter}, " \
+               f"retry_status_codes: {self.retry_status_codes}, respect_retry_after: {self.respect_retry_after}, " \
+               f"connect_timeout: {self.connect_timeout}, read_timeout: {self.read_timeout}]"
+
+
+class RetryBudget:
+    """
+    The total time (in seconds) that a job may spend waiting to retry failed
+    HTTP requests, shared by all the requests made by the job.
+    """
+    def __init__(self, total_seconds: float = DEFAULT_RETRY_BUDGET):
+        self.total_seconds = total_seconds
+        self.spent_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        with self._lock:
+            return max(self.total_seconds - self.spent_seconds, 0.0)
+
+    def try_spend(self, seconds: float) -> bool:
+        """
+        Returns True (and deducts the given time from the budget) if the
+        budget can afford the given delay, False otherwise.
+        """
+        with self._lock:
+            if self.spent_seconds + seconds > self.total_seconds:
+                return False
+            self.spent_seconds += seconds
+            return True
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[total_seconds: {self.total_seconds}, spent_seconds: {self.spent_seconds}]"
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Returns the delay (in seconds) specified by a "Retry-After" header value,
+    which may either be a number of seconds or an HTTP date, or None if the
+    value is missing or unparseable.
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max((retry_date - now).total_seconds(), 0.0)
+
+
+class HttpSessionManager:
+    """
+    Provides pooled, keep-alive HTTP sessions, with one session (and
+    connection pool) per host, so that repeated requests to the same server
+    reuse existing connections instead of performing a new TCP/TLS handshake.
+    """
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE, keep_alive: bool = True):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self._sessions: Dict[str, requests.Session] = {}
+        self._content_encoding_disabled_hosts: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        """
+        Returns the "scheme://host:port" key identifying the connection pool
+        for the given URL
+        """
+        parse_result = urlparse(url)
+        return f"{parse_result.scheme}://{parse_result.netloc}"
+
+    def get_session(self, url: str) -> requests.Session:
+        """
+        Returns the session for the host of the given URL, creating it if
+        necessary.
+        """
+        host_key = self.host_key(url)
+        with self._lock:
+            session = self._sessions.get(host_key)
+            if session is None:
+                logger.debug(f"Creating HTTP session for {host_key}")
+                session = self._create_session()
+                self._sessions[host_key] = session
+            return session
+
+    def disable_content_encoding(self, url: str) -> None:
+        """
+        Records that the host of the given URL does not accept compressed
+        request bodies.
+        """
+        with self._lock:
+            self._content_encoding_disabled_hosts.add(self.host_key(url))
+
+    def content_encoding_disabled(self, url: str) -> bool:
+        """
+        Returns True if the host of the given URL does not accept compressed
+        request bodies, False otherwise.
+        """
+        with self._lock:
+            return self.host_key(url) in self._content_encoding_disabled_hosts
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def close(self) -> None:
+        """
+        Closes all sessions, and their pooled connections
+        """
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[pool_connections: {self.pool_connections}, " \
+               f"pool_maxsize: {self.pool_maxsize}, keep_alive: {self.keep_alive}, hosts: {list(self._sessions)}]"
+
+
+# Process-wide session managers, keyed by their settings
+_session_managers: Dict[Tuple[int, int, bool], HttpSessionManager] = {}
+_session_managers_lock = threading.Lock()
+
+
+def get_session_manager(pool_connections: int = DEFAULT_POOL_CONNECTIONS, pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                        keep_alive: bool = True) -> HttpSessionManager:
+    """
+    Returns the shared HttpSessionManager with the given settings, so that
+    connection pools are reused by all jobs in the process.
+    """
+    key = (pool_connections, pool_maxsize, keep_alive)
+    with _session_managers_lock:
+        session_manager = _session_managers.get(key)
+        if session_manager is None:
+            session_manager = HttpSessionManager(pool_connections, pool_maxsize, keep_alive)
+            _session_managers[key] = session_manager
+        return session_manager
+
+
+def send_request(session: requests.Session, method: str, url: str,
+                 retry_policy: Optional[RetryPolicy] = None, retry_budget: Optional[RetryBudget] = None,
+                 sleep: Callable[[float], None] = time.sleep, **kwargs: Any) -> requests.Response:
+    """
+    Sends the request using the given session, retrying transient failures
+    according to the given RetryPolicy, for as long as the (optional)
+    RetryBudget allows. Unless a "timeout" is given, each attempt uses the
+    timeouts of the RetryPolicy (or the default timeouts).
+
+    A request that is not idempotent (such as a POST) may have been processed
+    by the server even if it failed (such as with a read timeout, or a 5xx
+    status code), so it is only retried if it was never sent (the connection
+    could not be established), or the server declined to process it (a 429 or
+    503 status code, with a "Retry-After" header).
+
+    Returns the last response received. If the last attempt failed with a
+    network error, the exception is raised.
+    """
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_attempts=1)
+    kwargs.setdefault('timeout', retry_policy.timeout)
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+
+    attempt = 1
+    while True:
+        try:
+            response = session.request(method, url, **kwargs)
+        except RETRYABLE_EXCEPTIONS as ex:
+            if not (idempotent or is_connect_error(ex)) or \
+                    not _can_retry(retry_policy, retry_budget, attempt, None, sleep, f"{method} {url}", str(ex)):
+                raise
+            attempt = attempt + 1
+            continue
+
+        if retry_policy.is_retryable_status(response.status_code):
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            not_processed = response.status_code in NOT_PROCESSED_STATUS_CODES and retry_after is not None
+            if (idempotent or not_processed) and \
+                    _can_retry(retry_policy, retry_budget, attempt, retry_after, sleep, f"{method} {url}",
+                               f"status code {response.status_code}"):
+                response.close()
+                attempt = attempt + 1
+                continue
+
+        return response
+
+
+def is_connect_error(ex: Exception) -> bool:
+    """
+    Returns True if the given exception (raised by "requests") is a failure
+    to establish a connection, so that no request was sent, False otherwise.
+    """
+    if isinstance(ex, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(ex.args[0], 'reason', None) if ex.args else None
+    # Including a refused connection, or an unresolvable host
+    return isinstance(reason, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError))
+
+
+def _can_retry(retry_policy: RetryPolicy, retry_budget: Optional[RetryBudget], attempt: int,
+               retry_after: Optional[float], sleep: Callable[[float], None], description: str, reason: str) -> bool:
+    """
+    Returns True after waiting for the retry delay, if another attempt should
+    be made, False otherwise.
+    """
+    if attempt >= retry_policy.max_attempts:
+        return False
+
+    delay = retry_policy.delay(attempt, retry_after)
+    if retry_budget is not None and not retry_budget.try_spend(delay):
+        logger.warning(f"{description} failed with {reason}. Retry budget exhausted, not retrying.")
+        return False
+
+    logger.warning(f"{description} failed with {reason} on attempt {attempt} of {retry_policy.max_attempts}. "
+                   f"Retrying in {delay:.2f} seconds.")
+    sleep(delay)
+    return True
+
+
+class ResponseFile:
+    """
+    A handle to an HTTP response body that was streamed to a file, instead
+    of being held in memory.
+
+    The "digest" is the hex-encoded SHA-256 digest of the response body (as
+    received, before any compression of the file), and the "url" is the full
+    URL of the request (before any redirects).
+    """
+    def __init__(self, filepath: str, status_code: int, headers: Dict[str, str], size: int, digest: str = '',
+                 url: str = ''):
+        self.filepath = filepath
+        self.status_code = status_code
+        self.headers = headers
+        self.size = size
+        self.digest = digest
+        self.url = url
+
+    def was_not_modified(self) -> bool:
+        """
+        Returns True if the response was a "304 Not Modified" response to a
+        conditional request, in which case there is no response body.
+        """
+        return bool(self.status_code == requests.codes.not_modified)
+
+    def read_text(self) -> str:
+        """
+        Returns the (decompressed) contents of the response body file
+        """
+        return read_artifact(self.filepath)
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[filepath: {self.filepath}, status_code: {self.status_code}, size: {self.size}]"
+
+
+def stream_to_file(response: requests.Response, filepath: str,
+                   open_output: Optional[Callable[[str], ContextManager[BinaryIO]]] = None) -> ResponseFile:
+    """
+    Writes the body of the given (streamed) response to the given filepath in
+    chunks, so that the full body is never held in memory.
+
+    If provided, "open_output" is used to open the file for writing (such as
+    to compress the body as it is written).
+
+    The SHA-256 digest of the body is computed as it is written.
+    """
+    size = 0
+    sha256 = hashlib.sha256()
+    output = open_output(filepath) if open_output is not None else open(filepath, "wb")
+    with output as fp:
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            fp.write(chunk)
+            sha256.update(chunk)
+            size = size + len(chunk)
+
+    logger.debug(f"Wrote {size} bytes to {filepath}")
+
+    # The original request, if the response was redirected
+    request = (response.history[0] if response.history else response).request
+    url = str(request.url) if request is not None else ''
+    return ResponseFile(filepath, response.status_code, dict(response.headers), size, sha256.hexdigest(), url)
+
+
+def conditional_request_headers(etag: str, last_modified: str) -> Dict[str, str]:
+    """
+    Returns the request headers making a GET request conditional on the given
+    (possibly empty) "ETag" and "Last-Modified" validators of a previous
+    response.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
+
+
+def response_validators(headers: Mapping[str, str]) -> Dict[str, str]:
+    """
+    Returns the "etag" and "last_modified" validators (empty, if not present)
+    from the given response headers.
+    """
+    lowercase_headers = {name.lower(): value for name, value in headers.items()}
+    return {
+        'etag': lowercase_headers.get('etag', ''),
+        'last_modified': lowercase_headers.get('last-modified', '')
+    }
+
+
+def http_get_request(url: str, headers: Dict[str, str], query_params: Optional[Dict[str, str]] = None,
+                     session_manager: Optional[HttpSessionManager] = None,
+                     retry_policy: Optional[RetryPolicy] = None,
+                     retry_budget: Optional[RetryBudget] = None,
+                     output_filepath: Optional[str] = None,
+                     open_output: Optional[Callable[[str], ContextManager[BinaryIO]]] = None) -> StepResult:
+    """
+    Sends a GET request to the given URL.
+
+    If "output_filepath" is provided, the response body (successful or not)
+    is streamed to that file (opened using "open_output", if provided), and
+    the result of the returned StepResult is a ResponseFile. Otherwise, the
+    result is the response body as a string.
+
+    If the headers make the request conditional (see
+    "conditional_request_headers"), a "304 Not Modified" response is also
+    successful.
+    """
     logger.info(f"Sending GET request to {url}")
 
-    request = requests.get(url, query_params, headers=headers)
+    if session_manager is None:
+        session_manager = get_session_manager()
+
+    session = session_manager.get_session(url)
+    stream = output_filepath is not None
+    request = send_request(session, 'GET', url, retry_policy, retry_budget, params=query_params, headers=headers,
+                           stream=stream)
     logger.debug(f"Full request URL was {request.url}")
 
     status_code = request.status_code
     logger.debug(f"request completed with status code: {status_code}")
 
-    if status_code == requests.codes.ok:
-        step_result = StepResult(True, request.text)
+    result: Any
+    if output_filepath is not None:
+        with request:
+            result = stream_to_file(request, output_filepath, open_output)
+    else:
+        result = request.text
+
+    conditional = any(name in headers for name in CONDITIONAL_REQUEST_HEADERS)
+    if status_code == requests.codes.ok or (conditional and status_code == requests.codes.not_modified):
+        step_result = StepResult(True, result)
         return step_result
     else:
         error = f"Retrieval of '{url}' failed with a status code of {status_code}"
         errors = [error]
-        step_result = StepResult(False, request.text, errors)
+        step_result = StepResult(False, result, errors)
         return step_result
 
 
-def http_post_request(url: str, headers: Dict[str, str], body: str) -> StepResult:
+def http_post_request(url: str, headers: Dict[str, str], body: str,
+                      session_manager: Optional[HttpSessionManager] = None,
+                      retry_policy: Optional[RetryPolicy] = None,
+                      retry_budget: Optional[RetryBudget] = None) -> StepResult:
     logger.info(f"Sending POST request to {url}")
-    request = requests.post(url, data=body, headers=headers)
+
+    if session_manager is None:
+        session_manager = get_session_manager()
+
+    session = session_manager.get_session(url)
+    request = send_request(session, 'POST', url, retry_policy, retry_budget, data=body, headers=headers)
+    return post_step_result(url, request)
+
+
+def post_step_result(url: str, request: requests.Response) -> StepResult:
+    """
+    Returns the StepResult for the given response to a POST request to the
+    given URL.
+    """
     status_code = request.status_code
 
     logger.debug(f"POST request completed with status code: {status_code}")
@@ -41,3 +587,74 @@ def http_post_request(url: str, headers: Dict[str, str], body: str) -> StepResul
         errors = [error]
         step_result = StepResult(False, request.text, errors)
         return step_result
+
+
+def validate_content_encoding(content_encoding: str) -> str:
+    """
+    Returns the given request body content encoding (in lowercase), raising
+    a ValueError if it is unknown.
+    """
+    content_encoding = (content_encoding or IDENTITY).lower()
+    if content_encoding != IDENTITY and content_encoding not in CONTENT_ENCODING_WBITS:
+        raise ValueError(f"Unknown content encoding: '{content_encoding}'")
+    return content_encoding
+
+
+def encode_request_body(filepath: str, content_encoding: str) -> bytes:
+    """
+    Returns the contents of the given (possibly compressed) artifact,
+    compressed using the given content encoding ("gzip" or "deflate").
+
+    The artifact is read and compressed in chunks, so that only the (much
+    smaller) compressed body is held in memory.
+    """
+    compressor = zlib.compressobj(wbits=CONTENT_ENCODING_WBITS[content_encoding])
+    chunks = []
+    with open_artifact(filepath) as fp:
+        for text in iter(lambda: fp.read(STREAM_CHUNK_SIZE), ''):
+            chunks.append(compressor.compress(text.encode('utf-8')))
+    chunks.append(compressor.flush())
+    return b''.join(chunks)
+
+
+def http_post_file(url: str, headers: Dict[str, str], body_filepath: str,
+                   session_manager: Optional[HttpSessionManager] = None,
+                   retry_policy: Optional[RetryPolicy] = None,
+                   retry_budget: Optional[RetryBudget] = None,
+                   content_encoding: str = IDENTITY) -> StepResult:
+    """
+    Sends a POST request to the given URL, with the contents of the given
+    (possibly compressed) artifact as the body.
+
+    If the "content_encoding" is "gzip" or "deflate", the body is compressed
+    and sent with a "Content-Encoding" header. If the destination rejects the
+    compressed body (with a 400 or 415 status code), the body is sent again
+    uncompressed, and if that succeeds, compressed bodies are no longer sent
+    to the destination host.
+    """
+    content_encoding = validate_content_encoding(content_encoding)
+
+    if session_manager is None:
+        session_manager = get_session_manager()
+
+    if content_encoding == IDENTITY or session_manager.content_encoding_disabled(url):
+        return http_post_request(url, headers, read_artifact(body_filepath), session_manager, retry_policy,
+                                 retry_budget)
+
+    body = encode_request_body(body_filepath, content_encoding)
+    logger.info(f"Sending POST request to {url} ({content_encoding} encoded, {len(body)} bytes)")
+
+    session = session_manager.get_session(url)
+    encoded_headers = {**headers, 'Content-Encoding': content_encoding}
+    request = send_request(session, 'POST', url, retry_policy, retry_budget, data=body, headers=encoded_headers)
+    if request.status_code not in CONTENT_ENCODING_REJECTED_STATUS_CODES:
+        return post_step_result(url, request)
+
+    logger.warning(f"POST to '{url}' with a {content_encoding} encoded body failed with a status code of "
+                   f"{request.status_code}. Resending without compression.")
+    step_result = http_post_request(url, headers, read_artifact(body_filepath), session_manager, retry_policy,
+                                    retry_budget)
+    if step_result.was_successful():
+        logger.warning(f"Disabling {content_encoding} encoded request bodies for '{url}'")
+        session_manager.disable_content_encoding(url)
+    return step_result
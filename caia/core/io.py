@@ -1,6 +1,371 @@
-def write_to_file(filepath: str, contents: str) -> None:
+import contextlib
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import stat
+import threading
+import uuid
+from typing import IO, Any, BinaryIO, Dict, Iterator, List, Optional, TextIO, cast
+
+try:
+    import zstandard
+except ImportError:  # Optional, see the "zstd" extra in setup.py
+    zstandard = None  # type: ignore
+
+# The directory (under the storage directory) holding content-addressed blobs
+OBJECTS_DIR = 'objects'
+
+# Size (in bytes) of the chunks read when hashing a file
+HASH_CHUNK_SIZE = 64 * 1024
+
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+# The supported artifact compression formats, and their filename extensions
+NO_COMPRESSION = 'none'
+GZIP = 'gzip'
+ZSTD = 'zstd'
+COMPRESSION_EXTENSIONS = {NO_COMPRESSION: '', GZIP: '.gz', ZSTD: '.zst'}
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def fsync_directory(directory: str) -> None:
     """
-    Writes the given string to the given filepath
+    Flushes the entries of the given directory (such as a renamed file) to
+    disk
     """
-    with open(filepath, "w") as fp:
+    fd = os.open(directory or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_file(filepath: str) -> None:
+    """
+    Flushes the contents of the given (already written) file to disk
+    """
+    with open(filepath, "rb") as fp:
+        os.fsync(fp.fileno())
+
+
+class SyncGroup:
+    """
+    Group of written files whose flushes to disk are deferred until
+    "commit", so that several files (such as the artifacts of one iteration)
+    are flushed together (giving the operating system the chance to write
+    them out in the meantime), with each directory flushed only once.
+
+    Files in the group are renamed into place as soon as they are written,
+    so that they can be read straight away, but are not necessarily on disk
+    until the group is committed. A crash before then may leave a file in the
+    group missing, empty or truncated, under its final name. Nothing that
+    outlives a crash (such as the last success) should refer to a file in the
+    group until the group has been committed.
+    """
+    def __init__(self) -> None:
+        self.filepaths: List[str] = []
+        self.lock = threading.Lock()
+
+    def add(self, filepath: str) -> None:
+        """
+        Adds the given (written) file to the group
+        """
+        with self.lock:
+            self.filepaths.append(filepath)
+
+    def commit(self) -> int:
+        """
+        Flushes the files in the group, and their directories, to disk,
+        returning the number of files flushed. Files that have since been
+        removed are skipped.
+        """
+        with self.lock:
+            filepaths = list(dict.fromkeys(self.filepaths))
+            self.filepaths.clear()
+
+        synced_filepaths = []
+        for filepath in filepaths:
+            try:
+                fsync_file(filepath)
+            except FileNotFoundError:
+                continue
+            synced_filepaths.append(filepath)
+
+        for directory in dict.fromkeys(os.path.dirname(filepath) for filepath in filepaths):
+            fsync_directory(directory)
+
+        return len(synced_filepaths)
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[{len(self.filepaths)} files]"
+
+
+@contextlib.contextmanager
+def atomic_write(filepath: str, mode: str = "w", sync_group: Optional[SyncGroup] = None) -> Iterator[IO[Any]]:
+    """
+    Yields a file object (opened with the given mode) for writing the given
+    filepath, which is only replaced once the file object is closed without
+    an exception, so a failure while writing never leaves a partially
+    written file.
+
+    The data is written to a temporary file, flushed to disk, and then
+    renamed to the filepath, with the rename also flushed to disk, so that
+    (even after a crash) the filepath holds either the previous or the new
+    contents. If a SyncGroup is provided, both flushes are deferred to the
+    group: the file is still replaced once the file object is closed, but is
+    only guaranteed to hold the new contents after a crash once the group is
+    committed (see "SyncGroup").
+    """
+    file_temp_filepath = temp_filepath(filepath)
+    try:
+        with open(file_temp_filepath, mode) as fp:
+            yield fp
+            if sync_group is None:
+                fp.flush()
+                os.fsync(fp.fileno())
+        os.replace(file_temp_filepath, filepath)
+    finally:
+        if os.path.exists(file_temp_filepath):
+            os.remove(file_temp_filepath)
+
+    if sync_group is None:
+        fsync_directory(os.path.dirname(filepath))
+    else:
+        sync_group.add(filepath)
+
+
+def write_to_file(filepath: str, contents: str, sync_group: Optional[SyncGroup] = None) -> None:
+    """
+    Atomically writes the given string to the given filepath (see
+    "atomic_write")
+    """
+    with atomic_write(filepath, "w", sync_group) as fp:
         fp.write(contents)
+
+
+def storage_config_from_env() -> Dict[str, str]:
+    """
+    Returns the artifact storage settings from the environment, for inclusion
+    in a job configuration.
+    """
+    return {
+        'dedupe_artifacts': os.getenv('DEDUPE_ARTIFACTS', default="false"),
+        'artifact_compression': os.getenv('ARTIFACT_COMPRESSION', default=NO_COMPRESSION),
+    }
+
+
+def validate_compression(compression: str) -> str:
+    """
+    Returns the given compression format (in lowercase), raising a ValueError
+    if it is unknown, or (for "zstd") the "zstandard" package is not
+    installed.
+    """
+    compression = (compression or NO_COMPRESSION).lower()
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise ValueError(f"Unknown artifact compression: '{compression}'")
+    if compression == ZSTD and zstandard is None:
+        raise ValueError("The 'zstandard' package is required for 'zstd' artifact compression")
+    return compression
+
+
+@contextlib.contextmanager
+def compressing_writer(fp: BinaryIO, compression: str) -> Iterator[BinaryIO]:
+    """
+    Yields a binary file object that compresses everything written to it
+    (using the given compression format) into the given file object.
+
+    The output only depends on the data written, so identical contents are
+    always compressed to identical bytes.
+    """
+    if compression == GZIP:
+        with gzip.GzipFile(filename='', mode='wb', fileobj=fp, mtime=0) as gzip_fp:
+            yield cast(BinaryIO, gzip_fp)
+    elif compression == ZSTD:
+        with zstandard.ZstdCompressor().stream_writer(fp, closefd=False) as zstd_fp:
+            yield cast(BinaryIO, zstd_fp)
+    else:
+        yield fp
+
+
+def open_artifact(filepath: str) -> TextIO:
+    """
+    Opens the given artifact for reading as text, transparently decompressing
+    it if it is gzip or zstd compressed (as determined from its first bytes).
+    """
+    with open(filepath, "rb") as fp:
+        magic = fp.read(len(ZSTD_MAGIC))
+
+    if magic.startswith(GZIP_MAGIC):
+        return cast(TextIO, gzip.open(filepath, "rt", encoding='utf-8'))
+
+    if magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError(f"The 'zstandard' package is required to read '{filepath}'")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(filepath, "rb"))
+        return io.TextIOWrapper(reader, encoding='utf-8')
+
+    return open(filepath)
+
+
+def read_artifact(filepath: str) -> str:
+    """
+    Returns the (decompressed) contents of the given artifact
+    """
+    with open_artifact(filepath) as fp:
+        return fp.read()
+
+
+def file_sha256(filepath: str) -> str:
+    """
+    Returns the hex-encoded SHA-256 digest of the contents of the given file
+    """
+    sha256 = hashlib.sha256()
+    with open(filepath, "rb") as fp:
+        for chunk in iter(lambda: fp.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def temp_filepath(filepath: str) -> str:
+    """
+    Returns a unique temporary filepath in the same directory as the given
+    filepath, so that it can be atomically renamed to the given filepath.
+    """
+    directory, filename = os.path.split(filepath)
+    return os.path.join(directory, f".{filename}.{uuid.uuid4().hex}.tmp")
+
+
+class ArtifactWriter:
+    """
+    Writes the artifacts (such as request and response bodies) of a job to
+    their filepaths in the storage directory.
+
+    If an "objects_dir" is provided, artifacts are content-addressed: the
+    contents of each artifact are stored once, as a read-only "blob" file
+    named by its SHA-256 digest, and the artifact filepath is a hard link to
+    the blob (or a copy, where hard links are not supported). Artifacts with
+    identical contents (such as unchanged source responses) then share a
+    single blob, instead of each taking up disk space.
+
+    Artifacts are compressed using the given compression format ("none",
+    "gzip" or "zstd"). Compressed artifacts should be read using
+    "open_artifact" or "read_artifact".
+
+    Artifacts are written atomically (see "atomic_write"). If a SyncGroup is
+    provided, artifacts are flushed to disk when the group is committed,
+    rather than as each one is written. Blobs are always flushed to disk
+    before they are given their (digest) filename, as an existing blob is
+    reused by later jobs without being checked.
+    """
+    def __init__(self, objects_dir: Optional[str] = None, compression: str = NO_COMPRESSION,
+                 sync_group: Optional[SyncGroup] = None):
+        self.objects_dir = objects_dir
+        self.compression = validate_compression(compression)
+        self.sync_group = sync_group
+
+    @contextlib.contextmanager
+    def open_for_write(self, filepath: str) -> Iterator[BinaryIO]:
+        """
+        Yields a binary file object for writing (such as when streaming a
+        response body) the artifact at the given filepath, compressing the
+        written data. Artifacts written this way should then be passed to
+        "add_file".
+        """
+        with atomic_write(filepath, "wb", self.sync_group) as fp:
+            with compressing_writer(cast(BinaryIO, fp), self.compression) as artifact_fp:
+                yield artifact_fp
+
+    def blob_filepath(self, digest: str) -> str:
+        """
+        Returns the filepath of the blob with the given digest
+        """
+        return os.path.join(str(self.objects_dir), digest[:2], digest)
+
+    def write_text(self, filepath: str, contents: str) -> None:
+        """
+        Writes the given string as the artifact at the given filepath
+        """
+        if self.compression == NO_COMPRESSION:
+            data = contents.encode('utf-8')
+        else:
+            buffer = io.BytesIO()
+            with compressing_writer(buffer, self.compression) as fp:
+                fp.write(contents.encode('utf-8'))
+            data = buffer.getvalue()
+
+        if self.objects_dir is None:
+            with atomic_write(filepath, "wb", self.sync_group) as fp:
+                fp.write(data)
+            return
+
+        blob_filepath = self.blob_filepath(hashlib.sha256(data).hexdigest())
+        if not os.path.exists(blob_filepath):
+            os.makedirs(os.path.dirname(blob_filepath), exist_ok=True)
+            with atomic_write(blob_filepath, "wb") as fp:
+                fp.write(data)
+                os.fchmod(fp.fileno(), READ_ONLY)
+
+        self.link(blob_filepath, filepath)
+
+    def add_file(self, filepath: str) -> None:
+        """
+        Adds the already written file at the given filepath (such as a
+        streamed response body) as an artifact, replacing it with a link to
+        an existing blob with the same contents, if there is one.
+        """
+        if self.objects_dir is None:
+            return
+
+        blob_filepath = self.blob_filepath(file_sha256(filepath))
+        if os.path.exists(blob_filepath):
+            self.link(blob_filepath, filepath)
+            return
+
+        # The file becomes the blob (once its contents are on disk)
+        os.makedirs(os.path.dirname(blob_filepath), exist_ok=True)
+        os.chmod(filepath, READ_ONLY)
+        fsync_file(filepath)
+        self.link(filepath, blob_filepath)
+
+    def link(self, source_filepath: str, filepath: str) -> None:
+        """
+        Atomically replaces the given filepath with a hard link to (or, if
+        hard links are not supported, a copy of) the given source file.
+        """
+        link_temp_filepath = temp_filepath(filepath)
+        try:
+            os.link(source_filepath, link_temp_filepath)
+        except OSError:
+            shutil.copyfile(source_filepath, link_temp_filepath)
+            os.chmod(link_temp_filepath, READ_ONLY)
+        os.replace(link_temp_filepath, filepath)
+
+        if self.sync_group is None:
+            fsync_file(filepath)
+            fsync_directory(os.path.dirname(filepath))
+        else:
+            self.sync_group.add(filepath)
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[objects_dir: {self.objects_dir}, compression: {self.compression}]"
+
+
+def remove_orphaned_blobs(objects_dir: str) -> int:
+    """
+    Removes any blobs in the given objects directory that are no longer
+    linked to by an artifact, returning the number of blobs removed.
+    """
+    removed = 0
+    for directory, _, filenames in os.walk(objects_dir):
+        for filename in filenames:
+            blob_filepath = os.path.join(directory, filename)
+            if os.stat(blob_filepath).st_nlink == 1:
+                os.remove(blob_filepath)
+                removed = removed + 1
+    return removed
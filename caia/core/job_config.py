@@ -1,9 +1,14 @@
 import os
+import threading
 import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Optional
 
-import yaml
+from caia.core.application_config import ApplicationConfig, get_application_config
+from caia.core.http import DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE, DEFAULT_RETRY_BUDGET, HttpSessionManager, \
+    RetryBudget, RetryPolicy, get_session_manager
+from caia.core.io import COMPRESSION_EXTENSIONS, NO_COMPRESSION, OBJECTS_DIR, ArtifactWriter, SyncGroup, \
+    validate_compression
 
 
 class JobConfig(Dict[str, str]):
@@ -17,23 +22,94 @@ class JobConfig(Dict[str, str]):
 
         self['job_id'] = JobIdGenerator.create_id(job_id_prefix, timestamp)
 
-        # Import YAML configuration file
-        application_config_file = "etc/config.yaml"
-        with open(application_config_file) as f:
-            self.__application_config = yaml.load(f, Loader=yaml.FullLoader)
-
         self.update(config)
 
+        self.__application_config: Optional[ApplicationConfig] = None
+
+        self.__retry_budget: Optional[RetryBudget] = None
+        self.__retry_budget_lock = threading.Lock()
+
+        self.__sync_group: Optional[SyncGroup] = None
+        self.__sync_group_lock = threading.Lock()
+
     @property
-    def application_config(self) -> Any:
+    def application_config(self) -> ApplicationConfig:
+        """
+        Returns the application configuration (see "get_application_config")
+        from the "application_config_filepath" of this JobConfig (if
+        provided), loaded when first used, and then kept for the rest of
+        the job
+        """
+        if self.__application_config is None:
+            self.__application_config = get_application_config(self.get('application_config_filepath'))
         return self.__application_config
 
+    @property
+    def http_session_manager(self) -> HttpSessionManager:
+        """
+        Returns the shared HttpSessionManager configured by the
+        "http_pool_connections", "http_pool_maxsize" and "http_keep_alive"
+        values of this JobConfig (using defaults when not provided)
+        """
+        pool_connections = int(self.get('http_pool_connections') or DEFAULT_POOL_CONNECTIONS)
+        pool_maxsize = int(self.get('http_pool_maxsize') or DEFAULT_POOL_MAXSIZE)
+        keep_alive = (self.get('http_keep_alive') or 'true').lower() != 'false'
+        return get_session_manager(pool_connections, pool_maxsize, keep_alive)
+
+    @property
+    def artifact_writer(self) -> ArtifactWriter:
+        """
+        Returns the ArtifactWriter for the artifacts of this job, which stores
+        artifacts as content-addressed blobs under the "storage_dir" if the
+        "dedupe_artifacts" value is "true", compressed using the
+        "artifact_compression" format
+
+        Artifacts are flushed to disk when the "sync_group" of this job is
+        committed.
+        """
+        compression = self.get('artifact_compression') or NO_COMPRESSION
+        if (self.get('dedupe_artifacts') or 'false').lower() == 'true' and self.get('storage_dir'):
+            return ArtifactWriter(os.path.join(self['storage_dir'], OBJECTS_DIR), compression, self.sync_group)
+        return ArtifactWriter(None, compression, self.sync_group)
+
+    @property
+    def sync_group(self) -> SyncGroup:
+        """
+        Returns the SyncGroup shared by all the artifacts written by this
+        job, which is committed before each last success is recorded
+        """
+        with self.__sync_group_lock:
+            if self.__sync_group is None:
+                self.__sync_group = SyncGroup()
+            return self.__sync_group
+
+    @property
+    def retry_budget(self) -> RetryBudget:
+        """
+        Returns the RetryBudget shared by all HTTP requests made by this job,
+        as configured by the "http_retry_budget" value (in seconds)
+        """
+        with self.__retry_budget_lock:
+            if self.__retry_budget is None:
+                self.__retry_budget = RetryBudget(float(self.get('http_retry_budget') or DEFAULT_RETRY_BUDGET))
+            return self.__retry_budget
+
+    def retry_policy(self, endpoint: str) -> RetryPolicy:
+        """
+        Returns the RetryPolicy for the given endpoint (i.e., "source" or
+        "dest"), as configured by the "<endpoint>_retry_*" values
+        """
+        return RetryPolicy.from_config(self, endpoint)
+
     def generate_filepath(self, base_dir: str, file_descriptor: str, file_extension: str,
-                          iteration_count: Optional[int] = None) -> str:
+                          iteration_count: Optional[int] = None, compressed: bool = True) -> str:
         """
         Returns a fully qualified filepath, based one this JobConfig, and
         the given base directory, file descriptor, and extension, and
         an optional iteration count
+
+        Unless "compressed" is False, the extension of the configured
+        "artifact_compression" format (if any) is appended to the filepath.
         """
         job_id = self['job_id']
 
@@ -41,7 +117,12 @@ class JobConfig(Dict[str, str]):
         if iteration_count is not None:
             iteration = f"-{iteration_count}"
 
-        base_filename = f"{job_id}{iteration}.{file_descriptor}.{file_extension}"
+        compression_extension = ""
+        if compressed:
+            compression = validate_compression(self.get('artifact_compression') or NO_COMPRESSION)
+            compression_extension = COMPRESSION_EXTENSIONS[compression]
+
+        base_filename = f"{job_id}{iteration}.{file_descriptor}.{file_extension}{compression_extension}"
         return os.path.join(base_dir, base_filename)
 
     def __str__(self) -> str:
@@ -0,0 +1,178 @@
+import json
+import re
+from typing import Any, Iterator, TextIO
+
+# Size (in characters) of the chunks read from the underlying file
+READ_CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# The separator (and any surrounding whitespace) following an array element
+ELEMENT_SEPARATOR = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+
+# Characters that may follow a complete number
+NUMBER_DELIMITERS = ' \t\n\r,]}'
+
+
+class JsonStreamReader:
+    """
+    Reads JSON tokens and values incrementally from a file, holding at most
+    a chunk of the file (plus any partially read value) in memory.
+    """
+    def __init__(self, fp: TextIO, chunk_size: int = READ_CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """
+        Reads the next chunk from the file into the buffer, discarding
+        already consumed characters. Returns False if the end of the file
+        has been reached.
+        """
+        if self.eof:
+            return False
+
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()  # type: ignore[union-attr]
+            if self.pos < len(self.buffer) or not self._fill():
+                return
+
+    def peek(self) -> str:
+        """
+        Returns the next non-whitespace character, without consuming it
+        """
+        self._skip_whitespace()
+        if self.pos >= len(self.buffer):
+            raise json.JSONDecodeError("Unexpected end of JSON data", self.buffer, self.pos)
+        return self.buffer[self.pos]
+
+    def next_char(self) -> str:
+        """
+        Returns (and consumes) the next non-whitespace character
+        """
+        char = self.peek()
+        self.pos = self.pos + 1
+        return char
+
+    def expect(self, expected: str) -> None:
+        """
+        Consumes the next non-whitespace character, raising a JSONDecodeError
+        if it is not the expected character
+        """
+        if self.peek() != expected:
+            raise json.JSONDecodeError(f"Expecting '{expected}'", self.buffer, self.pos)
+        self.pos = self.pos + 1
+
+    def decode_value(self) -> Any:
+        """
+        Returns (and consumes) the next complete JSON value
+        """
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value may continue in the next chunk
+                if self._fill():
+                    continue
+                raise
+
+            # A number at the end of the buffer may be truncated, so it is
+            # only complete once it is followed by a delimiter
+            if isinstance(value, (int, float)) and not self.eof and \
+                    (end == len(self.buffer) or self.buffer[end] not in NUMBER_DELIMITERS):
+                self._fill()
+                continue
+
+            self.pos = end
+            return value
+
+    def decode_array_elements(self) -> Iterator[Any]:
+        """
+        Yields (and consumes) the elements of the array whose opening bracket
+        has just been consumed, up to and including its closing bracket.
+
+        Each element is decoded directly from the buffer, together with the
+        separator following it, so that a complete element (including any
+        number) is never cut off at the end of the buffer.
+        """
+        if self.peek() == ']':
+            self.pos = self.pos + 1
+            return
+
+        # Decodes a single value at a given position (with no leading
+        # whitespace), as used by "raw_decode"
+        scan_once = self.decoder.scan_once  # type: ignore[attr-defined]
+        match_separator = ELEMENT_SEPARATOR.match
+        while True:
+            try:
+                value, end = scan_once(self.buffer, self.pos)
+                separator = match_separator(self.buffer, end)
+            except (StopIteration, json.JSONDecodeError):
+                separator = None
+
+            if separator is None:
+                # The element, or its separator (or the whitespace before
+                # it), may continue in the next chunk. At the end of the file,
+                # decode it (again) one token at a time, to report any error.
+                if self._fill():
+                    self._skip_whitespace()
+                    continue
+                value = self.decode_value()
+                separator_char = self.next_char()
+                if separator_char not in ',]':
+                    raise json.JSONDecodeError("Expecting ',' delimiter", self.buffer, self.pos - 1)
+                self.pos = self.pos - 1
+                separator = match_separator(self.buffer, self.pos)
+
+            self.pos = separator.end()  # type: ignore[union-attr]
+            yield value
+            if separator.group(1) == ']':  # type: ignore[union-attr]
+                return
+
+
+def iter_json_array(fp: TextIO, key: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Yields the elements of the array at the given key of the top-level JSON
+    object in the given file, one element at a time, without loading the
+    whole document into memory.
+
+    Nothing is yielded if the key is not present, or its value is not an
+    array. The values of any other keys are parsed and discarded.
+    """
+    reader = JsonStreamReader(fp, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+
+    while True:
+        name = reader.decode_value()
+        reader.expect(':')
+
+        if name == key and reader.peek() == '[':
+            reader.expect('[')
+            yield from reader.decode_array_elements()
+            return
+
+        # Skip the value of any other key
+        reader.decode_value()
+
+        separator = reader.next_char()
+        if separator == '}':
+            return
+        if separator != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", reader.buffer, reader.pos - 1)
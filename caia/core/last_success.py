@@ -0,0 +1,88 @@
+import os
+import threading
+from typing import Dict, Tuple
+
+from caia.core.io import atomic_write
+
+
+def read_last_success_lookup(last_success_lookup: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Returns the filepath of the last successful source response, and a
+    (possibly empty) Dictionary of the metadata recorded with it, from the
+    given "last success lookup" file.
+
+    The first line of the file is the filepath. Any following lines are
+    "<key>: <value>" metadata entries.
+    """
+    metadata = {}
+    with open(last_success_lookup) as fp:
+        last_success_filepath = fp.readline().strip()
+        for line in fp:
+            key, separator, value = line.partition(':')
+            if separator and key.strip():
+                metadata[key.strip()] = value.strip()
+
+    return last_success_filepath, metadata
+
+
+def write_last_success_lookup(last_success_lookup: str, last_success_filepath: str,
+                              metadata: Dict[str, str]) -> None:
+    """
+    Writes the given filepath of the last successful source response, and
+    the given metadata (empty values are omitted) to the given "last success
+    lookup" file.
+
+    The file is written atomically, and flushed to disk (see "atomic_write"),
+    so a crash while writing never leaves a partially written lookup.
+    """
+    with atomic_write(last_success_lookup) as fp:
+        fp.write(last_success_filepath)
+        for key, value in metadata.items():
+            if value:
+                fp.write(f"\n{key}: {value}")
+
+
+# The last success of each "last success lookup" file (keyed by its absolute
+# filepath) read or written by this process, with the inode, size and
+# modification time of the file when it was read or written
+_last_successes: Dict[str, Tuple[Tuple[int, int, int], str, Dict[str, str]]] = {}
+_last_successes_lock = threading.Lock()
+
+
+def lookup_file_stat(last_success_lookup: str) -> Tuple[int, int, int]:
+    file_stat = os.stat(last_success_lookup)
+    return file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns
+
+
+def get_last_success(last_success_lookup: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Returns the filepath of the last successful source response, and its
+    metadata, from the given "last success lookup" file (see
+    "read_last_success_lookup").
+
+    The last success is kept in memory, so that (in a long-running process)
+    the file is only read again if it has been changed by another process.
+    """
+    key = os.path.abspath(last_success_lookup)
+    file_stat = lookup_file_stat(last_success_lookup)
+    with _last_successes_lock:
+        cached = _last_successes.get(key)
+        if cached is None or cached[0] != file_stat:
+            last_success_filepath, metadata = read_last_success_lookup(last_success_lookup)
+            cached = (file_stat, last_success_filepath, metadata)
+            _last_successes[key] = cached
+        return cached[1], dict(cached[2])
+
+
+def record_last_success(last_success_lookup: str, last_success_filepath: str,
+                        metadata: Dict[str, str]) -> None:
+    """
+    Writes the given last success to the given "last success lookup" file
+    (see "write_last_success_lookup"), and keeps it in memory, for
+    "get_last_success".
+    """
+    key = os.path.abspath(last_success_lookup)
+    with _last_successes_lock:
+        write_last_success_lookup(last_success_lookup, last_success_filepath, metadata)
+        recorded_metadata = {metadata_key: value for metadata_key, value in metadata.items() if value}
+        _last_successes[key] = (lookup_file_stat(last_success_lookup), last_success_filepath, recorded_metadata)
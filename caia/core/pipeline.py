@@ -0,0 +1,206 @@
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from caia.core.io import ArtifactWriter
+from caia.core.step import Step, StepResult, run_step_async
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineStep:
+    """
+    A named step in a Pipeline, which is created (from the results of the
+    steps it depends on) once all those steps have completed successfully.
+    """
+    def __init__(self, name: str, create_step: Callable[[Mapping[str, Any]], Step], depends_on: Sequence[str] = (),
+                 when: Optional[Callable[[Mapping[str, Any]], bool]] = None,
+                 stop_if: Optional[Callable[[Any], bool]] = None,
+                 artifact: Optional[Tuple[str, Callable[[Any], str]]] = None,
+                 stop_on_failure: bool = True):
+        """
+        PipelineStep Constructor
+        name: The name of the step, unique within the pipeline.
+        create_step: Returns the Step to run, given a Dictionary of the names
+                     of the steps in "depends_on" to their results.
+        depends_on: The names of the steps that must complete first.
+        when: If provided, the step is skipped (with a result of None) unless
+              it returns True, given the same Dictionary as "create_step".
+        stop_if: If provided, the pipeline stops (successfully) after the
+                 step, if it returns True given the result of the step.
+        artifact: If provided, the filepath of the artifact to write the
+                  result of the step to, and a function returning the
+                  contents of the artifact, given the result.
+        stop_on_failure: If False, the result of the step is its StepResult,
+                         and the pipeline continues even if it fails.
+        """
+        self.name = name
+        self.create_step = create_step
+        self.depends_on = list(depends_on)
+        self.when = when
+        self.stop_if = stop_if
+        self.artifact = artifact
+        self.stop_on_failure = stop_on_failure
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[name: {self.name}, depends_on: {self.depends_on}]"
+
+
+class Pipeline:
+    """
+    A directed acyclic graph of steps, run on an asyncio event loop.
+
+    Each step is started as soon as all the steps it depends on have
+    completed successfully, so independent steps run concurrently. AsyncSteps
+    run on the event loop, while synchronous Steps (and the "create_step"
+    functions) are run in an executor.
+
+    Steps must be added after the steps they depend on, so the graph cannot
+    contain cycles.
+
+    The artifacts of steps are written (using the given ArtifactWriter) in
+    the executor, without delaying the steps that depend on them. All the
+    artifacts are written before the pipeline completes.
+    """
+    def __init__(self, artifact_writer: Optional[ArtifactWriter] = None):
+        self.artifact_writer = artifact_writer
+        self.steps: Dict[str, PipelineStep] = {}
+
+    def add(self, name: str, create_step: Callable[[Mapping[str, Any]], Step], depends_on: Sequence[str] = (),
+            when: Optional[Callable[[Mapping[str, Any]], bool]] = None,
+            stop_if: Optional[Callable[[Any], bool]] = None,
+            artifact: Optional[Tuple[str, Callable[[Any], str]]] = None,
+            stop_on_failure: bool = True) -> 'Pipeline':
+        """
+        Adds a step to this pipeline (see PipelineStep), returning this
+        pipeline. Raises a ValueError if the name is already used, a step it
+        depends on has not been added, or it has an artifact, but this
+        pipeline has no ArtifactWriter.
+        """
+        if name in self.steps:
+            raise ValueError(f"Duplicate pipeline step: '{name}'")
+
+        unknown_steps = [dependency for dependency in depends_on if dependency not in self.steps]
+        if unknown_steps:
+            raise ValueError(f"Pipeline step '{name}' depends on unknown steps: {unknown_steps}")
+
+        if artifact is not None and self.artifact_writer is None:
+            raise ValueError(f"Pipeline step '{name}' has an artifact, but the pipeline has no artifact writer")
+
+        self.steps[name] = PipelineStep(name, create_step, depends_on, when, stop_if, artifact, stop_on_failure)
+        return self
+
+    def run(self, executor: Optional[Executor] = None) -> StepResult:
+        """
+        Runs this pipeline on a new event loop (see "run_async").
+        """
+        return asyncio.run(self.run_async(executor))
+
+    async def run_async(self, executor: Optional[Executor] = None) -> StepResult:
+        """
+        Runs this pipeline on the running event loop, with any synchronous
+        steps run in the given executor (or the default executor of the loop,
+        if None).
+
+        The result of the returned StepResult is a Dictionary of step names to
+        the results of the steps that completed (or were skipped).
+
+        Once a step fails, or a "stop_if" condition is met, no further steps
+        are started, and the pipeline completes once the steps already running
+        have completed. If a step failed, the errors are those of the first
+        failed step.
+        """
+        loop = asyncio.get_running_loop()
+        results: Dict[str, Any] = {}
+        waiting: List[PipelineStep] = list(self.steps.values())
+        running: Dict['asyncio.Future[StepResult]', PipelineStep] = {}
+        artifact_writes: List['asyncio.Future[None]'] = []
+        failed_step_result: Optional[StepResult] = None
+        stopped = False
+
+        try:
+            while True:
+                if failed_step_result is None and not stopped:
+                    self.start_ready_steps(waiting, running, results, executor)
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+                # Completed steps are handled in the order they were started
+                for future in [running_future for running_future in running if running_future in done]:
+                    pipeline_step = running.pop(future)
+                    step_result = future.result()
+
+                    if not pipeline_step.stop_on_failure:
+                        results[pipeline_step.name] = step_result
+                    elif not step_result.was_successful():
+                        logger.debug(f"Pipeline step '{pipeline_step.name}' failed")
+                        if failed_step_result is None:
+                            failed_step_result = step_result
+                        continue
+                    else:
+                        results[pipeline_step.name] = step_result.get_result()
+
+                    if pipeline_step.artifact is not None:
+                        artifact_writes.append(loop.run_in_executor(
+                            executor, self.write_artifact, pipeline_step.artifact, step_result.get_result()))
+
+                    if pipeline_step.stop_if is not None and pipeline_step.stop_if(step_result.get_result()):
+                        logger.debug(f"Pipeline stopped after step '{pipeline_step.name}'")
+                        stopped = True
+        finally:
+            # Steps that have started, and artifacts, are always completed
+            await asyncio.gather(*running, return_exceptions=True)
+            await asyncio.gather(*artifact_writes)
+
+        if failed_step_result is not None:
+            return StepResult(False, results, failed_step_result.get_errors())
+
+        return StepResult(True, results, [])
+
+    def start_ready_steps(self, waiting: List[PipelineStep], running: Dict['asyncio.Future[StepResult]', PipelineStep],
+                          results: Dict[str, Any], executor: Optional[Executor]) -> None:
+        """
+        Starts (or skips) the waiting steps whose dependencies have all
+        completed, in the order they were added.
+        """
+        ready_steps = self.ready_steps(waiting, results)
+        while ready_steps:
+            for pipeline_step in ready_steps:
+                waiting.remove(pipeline_step)
+                dependency_results = {dependency: results[dependency] for dependency in pipeline_step.depends_on}
+                if pipeline_step.when is not None and not pipeline_step.when(dependency_results):
+                    logger.debug(f"Skipping pipeline step '{pipeline_step.name}'")
+                    results[pipeline_step.name] = None
+                    continue
+
+                logger.debug(f"Starting pipeline step '{pipeline_step.name}'")
+                future = asyncio.ensure_future(self.run_step(pipeline_step, dependency_results, executor))
+                running[future] = pipeline_step
+
+            # Skipped steps may make further steps ready
+            ready_steps = self.ready_steps(waiting, results)
+
+    @staticmethod
+    def ready_steps(waiting: List[PipelineStep], results: Dict[str, Any]) -> List[PipelineStep]:
+        return [pipeline_step for pipeline_step in waiting
+                if all(dependency in results for dependency in pipeline_step.depends_on)]
+
+    @staticmethod
+    async def run_step(pipeline_step: PipelineStep, dependency_results: Mapping[str, Any],
+                       executor: Optional[Executor]) -> StepResult:
+        step = await asyncio.get_running_loop().run_in_executor(executor, pipeline_step.create_step,
+                                                                dependency_results)
+        return await run_step_async(step, executor)
+
+    def write_artifact(self, artifact: Tuple[str, Callable[[Any], str]], result: Any) -> None:
+        filepath, contents = artifact
+        if self.artifact_writer is not None:
+            self.artifact_writer.write_text(filepath, contents(result))
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[steps: {list(self.steps)}]"
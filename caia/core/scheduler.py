@@ -0,0 +1,95 @@
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from caia.core.command import Command, CommandResult
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledCommand:
+    """
+    A command run by a Scheduler every "interval" seconds.
+    """
+    def __init__(self, name: str, command: Command, interval: float):
+        self.name = name
+        self.command = command
+        self.interval = interval
+        self.next_run_time = 0.0
+        self.last_result: Optional[CommandResult] = None
+
+    def __str__(self) -> str:
+        fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"{fullname}@{id(self)}[name: {self.name}, interval: {self.interval}]"
+
+
+class Scheduler:
+    """
+    Runs commands at fixed intervals within the current process, so that
+    process-wide state (such as HTTP connection pools, and the parsed
+    application configuration and denied keys) is reused by every run.
+
+    Commands are run one at a time, each first run when the scheduler
+    starts. A run that is missed (because another run took too long) is
+    skipped, rather than run late.
+    """
+    def __init__(self, scheduled_commands: List[ScheduledCommand], clock: Callable[[], float] = time.monotonic):
+        self.scheduled_commands = scheduled_commands
+        self.clock = clock
+        self.stop_event = threading.Event()
+
+    def stop(self) -> None:
+        """
+        Stops the scheduler, once any command that is running has completed
+        """
+        self.stop_event.set()
+
+    def run(self, args: argparse.Namespace, max_runs: Optional[int] = None) -> int:
+        """
+        Runs the scheduled commands (with the given arguments) until stopped,
+        or "max_runs" commands have been run, returning the number of runs.
+        """
+        start_time = self.clock()
+        for scheduled_command in self.scheduled_commands:
+            scheduled_command.next_run_time = start_time
+
+        run_count = 0
+        while self.scheduled_commands and (max_runs is None or run_count < max_runs):
+            scheduled_command = min(self.scheduled_commands, key=lambda scheduled: scheduled.next_run_time)
+            delay = scheduled_command.next_run_time - self.clock()
+            if self.stop_event.wait(max(delay, 0)):
+                break
+
+            self.run_command(scheduled_command, args)
+            run_count = run_count + 1
+
+            elapsed = self.clock() - scheduled_command.next_run_time
+            missed_runs = int(elapsed // scheduled_command.interval)
+            if missed_runs > 0:
+                logger.warning(f"Skipping {missed_runs} run(s) of {scheduled_command.name}")
+            scheduled_command.next_run_time = scheduled_command.next_run_time + \
+                (missed_runs + 1) * scheduled_command.interval
+
+        return run_count
+
+    @staticmethod
+    def run_command(scheduled_command: ScheduledCommand, args: argparse.Namespace) -> None:
+        """
+        Runs the given command, logging (rather than raising) any errors
+        """
+        start_time = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        logger.info(f"Starting {scheduled_command.name} at {start_time}")
+        try:
+            result = scheduled_command.command(start_time, args)
+        except Exception as ex:
+            logger.exception(ex)
+            result = CommandResult(False, [f"{scheduled_command.name} failed with an exception: {ex}"])
+
+        scheduled_command.last_result = result
+        if result.was_successful():
+            logger.info(f"Completed {scheduled_command.name}")
+        else:
+            logger.error(f"{scheduled_command.name} failed with errors: {result.get_errors()}")
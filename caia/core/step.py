@@ -1,6 +1,8 @@
 import abc
+import asyncio
 import logging
-from typing import Any, List
+from concurrent.futures import Executor
+from typing import Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +52,22 @@ class Step(metaclass=abc.ABCMeta):
         raise NotImplementedError
 
 
+class AsyncStep(Step):
+    """
+    A step implemented as a coroutine, such as one that waits on network I/O,
+    so that it can run concurrently with other steps on an event loop.
+    """
+    @abc.abstractmethod
+    async def execute_async(self) -> StepResult:
+        """
+        Returns the StepResult of the step, as for "execute".
+        """
+        raise NotImplementedError
+
+    def execute(self) -> StepResult:
+        return asyncio.run(self.execute_async())
+
+
 def run_step(step: Step) -> StepResult:
     """
     Runs a step
@@ -58,3 +76,18 @@ def run_step(step: Step) -> StepResult:
     step_result = step.execute()
     logger.debug(f"Completed {step} with result: {step_result}")
     return step_result
+
+
+async def run_step_async(step: Step, executor: Optional[Executor] = None) -> StepResult:
+    """
+    Runs a step on the running event loop. Synchronous steps are run in the
+    given executor (or the default executor of the loop, if None), so that
+    they do not block the loop.
+    """
+    if not isinstance(step, AsyncStep):
+        return await asyncio.get_running_loop().run_in_executor(executor, run_step, step)
+
+    logger.debug(f"Starting {step}")
+    step_result = await step.execute_async()
+    logger.debug(f"Completed {step} with result: {step_result}")
+    return step_result
@@ -2,20 +2,13 @@ import logging
 import os
 from typing import Dict
 
+from caia.core.io import write_to_file
 from caia.core.job_config import JobConfig
+from caia.core.last_success import get_last_success
 
 logger = logging.getLogger(__name__)
 
 
-def get_last_success_filepath(last_success_lookup: str) -> str:
-    """
-    Returns the filepath containing the last successful source response
-    """
-    with open(last_success_lookup) as fp:
-        last_success_filepath = fp.readline().strip()
-        return last_success_filepath
-
-
 class ItemsJobConfig(JobConfig):
     def __init__(self, config: Dict[str, str], job_id_prefix: str = '', timestamp: str = ""):
         super().__init__(config, job_id_prefix, timestamp)
@@ -29,11 +22,12 @@ class ItemsJobConfig(JobConfig):
             if not os.path.exists(last_success_lookup_filepath):
                 logger.warning(f"last_success_lookup file at '{last_success_lookup_filepath} was not found. "
                                "Creating default.")
-                with open(last_success_lookup_filepath, "w") as fp:
-                    fp.write("etc/items_FIRST.json")
+                write_to_file(last_success_lookup_filepath, "etc/items_FIRST.json")
 
         last_success_lookup = config['last_success_lookup']
-        self["last_success_filepath"] = get_last_success_filepath(last_success_lookup)
+        last_success_filepath, last_success_metadata = get_last_success(last_success_lookup)
+        self["last_success_filepath"] = last_success_filepath
+        self["last_success_endtime"] = last_success_metadata.get('endtime', '')
 
     def set_iteration(self, iteration: int) -> None:
         """
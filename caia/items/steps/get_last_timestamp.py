@@ -2,6 +2,7 @@ import json
 import logging
 from typing import Any, Dict, List
 
+from caia.core.io import open_artifact
 from caia.core.step import Step, StepResult
 from caia.items.items_job_config import ItemsJobConfig
 
@@ -10,7 +11,8 @@ logger = logging.getLogger(__name__)
 
 class GetLastTimestamp(Step):
     """
-    Retrieves the query timestamp from the last successful response
+    Retrieves the query timestamp from the last successful response, using
+    the "endtime" recorded in the last success lookup, if there is one
     """
     def __init__(self, job_config: ItemsJobConfig):
         self.job_config = job_config
@@ -31,11 +33,16 @@ class GetLastTimestamp(Step):
         return last_timestamp
 
     def execute(self) -> StepResult:
+        last_success_endtime = self.job_config.get('last_success_endtime')
+        if last_success_endtime:
+            logger.info(f"Last timestamp (from last success lookup): {last_success_endtime}")
+            return StepResult(True, last_success_endtime)
+
         last_success_filepath = self.job_config['last_success_filepath']
         logger.info(f"Retrieving timestamp from: {last_success_filepath}")
 
         # Retrieve source response from last success
-        with open(last_success_filepath) as fp:
+        with open_artifact(last_success_filepath) as fp:
             last_success_response = json.load(fp)
             last_timestamp = self.parse_source_response(last_success_response)
 
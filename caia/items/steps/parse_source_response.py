@@ -1,6 +1,9 @@
 import json
 import logging
+from typing import Union
 
+from caia.core.http import ResponseFile
+from caia.core.io import open_artifact
 from caia.core.step import Step, StepResult
 from caia.items.source_items import SourceItems
 
@@ -10,12 +13,19 @@ logger = logging.getLogger(__name__)
 class ParseSourceResponse(Step):
     """
     Converts the source response into a SourceItems object
+
+    source_response: The source response body, or a ResponseFile containing
+                     the source response body
     """
-    def __init__(self, source_response: str):
+    def __init__(self, source_response: Union[str, ResponseFile]):
         self.source_response = source_response
 
     def execute(self) -> StepResult:
-        obj = json.loads(self.source_response)
+        if isinstance(self.source_response, ResponseFile):
+            with open_artifact(self.source_response.filepath) as fp:
+                obj = json.load(fp)
+        else:
+            obj = json.loads(self.source_response)
         new_items = obj['new']
         updated_items = obj['update']
         end_time = obj['endtime']
@@ -18,14 +18,22 @@ class QuerySourceUrl(Step):
               by the source. Should be may be None on the first iteration
     next_item: The next_item to query for, as returned by the source when
                multiple query iterations are needed.
+    stream_to_file: If True, the response body is streamed directly to the
+                    "source_response_body_filepath" file, and the step result
+                    is a ResponseFile, instead of the response body.
+    output_filepath: The file to stream the response body to, instead of the
+                     "source_response_body_filepath" (such as when
+                     prefetching the next iteration).
     """
     def __init__(self, job_config: ItemsJobConfig, start_time: str, end_time: Optional[str],
-                 next_item: Optional[str]):
+                 next_item: Optional[str], stream_to_file: bool = False, output_filepath: Optional[str] = None):
         self.job_config = job_config
         self.start_time = start_time
         self.end_time = end_time
         self.errors: List[str] = []
         self.next_item = next_item
+        self.stream_to_file = stream_to_file
+        self.output_filepath = output_filepath
 
     def execute(self) -> StepResult:
         source_url = self.job_config['source_url']
@@ -36,9 +44,38 @@ class QuerySourceUrl(Step):
         if self.next_item is not None:
             query_params['nextitem'] = self.next_item
 
-        return http_get_request(source_url, headers, query_params)
+        output_filepath = None
+        if self.stream_to_file:
+            output_filepath = self.output_filepath or self.job_config['source_response_body_filepath']
+
+        step_result = http_get_request(source_url, headers, query_params, self.job_config.http_session_manager,
+                                       self.job_config.retry_policy('source'), self.job_config.retry_budget,
+                                       output_filepath, self.job_config.artifact_writer.open_for_write)
+
+        if output_filepath is not None:
+            self.job_config.artifact_writer.add_file(output_filepath)
+
+        return step_result
 
     def __str__(self) -> str:
         fullname = f"{self.__class__.__module__}.{self.__class__.__name__}"
         return f"{fullname}@{id(self)} [start_time={self.start_time}, end_time={self.end_time}, " \
                f"next_item={self.next_item}]"
+
+
+class PrefetchSourceUrl(QuerySourceUrl):
+    """
+    Queries the source url for the next iteration, while the current
+    iteration is sent (see QuerySourceUrl).
+
+    A prefetch is only an optimization, so any error (including an exception,
+    such as a network error that persists after retries) is returned as a
+    failed StepResult, and the next iteration then queries the source url
+    again.
+    """
+    def execute(self) -> StepResult:
+        try:
+            return super().execute()
+        except Exception as ex:
+            logger.warning(f"Prefetch of next_item '{self.next_item}' failed: {ex}")
+            return StepResult(False, None, [f"Prefetch of next_item '{self.next_item}' failed: {ex}"])
@@ -1,9 +1,8 @@
 import json
 import logging
-from typing import List
+from typing import List, Optional
 
-from caia.core.io import write_to_file
-from caia.core.http import http_post_request
+from caia.core.batching import merge_responses, post_batches
 from caia.core.step import Step, StepResult
 from caia.items.items_job_config import ItemsJobConfig
 
@@ -13,30 +12,41 @@ logger = logging.getLogger(__name__)
 class SendUpdatedItemsToDest(Step):
     """
     Sends request to destination
+
+    If "request_body_filepaths" is provided, each request body file (i.e.,
+    each batch of the request) is sent in turn, and the step result is the
+    aggregate of the responses. Otherwise, the single
+    "dest_updated_items_request_body_filepath" file is sent.
     """
-    def __init__(self, job_config: ItemsJobConfig):
+    def __init__(self, job_config: ItemsJobConfig, request_body_filepaths: Optional[List[str]] = None):
         self.job_config = job_config
+        self.request_body_filepaths = request_body_filepaths
         self.errors: List[str] = []
 
     def execute(self) -> StepResult:
-        dest_request_body_filepath = self.job_config["dest_updated_items_request_body_filepath"]
-
-        with open(dest_request_body_filepath) as fp:
-            body_str = fp.read()
+        request_body_filepaths = self.request_body_filepaths or \
+            [self.job_config["dest_updated_items_request_body_filepath"]]
 
         headers = {'X-API-Key': self.job_config['caiasoft_api_key'], 'Content-Type': 'application/json'}
         dest_url = self.job_config["dest_updates_url"]
 
-        step_result = http_post_request(dest_url, headers, body_str)
-
-        # Write updated items dest response body to a file
-        write_to_file(self.job_config['dest_updated_items_response_body_filepath'], step_result.get_result())
+        # Each updated items dest response body is written to a file
+        step_result = post_batches(self.job_config, dest_url, headers, request_body_filepaths,
+                                   self.job_config['dest_updated_items_response_body_filepath'],
+                                   SendUpdatedItemsToDest.merge_responses)
 
         if step_result.was_successful():
             SendUpdatedItemsToDest.log_response(step_result.get_result())
 
         return step_result
 
+    @staticmethod
+    def merge_responses(response_bodies: List[str]) -> str:
+        """
+        Returns the aggregate of the given (batch) response bodies
+        """
+        return merge_responses(response_bodies, ('total_count', 'updated_count'), ('errors',))
+
     @staticmethod
     def log_response(response_body_text: str) -> None:
         response = json.loads(response_body_text)
@@ -1,6 +1,7 @@
 import logging
-from typing import List
+from typing import List, Optional
 
+from caia.core.last_success import record_last_success
 from caia.core.step import Step, StepResult
 from caia.items.items_job_config import ItemsJobConfig
 
@@ -9,10 +10,14 @@ logger = logging.getLogger(__name__)
 
 class UpdateLastSuccess(Step):
     """
-    Records the filepath of the last successful source response
+    Records the filepath of the last successful source response.
+
+    If the "end_time" of the source response is provided, it is recorded, so
+    that the next job does not need to read it from the source response.
     """
-    def __init__(self, job_config: ItemsJobConfig):
+    def __init__(self, job_config: ItemsJobConfig, end_time: Optional[str] = None):
         self.job_config = job_config
+        self.end_time = end_time
         self.errors: List[str] = []
 
     def execute(self) -> StepResult:
@@ -24,9 +29,13 @@ class UpdateLastSuccess(Step):
                 storage_dir, "source_response_body", "json", int(self.job_config['iteration']))
         self.job_config['last_success_filepath'] = last_success_filepath
 
-        with open(last_success_lookup, "w") as fp:
-            last_success = self.job_config['last_success_filepath']
-            fp.write(last_success)
+        self.job_config['last_success_endtime'] = self.end_time or ''
+
+        # The artifacts of the iteration are flushed to disk before the last
+        # success that refers to them is recorded
+        self.job_config.sync_group.commit()
+        record_last_success(last_success_lookup, last_success_filepath,
+                            {'endtime': self.end_time or ''})
 
         logger.info(f"Last success filepath updated to {last_success_filepath}")
         step_result = StepResult(True, None)
@@ -86,7 +86,8 @@ setup(
     # projects.
     extras_require={  # Optional
        'dev': ['pycodestyle'],
-       'test': ['pytest', 'pytest-cov', 'mbtest==2.5.1', 'mypy'],
+       'test': ['pytest', 'pytest-cov', 'pytest-benchmark', 'mbtest==2.5.1', 'mypy'],
+       'zstd': ['zstandard'],
     },
 
     # If there are data files included in your packages that need to be
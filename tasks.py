@@ -3,8 +3,8 @@ import os
 
 from dotenv import load_dotenv
 from invoke import task
-from caia.circrequests.circrequests_job_config import get_last_success_filepath as circrequests_get_last_success_filepath  # noqa
-from caia.items.items_job_config import get_last_success_filepath as items_get_last_success_filepath
+from caia.core.io import OBJECTS_DIR, remove_orphaned_blobs
+from caia.core.last_success import read_last_success_lookup
 
 
 @task
@@ -21,20 +21,26 @@ def clean_circrequests(c):
         exit(1)
 
     files_to_skip = []
-    # Figure out which JSON file (if any) is used by the last success lookup,
-    # so we don't delete it.
+    # Figure out which JSON and snapshot files (if any) are used by the last
+    # success lookup, so we don't delete them.
     circrequests_last_success_lookup = os.getenv("CIRCREQUESTS_LAST_SUCCESS_LOOKUP")
     last_success_filepath = None
     if os.path.exists(circrequests_last_success_lookup):
-        last_success_filepath = circrequests_get_last_success_filepath(circrequests_last_success_lookup)
+        last_success_filepath, last_success_metadata = read_last_success_lookup(circrequests_last_success_lookup)
         files_to_skip.append(last_success_filepath)
+        last_success_snapshot_filepath = last_success_metadata.get('snapshot', '')
+        if last_success_snapshot_filepath:
+            files_to_skip.append(last_success_snapshot_filepath)
 
     denied_keys = os.getenv("CIRCREQUESTS_DENIED_KEYS")
     if denied_keys and os.path.exists(denied_keys) and os.path.isfile(denied_keys):
         files_to_skip.append(denied_keys)
 
     if circrequests_storage_dir and os.path.exists(circrequests_storage_dir):
-        file_list = glob.glob(os.path.join(circrequests_storage_dir, '*.json'))
+        file_list = glob.glob(os.path.join(circrequests_storage_dir, '*.json')) + \
+            glob.glob(os.path.join(circrequests_storage_dir, '*.json.gz')) + \
+            glob.glob(os.path.join(circrequests_storage_dir, '*.json.zst')) + \
+            glob.glob(os.path.join(circrequests_storage_dir, '*.bin'))
         for file_path in file_list:
             # Skip file if in files_to_skip
             if file_path in files_to_skip:
@@ -44,6 +50,9 @@ def clean_circrequests(c):
             except Exception:
                 print("Error while deleting file : ", file_path)
 
+        # Remove any (content-addressed) blobs no longer used by a file
+        remove_orphaned_blobs(os.path.join(circrequests_storage_dir, OBJECTS_DIR))
+
     log_dir = os.getenv("LOG_DIR")
 
     if not log_dir:
@@ -77,10 +86,12 @@ def clean_items(c):
     item_last_success_lookup = os.getenv("ITEMS_LAST_SUCCESS_LOOKUP")
     last_success_filepath = None
     if os.path.exists(item_last_success_lookup):
-        last_success_filepath = items_get_last_success_filepath(item_last_success_lookup)
+        last_success_filepath, last_success_metadata = read_last_success_lookup(item_last_success_lookup)
 
     if items_storage_dir and os.path.exists(items_storage_dir):
-        file_list = glob.glob(os.path.join(items_storage_dir, '*.json'))
+        file_list = glob.glob(os.path.join(items_storage_dir, '*.json')) + \
+            glob.glob(os.path.join(items_storage_dir, '*.json.gz')) + \
+            glob.glob(os.path.join(items_storage_dir, '*.json.zst'))
         for file_path in file_list:
             # Skip the last_success_filepath
             if last_success_filepath and file_path == last_success_filepath:
@@ -90,6 +101,9 @@ def clean_items(c):
             except Exception:
                 print("Error while deleting file : ", file_path)
 
+        # Remove any (content-addressed) blobs no longer used by a file
+        remove_orphaned_blobs(os.path.join(items_storage_dir, OBJECTS_DIR))
+
 
 @task
 def clean_logs(c):
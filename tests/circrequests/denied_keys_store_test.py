@@ -0,0 +1,133 @@
+import datetime
+import json
+import os
+import tempfile
+
+import pytest
+
+from caia.circrequests.denied_keys_store import JsonDeniedKeysStore, SqliteDeniedKeysStore, \
+    create_denied_keys_store, create_empty_denied_keys_store, keys_due_for_resubmission
+
+june15 = '2020-06-15T11:36:33.032362'
+june20 = '2020-06-20T11:36:33.032362'
+june22 = '2020-06-22T11:36:33.032362'
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def store(request):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = {
+            'denied_keys_filepath': os.path.join(temp_dir, 'denied_keys'),
+            'denied_keys_store': request.param
+        }
+        create_empty_denied_keys_store(config)
+        yield create_denied_keys_store(config)
+
+
+def test_create_denied_keys_store():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'denied_keys')
+        assert isinstance(create_denied_keys_store({'denied_keys_filepath': filepath}), JsonDeniedKeysStore)
+        assert isinstance(create_denied_keys_store({'denied_keys_filepath': filepath, 'denied_keys_store': 'SQLite'}),
+                          SqliteDeniedKeysStore)
+
+        with pytest.raises(ValueError):
+            create_denied_keys_store({'denied_keys_filepath': filepath, 'denied_keys_store': 'redis'})
+
+
+def test_empty_json_store_is_an_empty_dictionary():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'denied_keys.json')
+        create_empty_denied_keys_store({'denied_keys_filepath': filepath})
+        with open(filepath) as fp:
+            assert json.load(fp) == {}
+
+
+def test_store_upsert_get_and_delete(store):
+    assert len(store.load()) == 0
+    assert store.get('key1') is None
+
+    store.upsert({'key1': june15, 'key2': june20})
+    assert store.get('key1') == june15
+    assert dict(store.load()) == {'key1': june15, 'key2': june20}
+
+    store.upsert({'key1': june22})
+    assert store.get('key1') == june22
+
+    store.delete(['key1', 'not_a_key'])
+    assert store.get('key1') is None
+    assert dict(store.load()) == {'key2': june20}
+
+
+def test_store_keys_denied_before(store):
+    store.upsert({'key_june22': june22, 'key_june15': june15, 'key_june20': june20})
+
+    assert store.keys_denied_before(datetime.datetime.fromisoformat(june15)) == []
+    assert store.keys_denied_before(datetime.datetime.fromisoformat('2020-06-21T00:00:00')) == \
+        ['key_june15', 'key_june20']
+    assert store.load().keys_due(datetime.datetime.fromisoformat('2020-06-21T00:00:00'), 0) == \
+        ['key_june15', 'key_june20']
+
+
+def test_keys_due_for_resubmission():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = {
+            'denied_keys_filepath': os.path.join(temp_dir, 'denied_keys'),
+            'denied_items_wait_interval': str(3 * 24 * 60 * 60)
+        }
+        create_empty_denied_keys_store(config)
+        create_denied_keys_store(config).upsert({'key_june15': june15, 'key_june20': june20})
+
+        assert keys_due_for_resubmission(config, datetime.datetime.fromisoformat(june22)) == ['key_june15']
+
+
+def test_store_replace(store):
+    store.upsert({'key1': june15, 'key2': june15, 'key3': june15})
+
+    store.replace({'key2': june15, 'key3': june22, 'key4': june20})
+    assert dict(store.load()) == {'key2': june15, 'key3': june22, 'key4': june20}
+
+    store.replace({})
+    assert len(store.load()) == 0
+
+
+def test_store_load_for_entries(store):
+    store.upsert({'key1': june15, 'key3': june20, 'not_an_entry': june22})
+    entries = [{'barcode': f'key{i}'} for i in range(1, 1200)]
+
+    iterator, denied_keys = store.load_for_entries(entries, 'barcode')
+    assert list(iterator) == entries
+    # Only the denied keys of the entries are needed
+    assert {key: denied_keys[key] for key in ['key1', 'key3']} == {'key1': june15, 'key3': june20}
+    assert 'key2' not in denied_keys
+
+
+def test_sqlite_store_rejects_json_file():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'denied_keys.json')
+        JsonDeniedKeysStore(filepath).write({'key1': june15})
+
+        with pytest.raises(ValueError, match='not a SQLite database'):
+            SqliteDeniedKeysStore(filepath)
+
+
+def test_stores_are_shared():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = {'denied_keys_filepath': os.path.join(temp_dir, 'denied_keys.json')}
+        create_empty_denied_keys_store(config)
+        assert create_denied_keys_store(config) is create_denied_keys_store(config)
+
+
+def test_json_store_reuses_parsed_denied_keys():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'denied_keys.json')
+        store = JsonDeniedKeysStore(filepath)
+        store.write({'1': june15})
+        denied_keys = store.load()
+        assert store.load() is denied_keys
+
+        # Changes by another process are picked up
+        with open(filepath, 'w') as fp:
+            json.dump({'1': june15, '2': june20}, fp)
+        os.utime(filepath, ns=(0, 0))
+        assert dict(store.load()) == {'1': june15, '2': june20}
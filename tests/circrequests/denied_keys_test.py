@@ -0,0 +1,51 @@
+import datetime
+
+from caia.circrequests.denied_keys import DeniedKeys, to_epoch_microseconds
+
+
+def test_to_epoch_microseconds():
+    assert to_epoch_microseconds(datetime.datetime(1970, 1, 1)) == 0
+    assert to_epoch_microseconds(datetime.datetime(1970, 1, 1, 0, 0, 1, 5)) == 1_000_005
+    june22 = datetime.datetime.fromisoformat('2020-06-22T11:36:33.032362')
+    assert to_epoch_microseconds(june22) == 1592825793032362
+
+
+def test_denied_keys_is_a_mapping_of_the_original_timestamps():
+    timestamps = {
+        'key_june22': '2020-06-22T11:36:33.032362',
+        'key_june15': '2020-06-15T11:36:33',
+    }
+    denied_keys = DeniedKeys(timestamps)
+
+    assert len(denied_keys) == 2
+    assert 'key_june15' in denied_keys
+    assert 'key_june20' not in denied_keys
+    assert denied_keys['key_june15'] == '2020-06-15T11:36:33'
+    assert dict(denied_keys) == timestamps
+
+
+def test_denied_keys_keys_due():
+    denied_keys = DeniedKeys({
+        'key_june22': '2020-06-22T11:36:33.032362',
+        'key_june15': '2020-06-15T11:36:33.032362',
+        'key_june20': '2020-06-20T11:36:33.032362',
+    })
+    wait_interval = 3 * 24 * 60 * 60  # 3 days
+
+    assert denied_keys.keys_due(datetime.datetime.fromisoformat('2020-06-18T11:36:33.032362'), wait_interval) == []
+    assert denied_keys.keys_due(datetime.datetime.fromisoformat('2020-06-22T11:36:33.032362'),
+                                wait_interval) == ['key_june15']
+    assert denied_keys.keys_due(datetime.datetime.fromisoformat('2020-06-25T12:00:00'),
+                                wait_interval) == ['key_june15', 'key_june20', 'key_june22']
+
+
+def test_denied_keys_is_due_excludes_exact_wait_interval():
+    denied_keys = DeniedKeys({'key': '2020-06-22T11:36:33.032362'})
+    wait_interval = 3 * 24 * 60 * 60  # 3 days
+
+    # Exactly the wait interval has elapsed
+    cutoff = DeniedKeys.cutoff(datetime.datetime.fromisoformat('2020-06-25T11:36:33.032362'), wait_interval)
+    assert denied_keys.is_due('key', cutoff) is False
+
+    cutoff = DeniedKeys.cutoff(datetime.datetime.fromisoformat('2020-06-25T11:36:33.032363'), wait_interval)
+    assert denied_keys.is_due('key', cutoff) is True
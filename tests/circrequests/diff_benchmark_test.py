@@ -0,0 +1,137 @@
+import datetime
+import time
+
+import pytest
+
+from caia.circrequests.diff import DiffResult, diff
+
+pytest.importorskip("pytest_benchmark")
+
+DENIED_ITEMS_WAIT_INTERVAL = 2 * 24 * 60 * 60  # 2 days
+
+# How much slower than the original algorithm "diff" may be, before
+# "test_diff_is_not_slower_than_baseline" fails (allowing for timing noise)
+BASELINE_TOLERANCE = 1.25
+
+SIZES = [
+    pytest.param(10_000, 5, id="10k"),
+    pytest.param(100_000, 3, id="100k"),
+    pytest.param(1_000_000, 1, id="1M", marks=pytest.mark.large),
+]
+
+
+def synthetic_holds(count, offset=0, modified_every=0):
+    """
+    Yields "count" synthetic holds, starting at the given offset. If
+    "modified_every" is given, every nth hold has a different "stop" value.
+    """
+    for i in range(offset, offset + count):
+        stop = "MCK" if modified_every and i % modified_every == 0 else "CPMCK"
+        yield {"barcode": f"3143{i:010d}", "stop": stop, "patron_id": f"{i:012d}"}
+
+
+def synthetic_diff_args(count):
+    """
+    Returns the arguments for diffing "count" synthetic holds, with 1% of
+    holds deleted, 1% new, and 2% of the rest modified. Holds are generated
+    as the diff consumes them, as when streamed from a source response.
+    """
+    current_time = datetime.datetime.now()
+    denied_keys = {f"3143{i:010d}": "2020-06-22T11:36:33.032362" for i in range(0, count, 1000)}
+    previous = synthetic_holds(count)
+    current = synthetic_holds(count, count // 100, 50)
+    return "barcode", previous, current, denied_keys, current_time, DENIED_ITEMS_WAIT_INTERVAL
+
+
+def baseline_diff(key_field, previous, current, denied_keys, current_time, denied_items_wait_interval):
+    """
+    The original (set-based) diff algorithm, as the baseline for the
+    benchmarks
+    """
+    previous_as_dict = {entry[key_field]: entry for entry in previous}
+    current_as_dict = {entry[key_field]: entry for entry in current}
+    previous_keys = previous_as_dict.keys()
+    current_keys = current_as_dict.keys()
+
+    new_keys = list(set(current_keys) - set(previous_keys))
+    new_entries = [current_as_dict[key] for key in new_keys]
+
+    deleted_keys = list(set(previous_keys) - set(current_keys))
+    deleted_entries = [previous_as_dict[key] for key in deleted_keys]
+
+    modified_keys = [key for key in set(previous_keys) & set(current_keys)
+                     if previous_as_dict[key] != current_as_dict[key]]
+    modified_entries = [current_as_dict[key] for key in modified_keys]
+
+    denied_keys_in_current_set = set(current_keys).intersection(set(denied_keys.keys()))
+    possible_denied_keys_to_add = denied_keys_in_current_set - (set(new_keys) | set(modified_keys))
+
+    denied_keys_to_add = []
+    for key in possible_denied_keys_to_add:
+        time_diff = current_time - datetime.datetime.fromisoformat(denied_keys[key])
+        if denied_items_wait_interval < time_diff.total_seconds():
+            denied_keys_to_add.append(key)
+
+    denied_keys_to_persist = {key: denied_keys[key]
+                              for key in possible_denied_keys_to_add.difference(denied_keys_to_add)}
+    new_entries.extend(current_as_dict[key] for key in denied_keys_to_add)
+
+    return DiffResult(new_entries, modified_entries, deleted_entries, denied_keys_to_persist)
+
+
+def diff_keys(diff_result):
+    """
+    Returns the (order-independent) keys of the entries in the given DiffResult
+    """
+    return ({entry["barcode"] for entry in diff_result.new_entries},
+            {entry["barcode"] for entry in diff_result.modified_entries},
+            {entry["barcode"] for entry in diff_result.deleted_entries},
+            diff_result.denied_keys_to_persist)
+
+
+@pytest.mark.parametrize("diff_function", [diff, baseline_diff], ids=["diff", "baseline"])
+@pytest.mark.parametrize("count,rounds", SIZES)
+def test_diff_benchmark(benchmark, count, rounds, diff_function):
+    # Each size is a separate group, so that "diff" is reported against the
+    # baseline
+    benchmark.group = f"diff {count}"
+
+    def setup():
+        return synthetic_diff_args(count), {}
+
+    diff_result = benchmark.pedantic(diff_function, setup=setup, rounds=rounds, iterations=1)
+
+    assert len(diff_result.deleted_entries) == count // 100
+    assert len(diff_result.modified_entries) == sum(1 for i in range(count // 100, count) if i % 50 == 0)
+
+
+def test_diff_matches_baseline():
+    assert diff_keys(diff(*synthetic_diff_args(10_000))) == diff_keys(baseline_diff(*synthetic_diff_args(10_000)))
+
+
+@pytest.mark.timing
+@pytest.mark.parametrize("count", [pytest.param(100_000, id="100k"),
+                                   pytest.param(1_000_000, id="1M", marks=pytest.mark.large)])
+def test_diff_is_not_slower_than_baseline(benchmark, count):
+    # Times "diff" and the baseline on the same inputs (taking the best of
+    # three runs of each), checking that they agree, and that "diff" has not
+    # regressed beyond the baseline
+    def best_time(diff_function):
+        best = None
+        for i in range(3):
+            args = synthetic_diff_args(count)
+            start = time.perf_counter()
+            diff_result = diff_function(*args)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, diff_result
+
+    def compare():
+        return best_time(diff), best_time(baseline_diff)
+
+    (diff_time, diff_result), (baseline_time, baseline_result) = \
+        benchmark.pedantic(compare, rounds=1, iterations=1)
+
+    assert diff_keys(diff_result) == diff_keys(baseline_result)
+    assert diff_time <= baseline_time * BASELINE_TOLERANCE, \
+        f"diff took {diff_time:.3f}s, against {baseline_time:.3f}s for the baseline"
@@ -1,5 +1,7 @@
 import datetime
-from caia.circrequests.diff import denied_keys_to_resubmit, diff, DiffResult
+from caia.circrequests.diff import compare_fingerprints, denied_keys_to_resubmit, diff, diff_against_snapshot, \
+    DiffResult
+from caia.circrequests.snapshot import fingerprint
 
 
 def test_diff():
@@ -194,3 +196,79 @@ def test_diff_result():
     assert modified_entries.__str__() in str
     assert deleted_entries.__str__() in str
     assert denied_keys_to_persist.__str__() in str
+
+
+def test_diff_against_snapshot():
+    entry1 = {"barcode": "123", "item": "abc"}
+    entry2 = {"barcode": "234", "item": "bcd"}
+    entry3 = {"barcode": "345", "item": "cde"}
+    modified_entry1 = {"barcode": "123", "item": "ABC123"}
+
+    previous = [entry1, entry2]
+    previous_fingerprints = {entry["barcode"]: fingerprint(entry) for entry in previous}
+    current = [modified_entry1, entry3]
+
+    current_time = datetime.datetime.now()
+    denied_items_wait_interval = 2 * 24 * 60 * 60  # 2 days
+
+    snapshot_result = diff_against_snapshot("barcode", previous_fingerprints, current, {},
+                                            current_time, denied_items_wait_interval)
+    assert snapshot_result.new_entries == [entry3]
+    assert snapshot_result.modified_entries == [modified_entry1]
+    assert snapshot_result.deleted_entries == [{"barcode": "234"}]
+    assert snapshot_result.current_fingerprints == {
+        "123": fingerprint(modified_entry1), "345": fingerprint(entry3)
+    }
+
+    # New and modified entries match a diff against the full previous entries
+    diff_result = diff("barcode", previous, current, {}, current_time, denied_items_wait_interval)
+    assert snapshot_result.new_entries == diff_result.new_entries
+    assert snapshot_result.modified_entries == diff_result.modified_entries
+
+    # The current entries are only fingerprinted if requested
+    assert diff_result.current_fingerprints is None
+    diff_result = diff("barcode", previous, current, {}, current_time, denied_items_wait_interval,
+                       with_fingerprints=True)
+    assert diff_result.current_fingerprints == snapshot_result.current_fingerprints
+
+
+def test_compare_fingerprints_only_retains_changed_and_denied_entries():
+    entry1 = {"barcode": "123", "item": "abc"}
+    entry2 = {"barcode": "234", "item": "bcd"}
+    entry3 = {"barcode": "345", "item": "cde"}
+    entry4 = {"barcode": "456", "item": "def"}
+    modified_entry1 = {"barcode": "123", "item": "ABC123"}
+
+    previous_fingerprints = {entry["barcode"]: fingerprint(entry) for entry in [entry1, entry2, entry4]}
+    current = [modified_entry1, entry2, entry3, entry4]
+    denied_keys = {"456": "2020-06-22T11:36:33.032362"}
+
+    current_fingerprints, new_entries, modified_entries, retained_entries = \
+        compare_fingerprints("barcode", previous_fingerprints, current, denied_keys)
+
+    assert current_fingerprints == {entry["barcode"]: fingerprint(entry) for entry in current}
+    assert new_entries == {"345": entry3}
+    assert modified_entries == {"123": modified_entry1}
+    # Unchanged entries are not retained, unless they have a denied key
+    assert retained_entries == {"123": modified_entry1, "345": entry3, "456": entry4}
+
+
+def test_diff_with_duplicate_keys(caplog):
+    entry1 = {"barcode": "123", "item": "abc"}
+    entry2 = {"barcode": "234", "item": "bcd"}
+    duplicate_entry1 = {"barcode": "123", "item": "ABC123"}
+
+    current_time = datetime.datetime.now()
+    denied_items_wait_interval = 2 * 24 * 60 * 60  # 2 days
+
+    # The last entry for a key wins
+    diff_result = diff("barcode", [entry1, entry2], [duplicate_entry1, entry2, entry1], {},
+                       current_time, denied_items_wait_interval)
+    assert diff_result.new_entries == []
+    assert diff_result.modified_entries == []
+    assert diff_result.deleted_entries == []
+    assert "Duplicate key '123'" in caplog.text
+
+    diff_result = diff("barcode", [entry1, entry2], [entry1, entry2, duplicate_entry1], {},
+                       current_time, denied_items_wait_interval)
+    assert diff_result.modified_entries == [duplicate_entry1]
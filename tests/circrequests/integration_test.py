@@ -6,7 +6,7 @@ import pytest
 import tempfile
 
 from json import JSONDecodeError
-from hamcrest import assert_that, is_not
+from hamcrest import assert_that, contains_string, is_not
 from mbtest.imposters import Imposter, Predicate, Response, Stub
 from mbtest.matchers import had_request
 from os import listdir
@@ -231,6 +231,78 @@ def test_dest_returns_denied_key(mock_server):
         os.remove(temp_denied_keys_filename)
 
 
+def test_dest_batch_fails_after_accepted_batches(mock_server):
+    holds = [{'barcode': f"B{i}", 'stop': 'CPMCK', 'patron_id': f"P{i}"} for i in range(3)]
+    src_response = json.dumps({'holds': holds})
+
+    def dest_response(barcode, deny):
+        return json.dumps({'request_count': '1', 'results': [{'item': barcode, 'deny': deny}]})
+
+    # Each hold is sent as a separate batch. The first is accepted (and
+    # denied), and the second fails, so the third is not sent.
+    imposter = Imposter([
+        Stub(Predicate(path="/src"), Response(body=src_response)),
+        Stub(Predicate(path="/dest", method="POST", body='"barcode": "B0"', operator="contains"),
+             Response(body=dest_response('B0', 'Y'))),
+        Stub(Predicate(path="/dest", method="POST", body='"barcode": "B1"', operator="contains"),
+             Response(status_code=500)),
+        Stub(Predicate(path="/dest", method="POST"), Response(body=dest_response('B2', 'N'))),
+        ])
+
+    try:
+        # Create a temporary file to use as last success lookup
+        [temp_success_file_handle, temp_success_filename] = tempfile.mkstemp()
+        with open(temp_success_filename, 'w') as f:
+            f.write('etc/circrequests_FIRST.json')
+
+        # Create a temporary file to use as denied keys file
+        [temp_denied_keys_file_handle, temp_denied_keys_filename] = tempfile.mkstemp()
+        with open(temp_denied_keys_filename, 'w') as f:
+            f.write('{}')
+
+        os.environ['DEST_BATCH_MAX_ITEMS'] = '1'
+        os.environ['DEST_RETRY_MAX_ATTEMPTS'] = '1'
+        start_time = '20200701000000'
+
+        with tempfile.TemporaryDirectory() as temp_storage_dir:
+            with mock_server(imposter) as server:
+                setup_environment(imposter, temp_storage_dir, temp_success_filename, temp_denied_keys_filename)
+
+                result = Command()(start_time, [])
+                assert result.was_successful() is False
+                # The source request, and the first two batches
+                assert 3 == len(server.get_actual_requests()[imposter.port])
+
+            # The denial from the accepted batch is recorded
+            with open(temp_denied_keys_filename) as file:
+                denied_item_time = datetime.datetime.strptime(start_time, '%Y%m%d%H%M%S').isoformat()
+                assert json.load(file) == {'B0': denied_item_time}
+
+            # The next job only sends the holds that were not accepted
+            accepting_imposter = Imposter([
+                Stub(Predicate(path="/src"), Response(body=src_response)),
+                Stub(Predicate(path="/dest", method="POST"), Response(body=dest_response('B1', 'N'))),
+                ])
+            with mock_server(accepting_imposter) as server:
+                setup_environment(accepting_imposter, temp_storage_dir, temp_success_filename,
+                                  temp_denied_keys_filename)
+
+                result = Command()('20200701003000', [])
+                assert result.was_successful() is True
+                assert_that(server, had_request().with_path("/dest").and_method("POST").with_times(2))
+                assert_that(server, is_not(had_request().with_path("/dest").with_body(contains_string('"B0"'))))
+    finally:
+        os.environ.pop('DEST_BATCH_MAX_ITEMS', None)
+        os.environ.pop('DEST_RETRY_MAX_ATTEMPTS', None)
+
+        # Clean up the temporary files
+        os.close(temp_success_file_handle)
+        os.remove(temp_success_filename)
+
+        os.close(temp_denied_keys_file_handle)
+        os.remove(temp_denied_keys_filename)
+
+
 def test_denied_key_wait_interval(mock_server):
     with open("tests/resources/circrequests/valid_src_response.json") as file:
         valid_src_response = file.read()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+import pytest
+
+from caia.circrequests.snapshot import fingerprint, load_snapshot, read_snapshot, write_snapshot
+
+
+def test_fingerprint_ignores_key_order():
+    assert fingerprint({"barcode": "123", "item": "abc"}) == fingerprint({"item": "abc", "barcode": "123"})
+    assert fingerprint({"barcode": "123", "item": "abc"}) != fingerprint({"barcode": "123", "item": "ABC"})
+
+
+def test_write_and_read_snapshot():
+    fingerprints = {
+        "123": fingerprint({"barcode": "123"}),
+        "2345": 0,
+        "ключ": 2**64 - 1,
+    }
+
+    with tempfile.NamedTemporaryFile() as temp_file:
+        write_snapshot(temp_file.name, fingerprints)
+        assert read_snapshot(temp_file.name) == fingerprints
+
+
+def test_write_and_read_empty_snapshot():
+    with tempfile.NamedTemporaryFile() as temp_file:
+        write_snapshot(temp_file.name, {})
+        assert read_snapshot(temp_file.name) == {}
+
+
+def test_read_snapshot_rejects_other_files():
+    with pytest.raises(ValueError):
+        read_snapshot('tests/resources/circrequests/valid_src_response.json')
+
+
+def test_read_snapshot_rejects_truncated_files():
+    with tempfile.NamedTemporaryFile() as temp_file:
+        write_snapshot(temp_file.name, {"123": 1, "234": 2})
+        with open(temp_file.name, "rb") as fp:
+            data = fp.read()
+
+        for length in [4, 16, len(data) - 4]:
+            with open(temp_file.name, "wb") as fp:
+                fp.write(data[:length])
+            with pytest.raises(ValueError):
+                read_snapshot(temp_file.name)
+
+
+def test_write_snapshot_rejects_keys_with_separator():
+    with tempfile.NamedTemporaryFile() as temp_file:
+        with pytest.raises(ValueError):
+            write_snapshot(temp_file.name, {"123": 1, "234\x00345": 2})
+
+
+def test_load_snapshot_keeps_the_latest_snapshot_in_memory():
+    fingerprints = {"123": fingerprint({"barcode": "123"})}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = f"{temp_dir}/snapshot.bin"
+        write_snapshot(filepath, fingerprints)
+        assert load_snapshot(filepath) is fingerprints
+
+        # A changed snapshot file is read again
+        changed_fingerprints = {"234": fingerprint({"barcode": "234"})}
+        other_filepath = f"{temp_dir}/other_snapshot.bin"
+        write_snapshot(other_filepath, changed_fingerprints)
+        os.replace(other_filepath, filepath)
+        assert load_snapshot(filepath) == changed_fingerprints
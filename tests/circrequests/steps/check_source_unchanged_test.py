@@ -0,0 +1,56 @@
+import datetime
+import json
+import os
+import tempfile
+
+from caia.circrequests.steps.check_source_unchanged import CheckSourceUnchanged
+from caia.core.http import ResponseFile
+
+DIGEST = 'a' * 64
+
+
+def check_source_unchanged(denied_keys, digest=DIGEST, last_success_digest=DIGEST, skip_unchanged_source='true'):
+    [temp_denied_keys_file_handle, temp_denied_keys_filename] = tempfile.mkstemp()
+    try:
+        with open(temp_denied_keys_filename, "w") as fp:
+            json.dump(denied_keys, fp)
+
+        config = {
+            'denied_keys_filepath': temp_denied_keys_filename,
+            'denied_items_wait_interval': '604800',
+            'last_success_digest': last_success_digest,
+            'skip_unchanged_source': skip_unchanged_source
+        }
+        source_response = ResponseFile('source_response.json', 200, {}, 0, digest)
+        current_time = datetime.datetime(2020, 6, 15, 12, 0, 0)
+
+        step_result = CheckSourceUnchanged(config, source_response, current_time).execute()
+        assert step_result.was_successful() is True
+        return step_result.get_result()
+    finally:
+        os.close(temp_denied_keys_file_handle)
+        os.remove(temp_denied_keys_filename)
+
+
+def test_unchanged_source():
+    assert check_source_unchanged({}) is True
+
+
+def test_changed_source():
+    assert check_source_unchanged({}, digest='b' * 64) is False
+
+
+def test_no_last_success_digest():
+    assert check_source_unchanged({}, last_success_digest='') is False
+
+
+def test_skip_unchanged_source_disabled():
+    assert check_source_unchanged({}, skip_unchanged_source='false') is False
+
+
+def test_unchanged_source_with_denied_keys_not_yet_due():
+    assert check_source_unchanged({'key1': '2020-06-14T12:00:00'}) is True
+
+
+def test_unchanged_source_with_denied_keys_due():
+    assert check_source_unchanged({'key1': '2020-06-01T12:00:00'}) is False
@@ -1,6 +1,10 @@
 import datetime
+import logging
+import os
+
 from caia.circrequests.circrequests_job_config import CircrequestsJobConfig
 from caia.circrequests.steps.diff_against_last_success import DiffAgainstLastSuccess
+from caia.circrequests.steps.update_last_success import UpdateLastSuccess
 
 
 def test_diff_against_last_success():
@@ -25,3 +29,48 @@ def test_diff_against_last_success():
     diff_result = step_result.get_result()
 
     assert len(diff_result.new_entries) == 1
+
+
+def test_diff_against_last_success_snapshot(tmp_path, caplog):
+    last_success_lookup = tmp_path / 'circrequests_last_success.txt'
+    last_success_lookup.write_text('etc/circrequests_FIRST.json')
+    config = {
+        'storage_dir': str(tmp_path),
+        'last_success_lookup': str(last_success_lookup),
+        'denied_keys_filepath': str(tmp_path / 'circrequests_denied_keys.json'),
+        'denied_items_wait_interval': '604800'
+    }
+
+    # The first job has no snapshot of the last success, but fingerprints the
+    # current entries, which are recorded in a snapshot
+    job_config = CircrequestsJobConfig(config, 'test', '20200701000000')
+    job_config['source_response_body_filepath'] = 'tests/resources/circrequests/valid_src_response.json'
+    assert job_config['last_success_snapshot_filepath'] == ''
+
+    step_result = DiffAgainstLastSuccess(job_config, datetime.datetime.now()).execute()
+    diff_result = step_result.get_result()
+    assert len(diff_result.new_entries) == 1
+    assert len(diff_result.current_fingerprints) == 1
+
+    assert UpdateLastSuccess(job_config, diff_result.current_fingerprints).execute().was_successful() is True
+    snapshot_filepath = job_config['source_response_snapshot_filepath']
+    assert os.path.exists(snapshot_filepath)
+
+    # The next job diffs against the snapshot of the first
+    job_config = CircrequestsJobConfig(config, 'test', '20200701003000')
+    job_config['source_response_body_filepath'] = 'tests/resources/circrequests/valid_src_response.json'
+    assert job_config['last_success_snapshot_filepath'] == snapshot_filepath
+
+    with caplog.at_level(logging.INFO):
+        step_result = DiffAgainstLastSuccess(job_config, datetime.datetime.now()).execute()
+    assert f"Using snapshot: {snapshot_filepath}" in caplog.text
+    assert step_result.get_result().new_entries == []
+    assert len(step_result.get_result().current_fingerprints) == 1
+
+    # A snapshot written in an earlier format is not used
+    with open(snapshot_filepath, 'wb') as fp:
+        fp.write(b'CAIASNP1\x00\x00\x00\x00')
+    job_config['last_success_filepath'] = 'tests/resources/circrequests/valid_src_response_with_no_entries.json'
+    step_result = DiffAgainstLastSuccess(job_config, datetime.datetime.now()).execute()
+    assert step_result.was_successful() is True
+    assert len(step_result.get_result().new_entries) == 1
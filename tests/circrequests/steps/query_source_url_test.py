@@ -1,3 +1,5 @@
+import tempfile
+
 import pytest
 import requests
 from hamcrest import assert_that
@@ -71,3 +73,32 @@ def test_server_does_not_exist():
 
     with pytest.raises(requests.exceptions.ConnectionError):
         query_source_url.execute()
+
+
+def test_valid_response_streamed_to_file(mock_server):
+    with open("tests/resources/circrequests/valid_src_response.json") as file:
+        valid_src_response = file.read()
+
+    # Set up mock server with required behavior
+    imposter = Imposter(Stub(Predicate(path="/holds"),
+                             Response(body=valid_src_response)))
+
+    with tempfile.TemporaryDirectory() as temp_storage_dir, mock_server(imposter) as server:
+        config = {
+            'source_url': f"{imposter.url}/holds",
+            'storage_dir': temp_storage_dir,
+            'last_success_lookup': 'tests/storage/circrequests/circrequests_last_success.txt',
+            'denied_keys_filepath': 'tests/storage/circrequests/circrequests_denied_keys.json'
+        }
+        job_config = CircrequestsJobConfig(config, 'test')
+
+        query_source_url = QuerySourceUrl(job_config, stream_to_file=True)
+
+        step_result = query_source_url.execute()
+
+        assert step_result.was_successful() is True
+        assert_that(server, had_request().with_path("/holds").and_method("GET"))
+
+        response_file = step_result.get_result()
+        assert job_config['source_response_body_filepath'] == response_file.filepath
+        assert valid_src_response == response_file.read_text()
@@ -0,0 +1,188 @@
+import datetime
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from caia.circrequests.circrequests_job_config import CircrequestsJobConfig
+from caia.circrequests.diff import diff_against_snapshot
+from caia.circrequests.snapshot import read_snapshot
+from caia.circrequests.steps.update_last_success import UpdateLastSuccess
+from caia.commands.circrequests import Command, accepted_response_body, unsent_keys
+from caia.core.batching import AcceptedBatches
+from caia.core.last_success import read_last_success_lookup
+from caia.core.step import StepResult
+
+HOLDS = [{'barcode': f"B{i}", 'stop': 'CPMCK', 'patron_id': f"P{i}"} for i in range(4)]
+
+
+def create_job_config(tmp_path):
+    last_success_lookup = tmp_path / 'last_success.txt'
+    last_success_lookup.write_text('etc/circrequests_FIRST.json')
+    config = {
+        'storage_dir': str(tmp_path),
+        'last_success_lookup': str(last_success_lookup),
+        'denied_keys_filepath': str(tmp_path / 'denied_keys.json')
+    }
+    return CircrequestsJobConfig(config, 'test')
+
+
+class CircrequestsHandler(BaseHTTPRequestHandler):
+    """
+    Serves the holds of the server at "/src", and accepts the requests POSTed
+    to "/dest", other than those including a failing barcode of the server
+    (which fail with a 500 status code).
+    """
+    def do_GET(self):
+        self.send_body(200, json.dumps({'holds': self.server.holds}))
+
+    def do_POST(self):
+        request_body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        barcodes = [request['barcode'] for request in request_body['requests']]
+        if self.server.failing_barcodes.intersection(barcodes):
+            self.send_body(500, '')
+            return
+
+        self.server.sent_barcodes.extend(barcodes)
+        results = [{'item': barcode, 'deny': 'N'} for barcode in barcodes]
+        self.send_body(200, json.dumps({'request_count': str(len(barcodes)), 'results': results}))
+
+    def send_body(self, status_code, body):
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def circrequests_server(tmp_path, monkeypatch):
+    """
+    Runs a source and destination server for the circrequests command, which
+    is configured to use it, with a clean store in "tmp_path"
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CircrequestsHandler)
+    server.holds = []
+    server.failing_barcodes = set()
+    server.sent_barcodes = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    storage_dir = tmp_path / 'storage'
+    storage_dir.mkdir()
+    monkeypatch.setenv('CIRCREQUESTS_SOURCE_URL', f"{url}/src")
+    monkeypatch.setenv('CIRCREQUESTS_DEST_URL', f"{url}/dest")
+    monkeypatch.setenv('CIRCREQUESTS_STORAGE_DIR', str(storage_dir))
+    monkeypatch.setenv('CIRCREQUESTS_LAST_SUCCESS_LOOKUP', str(tmp_path / 'circrequests_last_success.txt'))
+    monkeypatch.setenv('CIRCREQUESTS_DENIED_KEYS', str(tmp_path / 'circrequests_denied_keys.json'))
+    monkeypatch.setenv('CAIASOFT_API_KEY', 'TEST_KEY')
+    monkeypatch.setenv('DEST_RETRY_MAX_ATTEMPTS', '1')
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_accepted_response_body():
+    assert accepted_response_body(None) is None
+    assert accepted_response_body(StepResult(True, '{"results": []}')) == '{"results": []}'
+    assert accepted_response_body(StepResult(False, AcceptedBatches([], None), ['Failed'])) is None
+    assert accepted_response_body(StepResult(False, AcceptedBatches(['batch-1.json'], '{"results": []}'),
+                                             ['Failed'])) == '{"results": []}'
+
+
+def test_partial_failure_only_resends_unsent_entries(tmp_path):
+    job_config = create_job_config(tmp_path)
+    diff_result = diff_against_snapshot('barcode', {}, HOLDS, {}, datetime.datetime.now(), 0)
+
+    # The first two holds were accepted (as the first batch), before a batch
+    # failed
+    accepted_request_body_filepath = str(tmp_path / 'dest_request_body-batch-1.json')
+    job_config.artifact_writer.write_text(accepted_request_body_filepath,
+                                          json.dumps({'requests': [{'barcode': 'B0'}, {'barcode': 'B1'}]}))
+    accepted_batches = AcceptedBatches([accepted_request_body_filepath], '{"request_count": "2", "results": []}')
+    send_result = StepResult(False, accepted_batches, ['Batch 2 of 2: Failed'])
+
+    keys = unsent_keys(job_config, diff_result, send_result)
+    assert keys == {'B2', 'B3'}
+    assert unsent_keys(job_config, diff_result, StepResult(True, '{}')) == set()
+
+    step_result = UpdateLastSuccess(job_config, diff_result.current_fingerprints, None, keys).execute()
+    assert step_result.was_successful() is True
+
+    # The next job only sends the holds that were not accepted
+    last_success_filepath, metadata = read_last_success_lookup(job_config['last_success_lookup'])
+    assert os.path.exists(metadata['snapshot'])
+    assert 'digest' not in metadata
+    next_diff_result = diff_against_snapshot('barcode', read_snapshot(metadata['snapshot']), HOLDS, {},
+                                             datetime.datetime.now(), 0)
+    assert sorted(entry['barcode'] for entry in next_diff_result.new_entries) == ['B2', 'B3']
+    assert next_diff_result.modified_entries == []
+
+
+def test_partial_failure_without_snapshot_keeps_last_success(tmp_path):
+    job_config = create_job_config(tmp_path)
+    diff_result = diff_against_snapshot('barcode', {}, HOLDS, {}, datetime.datetime.now(), 0)
+    diff_result.current_fingerprints = None
+
+    # Without fingerprints, the unsent holds cannot be left out of a snapshot,
+    # so the last success is not moved past them
+    step_result = UpdateLastSuccess(job_config, diff_result.current_fingerprints, None, {'B2', 'B3'}).execute()
+    assert step_result.was_successful() is True
+    assert job_config['last_success_filepath'] == 'etc/circrequests_FIRST.json'
+    assert read_last_success_lookup(job_config['last_success_lookup']) == ('etc/circrequests_FIRST.json', {})
+
+
+def test_job_diffs_against_snapshot_of_last_success(circrequests_server, caplog):
+    circrequests_server.holds = HOLDS
+
+    # The first job (from a clean store) sends every hold, and records a
+    # snapshot of them
+    result = Command()('20200701000000', [])
+    assert result.was_successful() is True
+    assert circrequests_server.sent_barcodes == ['B0', 'B1', 'B2', 'B3']
+
+    last_success_filepath, metadata = read_last_success_lookup(os.getenv('CIRCREQUESTS_LAST_SUCCESS_LOOKUP'))
+    snapshot_filepath = metadata['snapshot']
+    assert snapshot_filepath.endswith('.source_response_snapshot.bin')
+    assert sorted(read_snapshot(snapshot_filepath)) == ['B0', 'B1', 'B2', 'B3']
+
+    # The next job diffs against the snapshot, sending only the modified and
+    # new holds
+    circrequests_server.holds = [HOLDS[0], {**HOLDS[1], 'stop': 'MCK'}, HOLDS[2], HOLDS[3],
+                                 {'barcode': 'B4', 'stop': 'CPMCK', 'patron_id': 'P4'}]
+    circrequests_server.sent_barcodes = []
+
+    with caplog.at_level(logging.INFO):
+        result = Command()('20200701003000', [])
+    assert result.was_successful() is True
+    assert f"Using snapshot: {snapshot_filepath}" in caplog.text
+    assert sorted(circrequests_server.sent_barcodes) == ['B1', 'B4']
+
+
+def test_job_resends_holds_of_failed_batches(circrequests_server, monkeypatch):
+    # Each hold is sent as a separate batch, and the batch of "B2" fails, so
+    # "B3" is not sent
+    monkeypatch.setenv('DEST_BATCH_MAX_ITEMS', '1')
+    circrequests_server.holds = HOLDS
+    circrequests_server.failing_barcodes = {'B2'}
+
+    result = Command()('20200701000000', [])
+    assert result.was_successful() is False
+    assert circrequests_server.sent_barcodes == ['B0', 'B1']
+
+    # The next job only sends the holds that were not accepted
+    circrequests_server.failing_barcodes = set()
+    circrequests_server.sent_barcodes = []
+
+    result = Command()('20200701003000', [])
+    assert result.was_successful() is True
+    assert circrequests_server.sent_barcodes == ['B2', 'B3']
@@ -0,0 +1,17 @@
+import subprocess
+import sys
+
+import pytest
+
+from tests.commands.commands_test import CLI_HELP_SCRIPT
+
+pytest.importorskip("pytest_benchmark")
+
+
+def test_cli_import_benchmark(benchmark):
+    # Starts the CLI (configuring all the commands) in a new interpreter, so
+    # that the cost of importing its modules is included
+    def run_cli_help():
+        subprocess.run([sys.executable, '-c', CLI_HELP_SCRIPT], capture_output=True, check=True)
+
+    benchmark.pedantic(run_cli_help, rounds=5, iterations=1)
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+from importlib import import_module
+from pkgutil import iter_modules
+
+from caia import commands
+from caia.commands import COMMANDS
+from caia.core.command import Command
+
+# Modules that should only be imported once a command has been selected
+COMMAND_DEPENDENCIES = ['requests', 'yaml', 'caia.commands.circrequests', 'caia.commands.items']
+
+# Configures the CLI (by printing the help), then prints any of the command
+# dependencies that were imported
+CLI_HELP_SCRIPT = f"""
+import sys
+import caia.cli
+sys.argv = ['caia', '--help']
+try:
+    caia.cli.main()
+except SystemExit:
+    pass
+print(','.join(module for module in {COMMAND_DEPENDENCIES} if module in sys.modules), file=sys.stderr)
+"""
+
+
+def test_all_command_modules_are_declared():
+    module_names = [f"{commands.__name__}.{name}" for finder, name, ispkg in iter_modules(commands.__path__)]
+    assert sorted(module_names) == sorted(command_spec.module_name for command_spec in COMMANDS.values())
+
+
+def test_create_command():
+    for command_spec in COMMANDS.values():
+        assert isinstance(command_spec.create_command(), Command)
+        assert command_spec.name == import_module(command_spec.module_name).__name__.rpartition('.')[2]
+
+
+def test_cli_does_not_import_commands():
+    completed_process = subprocess.run([sys.executable, '-c', CLI_HELP_SCRIPT], capture_output=True, text=True,
+                                       check=True)
+    assert 'circrequests' in completed_process.stdout
+    assert completed_process.stderr.strip() == ''
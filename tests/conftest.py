@@ -2,6 +2,37 @@ import pytest
 from mbtest import server
 
 
+# The markers of tests that are skipped unless their option is given
+OPT_IN_MARKERS = {
+    "large": "--run-large",
+    "timing": "--run-timing",
+}
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-large", action="store_true", default=False,
+                     help="run the tests marked as \"large\" (such as the 1M-hold benchmarks)")
+    parser.addoption("--run-timing", action="store_true", default=False,
+                     help="run the tests marked as \"timing\" (which assert on wall-clock times)")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "large: slow test over large inputs, only run with --run-large")
+    config.addinivalue_line("markers", "timing: test asserting on wall-clock times (so unreliable on shared "
+                                       "machines), only run with --run-timing")
+
+
+def pytest_collection_modifyitems(config, items):
+    for marker, option in OPT_IN_MARKERS.items():
+        if config.getoption(option):
+            continue
+
+        skip = pytest.mark.skip(reason=f"{marker} test, only run with {option}")
+        for item in items:
+            if marker in item.keywords:
+                item.add_marker(skip)
+
+
 @pytest.fixture(scope="session")
 def mock_server(request):
     return server.mock_server(request)
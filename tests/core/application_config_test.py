@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from caia.core.application_config import ApplicationConfig, application_config_filepath, \
+    clear_application_configs, get_application_config
+from caia.core.job_config import JobConfig
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    filepath = tmp_path / 'config.yaml'
+    filepath.write_text("circrequests: {\n  source_key_field: barcode\n}\n")
+    yield str(filepath)
+    clear_application_configs()
+
+
+def test_application_config(config_file):
+    application_config = get_application_config(config_file)
+    assert application_config['circrequests'] == {'source_key_field': 'barcode'}
+    assert application_config.circrequests_source_key_field == 'barcode'
+
+
+def test_application_config_is_shared(config_file):
+    assert get_application_config(config_file) is get_application_config(config_file)
+
+
+def test_application_config_is_reloaded_when_modified(config_file):
+    application_config = get_application_config(config_file)
+
+    with open(config_file, 'w') as fp:
+        fp.write("circrequests: {\n  source_key_field: item_barcode\n}\n")
+    os.utime(config_file, ns=(application_config.mtime_ns + 1_000_000_000, application_config.mtime_ns + 1_000_000_000))
+
+    reloaded_application_config = get_application_config(config_file)
+    assert reloaded_application_config is not application_config
+    assert reloaded_application_config.circrequests_source_key_field == 'item_barcode'
+
+
+def test_application_config_filepath(monkeypatch):
+    monkeypatch.delenv('CAIA_CONFIG', raising=False)
+    assert application_config_filepath() == os.path.abspath('etc/config.yaml')
+
+    monkeypatch.setenv('CAIA_CONFIG', '/tmp/caia/config.yaml')
+    assert application_config_filepath() == '/tmp/caia/config.yaml'
+    assert application_config_filepath('/etc/caia/config.yaml') == '/etc/caia/config.yaml'
+
+
+def test_missing_source_key_field():
+    application_config = ApplicationConfig({'circrequests': {}}, 'config.yaml')
+    with pytest.raises(KeyError):
+        application_config.circrequests_source_key_field
+
+
+def test_job_config_application_config(config_file):
+    job_config = JobConfig({'application_config_filepath': config_file})
+    assert job_config.application_config is get_application_config(config_file)
@@ -0,0 +1,230 @@
+import json
+import os
+import tempfile
+import time
+
+import requests
+from mbtest.imposters import Imposter, Predicate, Response, Stub
+
+import caia.core.batching
+from caia.core.batching import AcceptedBatches, batch_entries, batch_filepath, merge_responses, post_batches, \
+    split_request_body
+from caia.core.job_config import JobConfig
+from caia.core.step import StepResult
+
+
+def test_batch_entries_unlimited():
+    entries = [{'barcode': str(i)} for i in range(10)]
+    assert batch_entries(entries) == [entries]
+    assert batch_entries([]) == []
+
+
+def test_batch_entries_max_items():
+    entries = [{'barcode': str(i)} for i in range(10)]
+    batches = batch_entries(entries, max_items=4)
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert [entry for batch in batches for entry in batch] == entries
+
+
+def test_batch_entries_max_bytes():
+    entries = [{'barcode': str(i)} for i in range(10)]
+    entry_size = len(json.dumps(entries[0]))
+    overhead = len('{"requests": []}')
+
+    # Room for exactly three entries, and their separators
+    max_bytes = overhead + 3 * entry_size + 2 * len(', ')
+    batches = batch_entries(entries, max_bytes=max_bytes, overhead=overhead)
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+    for batch in batches:
+        assert len(json.dumps({'requests': batch})) <= max_bytes
+
+    # An entry larger than the limit is sent by itself
+    assert batch_entries(entries[:2], max_bytes=1) == [[entries[0]], [entries[1]]]
+
+
+def test_split_request_body():
+    request_body = json.dumps({'requests': [{'barcode': str(i)} for i in range(5)]})
+    assert split_request_body(request_body) == [request_body]
+    assert split_request_body(request_body, max_items=5) == [request_body]
+    assert split_request_body(request_body, max_bytes=len(request_body)) == [request_body]
+
+    batches = split_request_body(request_body, max_items=2)
+    assert batches == [
+        '{"requests": [{"barcode": "0"}, {"barcode": "1"}]}',
+        '{"requests": [{"barcode": "2"}, {"barcode": "3"}]}',
+        '{"requests": [{"barcode": "4"}]}'
+    ]
+
+    batches = split_request_body(request_body, max_bytes=len(request_body) - 1)
+    assert len(batches) == 2
+    assert all(len(batch) < len(request_body) for batch in batches)
+
+
+def test_batch_filepath():
+    assert batch_filepath('/storage/caia.items.20200601-abc-1.dest_new_items_request_body.json', 2) == \
+        '/storage/caia.items.20200601-abc-1.dest_new_items_request_body-batch-2.json'
+    assert batch_filepath('/storage/caia.circrequests.20200601-abc.dest_request_body.json.gz', 1) == \
+        '/storage/caia.circrequests.20200601-abc.dest_request_body-batch-1.json.gz'
+
+
+def test_merge_responses():
+    response_bodies = [
+        '{"success": true, "error": "", "request_count": "2", '
+        '"results": [{"item": "1", "deny": "N"}, {"item": "2", "deny": "Y"}]}',
+        '{"success": true, "error": "", "request_count": "1", "results": [{"item": "3", "deny": "N"}]}'
+    ]
+    assert merge_responses(response_bodies[:1], ('request_count',), ('results',)) == response_bodies[0]
+
+    merged = json.loads(merge_responses(response_bodies, ('request_count',), ('results',)))
+    assert merged == {
+        'success': True,
+        'error': '',
+        'request_count': '3',
+        'results': [{'item': '1', 'deny': 'N'}, {'item': '2', 'deny': 'Y'}, {'item': '3', 'deny': 'N'}]
+    }
+
+
+def test_merge_responses_with_error():
+    response_bodies = [
+        '{"success": true, "error": "", "total_count": 2, "updated_count": 2, "errors": []}',
+        '{"success": false, "error": "Invalid item", "total_count": 1, "updated_count": 0, "errors": ["3"]}'
+    ]
+    merged = json.loads(merge_responses(response_bodies, ('total_count', 'updated_count'), ('errors',)))
+    assert merged == {'success': False, 'error': 'Invalid item', 'total_count': 3, 'updated_count': 2,
+                      'errors': ['3']}
+
+
+def test_post_batches_concurrently(mock_server):
+    stubs = [Stub(Predicate(path="/dest", method="POST", body=f'"barcode": "{i}"', operator="contains"),
+                  Response(body=f'{{"request_count": "1", "results": [{{"item": "{i}", "deny": "N"}}]}}',
+                           wait=500))
+             for i in range(3)]
+    imposter = Imposter(stubs)
+
+    with mock_server(imposter), tempfile.TemporaryDirectory() as temp_dir:
+        job_config = JobConfig({'storage_dir': temp_dir, 'dest_max_in_flight': '3'}, 'test')
+        request_body_filepaths = []
+        for i in range(3):
+            request_body_filepath = os.path.join(temp_dir, f"dest_request_body-batch-{i + 1}.json")
+            request_body = json.dumps({'requests': [{'barcode': str(i)}]})
+            job_config.artifact_writer.write_text(request_body_filepath, request_body)
+            request_body_filepaths.append(request_body_filepath)
+
+        response_body_filepath = os.path.join(temp_dir, "dest_response_body.json")
+        start = time.monotonic()
+        step_result = post_batches(job_config, f"{imposter.url}/dest", {}, request_body_filepaths,
+                                   response_body_filepath,
+                                   lambda bodies: merge_responses(bodies, ('request_count',), ('results',)))
+        elapsed = time.monotonic() - start
+
+        assert step_result.was_successful() is True
+        # The batches are sent concurrently, but merged in order
+        assert elapsed < 1.5
+        merged = json.loads(step_result.get_result())
+        assert merged['request_count'] == '3'
+        assert [result['item'] for result in merged['results']] == ['0', '1', '2']
+        for i in range(3):
+            assert os.path.exists(os.path.join(temp_dir, f"dest_response_body-batch-{i + 1}.json"))
+
+
+def test_post_batches_partial_failure(mock_server):
+    stubs = [Stub(Predicate(path="/dest", method="POST", body='"barcode": "1"', operator="contains"),
+                  Response(status_code=500))]
+    stubs += [Stub(Predicate(path="/dest", method="POST", body=f'"barcode": "{i}"', operator="contains"),
+                   Response(body=f'{{"request_count": "1", "results": [{{"item": "{i}", "deny": "N"}}]}}'))
+              for i in (0, 2)]
+    imposter = Imposter(stubs)
+
+    with mock_server(imposter) as server, tempfile.TemporaryDirectory() as temp_dir:
+        job_config = JobConfig({'storage_dir': temp_dir, 'dest_retry_max_attempts': '1'}, 'test')
+        request_body_filepaths = []
+        for i in range(3):
+            request_body_filepath = os.path.join(temp_dir, f"dest_request_body-batch-{i + 1}.json")
+            request_body = json.dumps({'requests': [{'barcode': str(i)}]})
+            job_config.artifact_writer.write_text(request_body_filepath, request_body)
+            request_body_filepaths.append(request_body_filepath)
+
+        response_body_filepath = os.path.join(temp_dir, "dest_response_body.json")
+        step_result = post_batches(job_config, f"{imposter.url}/dest", {}, request_body_filepaths,
+                                   response_body_filepath,
+                                   lambda bodies: merge_responses(bodies, ('request_count',), ('results',)))
+
+        assert step_result.was_successful() is False
+        assert step_result.get_errors()[0].startswith('Batch 2 of 3')
+
+        # The response of the accepted batch is kept, and no further batches
+        # are sent
+        accepted_batches = step_result.get_result()
+        assert isinstance(accepted_batches, AcceptedBatches)
+        assert accepted_batches.request_body_filepaths == request_body_filepaths[:1]
+        assert json.loads(accepted_batches.response_body)['results'] == [{'item': '0', 'deny': 'N'}]
+        with open(response_body_filepath) as fp:
+            assert fp.read() == accepted_batches.response_body
+        assert 2 == len(server.get_actual_requests()[imposter.port])
+
+
+def test_post_batches_concurrent_partial_failure(mock_server):
+    # The first batch fails while the next two are in flight
+    stubs = [Stub(Predicate(path="/dest", method="POST", body='"barcode": "0"', operator="contains"),
+                  Response(status_code=500))]
+    stubs += [Stub(Predicate(path="/dest", method="POST", body=f'"barcode": "{i}"', operator="contains"),
+                   Response(body=f'{{"request_count": "1", "results": [{{"item": "{i}", "deny": "N"}}]}}',
+                            wait=500))
+              for i in range(1, 5)]
+    imposter = Imposter(stubs)
+
+    with mock_server(imposter) as server, tempfile.TemporaryDirectory() as temp_dir:
+        job_config = JobConfig({'storage_dir': temp_dir, 'dest_retry_max_attempts': '1', 'dest_max_in_flight': '3'},
+                               'test')
+        request_body_filepaths = []
+        for i in range(5):
+            request_body_filepath = os.path.join(temp_dir, f"dest_request_body-batch-{i + 1}.json")
+            request_body = json.dumps({'requests': [{'barcode': str(i)}]})
+            job_config.artifact_writer.write_text(request_body_filepath, request_body)
+            request_body_filepaths.append(request_body_filepath)
+
+        response_body_filepath = os.path.join(temp_dir, "dest_response_body.json")
+        step_result = post_batches(job_config, f"{imposter.url}/dest", {}, request_body_filepaths,
+                                   response_body_filepath,
+                                   lambda bodies: merge_responses(bodies, ('request_count',), ('results',)))
+
+        assert step_result.was_successful() is False
+        assert step_result.get_errors()[0].startswith('Batch 1 of 5')
+
+        # The batches in flight are completed, and kept, and the batches that
+        # had not started are not sent
+        accepted_batches = step_result.get_result()
+        assert accepted_batches.request_body_filepaths == request_body_filepaths[1:3]
+        assert [result['item'] for result in json.loads(accepted_batches.response_body)['results']] == ['1', '2']
+        assert 3 == len(server.get_actual_requests()[imposter.port])
+
+
+def test_post_batches_exception(tmp_path, monkeypatch):
+    # The second batch raises a network error (after any retries)
+    def http_post_file(url, headers, body_filepath, *args):
+        if body_filepath.endswith('batch-2.json'):
+            raise requests.exceptions.ConnectionError("Connection refused")
+        return StepResult(True, '{"request_count": "1", "results": [{"item": "0", "deny": "N"}]}')
+
+    monkeypatch.setattr(caia.core.batching, 'http_post_file', http_post_file)
+
+    job_config = JobConfig({'storage_dir': str(tmp_path)}, 'test')
+    request_body_filepaths = []
+    for i in range(3):
+        request_body_filepath = str(tmp_path / f"dest_request_body-batch-{i + 1}.json")
+        job_config.artifact_writer.write_text(request_body_filepath, json.dumps({'requests': [{'barcode': str(i)}]}))
+        request_body_filepaths.append(request_body_filepath)
+
+    response_body_filepath = str(tmp_path / "dest_response_body.json")
+    step_result = post_batches(job_config, "http://example.com/dest", {}, request_body_filepaths,
+                               response_body_filepath,
+                               lambda bodies: merge_responses(bodies, ('request_count',), ('results',)))
+
+    # The exception fails the batch, and the accepted batch is still returned
+    assert step_result.was_successful() is False
+    assert step_result.get_errors() == ["Batch 2 of 3: POST to 'http://example.com/dest' failed: Connection refused"]
+    accepted_batches = step_result.get_result()
+    assert accepted_batches.request_body_filepaths == request_body_filepaths[:1]
+    with open(response_body_filepath) as fp:
+        assert fp.read() == accepted_batches.response_body
+    assert not os.path.exists(str(tmp_path / "dest_response_body-batch-2.json"))
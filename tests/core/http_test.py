@@ -0,0 +1,396 @@
+import email.utils
+import hashlib
+import io
+import os
+import socket
+import tempfile
+import time
+import zlib
+
+import pytest
+import requests
+import urllib3
+
+from hamcrest import assert_that
+from mbtest.imposters import Imposter, Predicate, Response, Stub
+from mbtest.matchers import had_request
+
+from caia.core.http import HttpSessionManager, RetryBudget, RetryPolicy, conditional_request_headers, \
+    encode_request_body, get_session_manager, http_get_request, http_post_file, http_post_request, \
+    parse_retry_after, response_validators, send_request, stream_to_file, validate_content_encoding
+from caia.core.io import GZIP, ArtifactWriter
+from caia.core.job_config import JobConfig
+
+
+def test_session_manager_reuses_session_for_same_host():
+    session_manager = HttpSessionManager()
+
+    session1 = session_manager.get_session("http://example.com/holds")
+    session2 = session_manager.get_session("http://example.com/items?starttime=20200601")
+    assert session1 is session2
+
+
+def test_session_manager_uses_separate_sessions_for_different_hosts():
+    session_manager = HttpSessionManager()
+
+    source_session = session_manager.get_session("http://example.com/holds")
+    dest_session = session_manager.get_session("https://example.org/circrequests")
+    other_port_session = session_manager.get_session("http://example.com:8080/holds")
+    assert source_session is not dest_session
+    assert source_session is not other_port_session
+
+
+def test_session_manager_configures_pool_size():
+    session_manager = HttpSessionManager(pool_connections=2, pool_maxsize=5)
+
+    session = session_manager.get_session("http://example.com/holds")
+    adapter = session.get_adapter("http://example.com/holds")
+    assert adapter._pool_connections == 2
+    assert adapter._pool_maxsize == 5
+
+
+def test_session_manager_keep_alive():
+    session = HttpSessionManager().get_session("http://example.com/holds")
+    assert 'Connection' not in session.headers or session.headers['Connection'] != 'close'
+
+    session = HttpSessionManager(keep_alive=False).get_session("http://example.com/holds")
+    assert session.headers['Connection'] == 'close'
+
+
+def test_session_manager_close():
+    session_manager = HttpSessionManager()
+    session1 = session_manager.get_session("http://example.com/holds")
+    session_manager.close()
+    session2 = session_manager.get_session("http://example.com/holds")
+    assert session1 is not session2
+
+
+def test_get_session_manager_is_shared():
+    assert get_session_manager(3, 7, True) is get_session_manager(3, 7, True)
+    assert get_session_manager(3, 7, True) is not get_session_manager(3, 7, False)
+
+
+def test_job_config_http_session_manager():
+    config = {
+        'http_pool_connections': '4',
+        'http_pool_maxsize': '8',
+        'http_keep_alive': 'false'
+    }
+    job_config1 = JobConfig(config)
+    job_config2 = JobConfig(config)
+
+    session_manager = job_config1.http_session_manager
+    assert session_manager.pool_connections == 4
+    assert session_manager.pool_maxsize == 8
+    assert session_manager.keep_alive is False
+
+    # Job configs with the same settings share connection pools
+    assert job_config2.http_session_manager is session_manager
+
+
+def test_job_config_http_session_manager_defaults():
+    job_config = JobConfig({})
+    assert job_config.http_session_manager is get_session_manager()
+
+
+def test_retry_policy_exponential_backoff():
+    retry_policy = RetryPolicy(max_attempts=5, backoff_factor=0.5, backoff_max=1.5, jitter=0)
+
+    assert retry_policy.delay(1) == 0.5
+    assert retry_policy.delay(2) == 1.0
+    # Delay is capped by backoff_max
+    assert retry_policy.delay(3) == 1.5
+    assert retry_policy.delay(4) == 1.5
+
+
+def test_retry_policy_jitter():
+    retry_policy = RetryPolicy(backoff_factor=1.0, jitter=0.25)
+
+    for i in range(100):
+        delay = retry_policy.delay(1)
+        assert 0.75 <= delay <= 1.25
+
+
+def test_retry_policy_retry_after():
+    retry_policy = RetryPolicy(backoff_factor=0.5, jitter=0)
+    assert retry_policy.delay(1, 7.0) == 7.0
+
+    retry_policy = RetryPolicy(backoff_factor=0.5, jitter=0, respect_retry_after=False)
+    assert retry_policy.delay(1, 7.0) == 0.5
+
+
+def test_retry_policy_from_config():
+    config = {
+        'source_retry_max_attempts': '5',
+        'source_retry_backoff_factor': '2',
+        'source_retry_status_codes': '502, 503',
+        'dest_retry_max_attempts': '',
+    }
+    source_retry_policy = RetryPolicy.from_config(config, 'source')
+    assert source_retry_policy.max_attempts == 5
+    assert source_retry_policy.backoff_factor == 2.0
+    assert source_retry_policy.retry_status_codes == (502, 503)
+    assert source_retry_policy.is_retryable_status(503) is True
+    assert source_retry_policy.is_retryable_status(404) is False
+
+    # Missing or empty values use the defaults
+    dest_retry_policy = RetryPolicy.from_config(config, 'dest')
+    assert dest_retry_policy.max_attempts == RetryPolicy().max_attempts
+    assert dest_retry_policy.retry_status_codes == RetryPolicy().retry_status_codes
+    assert dest_retry_policy.timeout == RetryPolicy().timeout
+
+
+def test_retry_policy_timeouts_from_config():
+    config = {
+        'source_connect_timeout': '2.5',
+        'source_read_timeout': '30',
+        'dest_read_timeout': '',
+    }
+    assert RetryPolicy.from_config(config, 'source').timeout == (2.5, 30.0)
+    assert RetryPolicy.from_config(config, 'dest').timeout == RetryPolicy().timeout
+
+
+def test_get_request_retries_read_timeouts():
+    # A server that accepts connections, but never responds
+    with socket.socket() as server_socket:
+        server_socket.bind(('127.0.0.1', 0))
+        server_socket.listen(5)
+        url = f"http://127.0.0.1:{server_socket.getsockname()[1]}/"
+
+        retry_policy = RetryPolicy(max_attempts=2, backoff_factor=0, jitter=0, read_timeout=0.2)
+        start = time.monotonic()
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            http_get_request(url, {}, session_manager=HttpSessionManager(), retry_policy=retry_policy)
+        # Both attempts timed out, rather than waiting forever
+        assert 0.4 <= time.monotonic() - start < 5
+
+
+class FakeSession:
+    """
+    Returns (or raises) the given outcomes of successive requests in turn,
+    counting the requests
+    """
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.request_count = 0
+
+    def request(self, method, url, **kwargs):
+        self.request_count = self.request_count + 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status_code, retry_after = outcome
+        response = requests.Response()
+        response.status_code = status_code
+        response.raw = io.BytesIO(b'')
+        if retry_after is not None:
+            response.headers['Retry-After'] = retry_after
+        return response
+
+
+def connection_refused_error():
+    reason = urllib3.exceptions.NewConnectionError(None, "Connection refused")
+    return requests.exceptions.ConnectionError(urllib3.exceptions.MaxRetryError(None, "/dest", reason))
+
+
+def test_send_request_retries_idempotent_requests():
+    retry_policy = RetryPolicy(max_attempts=4, backoff_factor=0, jitter=0)
+    session = FakeSession(requests.exceptions.ReadTimeout(), (500, None), connection_refused_error(), (200, None))
+
+    response = send_request(session, 'GET', "http://example.com/holds", retry_policy, sleep=lambda delay: None)
+    assert response.status_code == 200
+    assert session.request_count == 4
+
+
+def test_send_request_does_not_retry_post_that_may_have_been_processed():
+    retry_policy = RetryPolicy(max_attempts=3, backoff_factor=0, jitter=0)
+
+    session = FakeSession(requests.exceptions.ReadTimeout())
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        send_request(session, 'POST', "http://example.com/dest", retry_policy, sleep=lambda delay: None)
+    assert session.request_count == 1
+
+    for status_code, retry_after in [(500, None), (502, None), (503, None), (500, '1')]:
+        session = FakeSession((status_code, retry_after))
+        response = send_request(session, 'POST', "http://example.com/dest", retry_policy, sleep=lambda delay: None)
+        assert response.status_code == status_code
+        assert session.request_count == 1
+
+
+def test_send_request_retries_post_that_was_not_processed():
+    retry_policy = RetryPolicy(max_attempts=5, backoff_factor=0, jitter=0)
+    session = FakeSession(connection_refused_error(), requests.exceptions.ConnectTimeout(), (503, '0'), (429, '0'),
+                          (200, None))
+
+    response = send_request(session, 'POST', "http://example.com/dest", retry_policy, sleep=lambda delay: None)
+    assert response.status_code == 200
+    assert session.request_count == 5
+
+
+def test_retry_budget():
+    retry_budget = RetryBudget(3.0)
+    assert retry_budget.try_spend(2.0) is True
+    assert retry_budget.remaining() == 1.0
+    assert retry_budget.try_spend(1.5) is False
+    assert retry_budget.try_spend(1.0) is True
+    assert retry_budget.remaining() == 0.0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('') is None
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after('not a date') is None
+
+    http_date = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 < parse_retry_after(http_date) <= 60
+
+    past_http_date = email.utils.formatdate(time.time() - 60, usegmt=True)
+    assert parse_retry_after(past_http_date) == 0.0
+
+
+def test_job_config_retry_policy_and_budget():
+    config = {
+        'http_retry_budget': '45',
+        'source_retry_max_attempts': '4',
+        'dest_retry_max_attempts': '2'
+    }
+    job_config = JobConfig(config)
+
+    assert job_config.retry_policy('source').max_attempts == 4
+    assert job_config.retry_policy('dest').max_attempts == 2
+    assert job_config.retry_budget.total_seconds == 45.0
+    # The retry budget is shared by all requests in the job
+    assert job_config.retry_budget is job_config.retry_budget
+
+
+def test_conditional_request_headers():
+    last_modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+    assert conditional_request_headers('', '') == {}
+    assert conditional_request_headers('"v1"', last_modified) == \
+        {'If-None-Match': '"v1"', 'If-Modified-Since': last_modified}
+
+
+def test_response_validators():
+    last_modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+    assert response_validators({'Content-Type': 'application/json'}) == {'etag': '', 'last_modified': ''}
+    assert response_validators({'etag': '"v1"', 'Last-Modified': last_modified}) == \
+        {'etag': '"v1"', 'last_modified': last_modified}
+
+
+def test_conditional_get_request_not_modified(mock_server):
+    imposter = Imposter([Stub(Predicate(path="/holds", headers={'If-None-Match': '"v1"'}),
+                              Response(status_code=304)),
+                         Stub(Predicate(path="/holds"), Response(status_code=304))])
+
+    with mock_server(imposter):
+        headers = conditional_request_headers('"v1"', '')
+        step_result = http_get_request(f"{imposter.url}/holds", headers)
+        assert step_result.was_successful() is True
+
+        # A "304 Not Modified" response to an unconditional request is a failure
+        step_result = http_get_request(f"{imposter.url}/holds", {})
+        assert step_result.was_successful() is False
+
+
+def test_get_request_retries_transient_failures(mock_server):
+    imposter = Imposter(Stub(Predicate(path="/holds"),
+                             [Response(status_code=503), Response(status_code=502), Response(body="OK")]))
+
+    with mock_server(imposter) as server:
+        retry_policy = RetryPolicy(max_attempts=3, backoff_factor=0.01)
+        step_result = http_get_request(f"{imposter.url}/holds", {}, None, None, retry_policy, RetryBudget())
+
+        assert step_result.was_successful() is True
+        assert "OK" == step_result.get_result()
+        assert 3 == len(server.get_actual_requests()[imposter.port])
+
+
+def test_get_request_does_not_retry_non_retryable_status(mock_server):
+    imposter = Imposter(Stub(Predicate(path="/holds"), Response(status_code=404)))
+
+    with mock_server(imposter) as server:
+        retry_policy = RetryPolicy(max_attempts=3, backoff_factor=0.01)
+        step_result = http_get_request(f"{imposter.url}/holds", {}, None, None, retry_policy, RetryBudget())
+
+        assert step_result.was_successful() is False
+        assert 1 == len(server.get_actual_requests()[imposter.port])
+
+
+def test_post_request_stops_retrying_when_budget_is_exhausted(mock_server):
+    imposter = Imposter(Stub(Predicate(path="/dest", method="POST"),
+                             Response(status_code=503, headers={'Retry-After': '1'})))
+
+    with mock_server(imposter) as server:
+        retry_policy = RetryPolicy(max_attempts=10, backoff_factor=0.1, jitter=0, respect_retry_after=False)
+        retry_budget = RetryBudget(0.25)
+        step_result = http_post_request(f"{imposter.url}/dest", {}, "{}", None, retry_policy, retry_budget)
+
+        assert step_result.was_successful() is False
+        # Initial attempt, plus one retry after 0.1 seconds. The second retry
+        # (after 0.2 seconds) would exceed the remaining budget.
+        assert 2 == len(server.get_actual_requests()[imposter.port])
+        assert_that(server, had_request().with_path("/dest").and_method("POST"))
+
+
+def test_stream_to_file_digest():
+    body = b'{"holds": []}' * 10000
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(body)
+
+    [temp_file_handle, temp_filename] = tempfile.mkstemp()
+    try:
+        response_file = stream_to_file(response, temp_filename)
+        assert response_file.size == len(body)
+        assert response_file.digest == hashlib.sha256(body).hexdigest()
+    finally:
+        os.close(temp_file_handle)
+        os.remove(temp_filename)
+
+
+def test_validate_content_encoding():
+    assert validate_content_encoding('') == 'identity'
+    assert validate_content_encoding('GZIP') == 'gzip'
+    assert validate_content_encoding('deflate') == 'deflate'
+    with pytest.raises(ValueError):
+        validate_content_encoding('br')
+
+
+def test_encode_request_body():
+    body = '{"items": ["café"]}' * 10000
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'body.json')
+        ArtifactWriter(compression=GZIP).write_text(filepath, body)
+
+        gzip_body = encode_request_body(filepath, 'gzip')
+        assert gzip_body[:2] == b'\x1f\x8b'
+        assert zlib.decompress(gzip_body, wbits=16 + zlib.MAX_WBITS).decode('utf-8') == body
+
+        deflate_body = encode_request_body(filepath, 'deflate')
+        assert zlib.decompress(deflate_body).decode('utf-8') == body
+        assert len(deflate_body) < len(body)
+
+
+def test_session_manager_content_encoding_disabled():
+    session_manager = HttpSessionManager()
+    session_manager.disable_content_encoding("http://example.com/dest/new")
+    assert session_manager.content_encoding_disabled("http://example.com/dest/updated") is True
+    assert session_manager.content_encoding_disabled("http://example.org/dest") is False
+
+
+def test_post_file_falls_back_to_uncompressed_body(mock_server):
+    imposter = Imposter([Stub(Predicate(path="/dest", method="POST", headers={'Content-Encoding': 'gzip'}),
+                              Response(status_code=415)),
+                         Stub(Predicate(path="/dest", method="POST"), Response(body="OK"))])
+
+    with mock_server(imposter) as server, tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'body.json')
+        ArtifactWriter().write_text(filepath, '{}')
+
+        session_manager = HttpSessionManager()
+        step_result = http_post_file(f"{imposter.url}/dest", {}, filepath, session_manager,
+                                     content_encoding='gzip')
+        assert step_result.was_successful() is True
+        assert 2 == len(server.get_actual_requests()[imposter.port])
+        assert session_manager.content_encoding_disabled(f"{imposter.url}/dest") is True
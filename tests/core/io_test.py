@@ -0,0 +1,216 @@
+import os
+import tempfile
+
+import pytest
+
+from caia.core.io import ArtifactWriter, GZIP, NO_COMPRESSION, OBJECTS_DIR, ZSTD, SyncGroup, atomic_write, \
+    open_artifact, read_artifact, remove_orphaned_blobs, write_to_file
+from caia.core.job_config import JobConfig
+
+
+def test_artifact_writer_without_objects_dir_writes_files():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'artifact.json')
+        ArtifactWriter().write_text(filepath, '{"a": 1}')
+
+        with open(filepath) as fp:
+            assert fp.read() == '{"a": 1}'
+        assert os.listdir(temp_dir) == ['artifact.json']
+
+
+def test_artifact_writer_stores_identical_contents_once():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        objects_dir = os.path.join(temp_dir, OBJECTS_DIR)
+        artifact_writer = ArtifactWriter(objects_dir)
+
+        filepath1 = os.path.join(temp_dir, 'job1.source_response_body.json')
+        filepath2 = os.path.join(temp_dir, 'job2.source_response_body.json')
+        filepath3 = os.path.join(temp_dir, 'job3.source_response_body.json')
+        artifact_writer.write_text(filepath1, '{"holds": []}')
+        artifact_writer.write_text(filepath2, '{"holds": []}')
+        artifact_writer.write_text(filepath3, '{"holds": [1]}')
+
+        with open(filepath2) as fp:
+            assert fp.read() == '{"holds": []}'
+        assert os.path.samefile(filepath1, filepath2)
+        assert not os.path.samefile(filepath1, filepath3)
+
+        blobs = [filename for _, _, filenames in os.walk(objects_dir) for filename in filenames]
+        assert len(blobs) == 2
+
+
+def test_artifact_writer_add_file():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        objects_dir = os.path.join(temp_dir, OBJECTS_DIR)
+        artifact_writer = ArtifactWriter(objects_dir)
+
+        filepath1 = os.path.join(temp_dir, 'job1.source_response_body.json')
+        filepath2 = os.path.join(temp_dir, 'job2.source_response_body.json')
+        for filepath in [filepath1, filepath2]:
+            with open(filepath, "w") as fp:
+                fp.write('{"holds": []}')
+            artifact_writer.add_file(filepath)
+
+        assert os.path.samefile(filepath1, filepath2)
+        assert os.stat(filepath1).st_nlink == 3
+
+
+def test_remove_orphaned_blobs():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        objects_dir = os.path.join(temp_dir, OBJECTS_DIR)
+        artifact_writer = ArtifactWriter(objects_dir)
+
+        filepath1 = os.path.join(temp_dir, 'job1.diff_result.json')
+        filepath2 = os.path.join(temp_dir, 'job2.diff_result.json')
+        artifact_writer.write_text(filepath1, 'first')
+        artifact_writer.write_text(filepath2, 'second')
+
+        os.remove(filepath1)
+        assert remove_orphaned_blobs(objects_dir) == 1
+
+        with open(filepath2) as fp:
+            assert fp.read() == 'second'
+        assert remove_orphaned_blobs(objects_dir) == 0
+
+
+def test_job_config_artifact_writer():
+    assert JobConfig({'storage_dir': '/tmp'}).artifact_writer.objects_dir is None
+
+    job_config = JobConfig({'storage_dir': '/tmp', 'dedupe_artifacts': 'true'})
+    assert job_config.artifact_writer.objects_dir == os.path.join('/tmp', OBJECTS_DIR)
+
+
+@pytest.mark.parametrize("compression", [NO_COMPRESSION, GZIP, ZSTD])
+def test_artifact_writer_compression(compression):
+    if compression == ZSTD:
+        pytest.importorskip("zstandard")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        artifact_writer = ArtifactWriter(None, compression)
+
+        filepath = os.path.join(temp_dir, 'diff_result.json')
+        artifact_writer.write_text(filepath, '{"new_entries": ["café"]}')
+        assert read_artifact(filepath) == '{"new_entries": ["café"]}'
+
+        streamed_filepath = os.path.join(temp_dir, 'source_response_body.json')
+        with artifact_writer.open_for_write(streamed_filepath) as fp:
+            fp.write(b'{"holds": ')
+            fp.write(b'[]}')
+        with open_artifact(streamed_filepath) as fp:
+            assert fp.read() == '{"holds": []}'
+
+        with open(streamed_filepath, "rb") as fp:
+            assert (fp.read(2) == b'{"') is (compression == NO_COMPRESSION)
+
+
+def test_compressed_artifacts_are_deduplicated():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        artifact_writer = ArtifactWriter(os.path.join(temp_dir, OBJECTS_DIR), GZIP)
+
+        filepath1 = os.path.join(temp_dir, 'job1.source_response_body.json.gz')
+        filepath2 = os.path.join(temp_dir, 'job2.source_response_body.json.gz')
+        artifact_writer.write_text(filepath1, '{"holds": []}')
+        with artifact_writer.open_for_write(filepath2) as fp:
+            fp.write(b'{"holds": []}')
+        artifact_writer.add_file(filepath2)
+
+        assert os.path.samefile(filepath1, filepath2)
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        ArtifactWriter(None, 'lzma')
+
+
+def test_job_config_generate_filepath_compression_extension():
+    job_config = JobConfig({'artifact_compression': 'gzip'}, 'test', '20200521132905')
+    assert job_config.generate_filepath('/tmp', 'diff_result', 'json').endswith('.diff_result.json.gz')
+    assert job_config.generate_filepath('/tmp', 'snapshot', 'bin', compressed=False).endswith('.snapshot.bin')
+
+    job_config = JobConfig({}, 'test', '20200521132905')
+    assert job_config.generate_filepath('/tmp', 'diff_result', 'json').endswith('.diff_result.json')
+
+
+def test_atomic_write_replaces_file():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'state.txt')
+        write_to_file(filepath, 'old')
+        write_to_file(filepath, 'new')
+
+        with open(filepath) as fp:
+            assert fp.read() == 'new'
+        assert os.listdir(temp_dir) == ['state.txt']
+
+
+def test_atomic_write_keeps_file_on_error():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'state.txt')
+        write_to_file(filepath, 'old')
+
+        with pytest.raises(RuntimeError):
+            with atomic_write(filepath) as fp:
+                fp.write('partial')
+                raise RuntimeError('Write failed')
+
+        with open(filepath) as fp:
+            assert fp.read() == 'old'
+        assert os.listdir(temp_dir) == ['state.txt']
+
+
+def test_sync_group_defers_syncs_until_commit(monkeypatch):
+    synced_fds = []
+    monkeypatch.setattr(os, 'fsync', lambda fd: synced_fds.append(fd))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sync_group = SyncGroup()
+        artifact_writer = ArtifactWriter(None, NO_COMPRESSION, sync_group)
+        artifact_writer.write_text(os.path.join(temp_dir, 'request.json'), '{}')
+        artifact_writer.write_text(os.path.join(temp_dir, 'response.json'), '{}')
+        assert synced_fds == []
+
+        # Each file, and then the shared directory (once)
+        assert sync_group.commit() == 2
+        assert len(synced_fds) == 3
+        assert sync_group.commit() == 0
+
+
+def test_sync_group_does_not_defer_blob_syncs(monkeypatch):
+    synced_fds = []
+    monkeypatch.setattr(os, 'fsync', lambda fd: synced_fds.append(fd))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sync_group = SyncGroup()
+        artifact_writer = ArtifactWriter(os.path.join(temp_dir, OBJECTS_DIR), NO_COMPRESSION, sync_group)
+
+        # A new blob is flushed (with its directory) before it is named, as
+        # it may be reused by a later job without the group being committed
+        artifact_writer.write_text(os.path.join(temp_dir, 'request.json'), '{}')
+        assert len(synced_fds) == 2
+
+        filepath = os.path.join(temp_dir, 'response.json')
+        with open(filepath, "w") as fp:
+            fp.write('[]')
+        artifact_writer.add_file(filepath)
+        assert len(synced_fds) == 3
+
+        # Only the names of the artifact, and of the blob it became, are
+        # left to the group (their contents are already on disk)
+        assert sync_group.filepaths[0] == os.path.join(temp_dir, 'request.json')
+        assert os.path.samefile(sync_group.filepaths[1], filepath)
+        assert len(sync_group.filepaths) == 2
+
+
+def test_sync_group_skips_removed_files():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sync_group = SyncGroup()
+        filepath = os.path.join(temp_dir, 'response.json')
+        write_to_file(filepath, '{}', sync_group)
+        os.remove(filepath)
+
+        assert sync_group.commit() == 0
+
+
+def test_job_config_sync_group():
+    job_config = JobConfig({})
+    assert job_config.sync_group is job_config.sync_group
+    assert job_config.artifact_writer.sync_group is job_config.sync_group
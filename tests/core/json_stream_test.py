@@ -0,0 +1,81 @@
+import io
+import json
+from json import JSONDecodeError
+
+import pytest
+
+from caia.core.json_stream import iter_json_array
+
+
+def parse(json_str, key, chunk_size=3):
+    return list(iter_json_array(io.StringIO(json_str), key, chunk_size))
+
+
+def test_iter_json_array():
+    json_str = '{"holds": [{"barcode": "123", "stop": "CPMCK"}, {"barcode": "234", "stop": "MCK"}]}'
+    assert parse(json_str, 'holds') == json.loads(json_str)['holds']
+
+
+def test_iter_json_array_with_other_keys():
+    json_str = '{"count": 12345, "meta": {"holds": [1, 2], "text": "a ] } [ , string"}, ' \
+               '"holds": [{"barcode": "123", "nested": {"a": [1, 2, 3]}}, 67890, "text, with ] chars"], ' \
+               '"trailer": null}'
+    assert parse(json_str, 'holds') == json.loads(json_str)['holds']
+
+
+def test_iter_json_array_with_whitespace():
+    json_str = '\n  {\n  "holds" :\n  [\n  {"barcode" : "123"} ,\n  {"barcode": "234"}\n  ]\n  }\n'
+    assert parse(json_str, 'holds') == [{"barcode": "123"}, {"barcode": "234"}]
+
+
+def test_iter_json_array_numbers_split_across_chunks():
+    json_str = '{"holds": [1234567890, 0.000123, -98765e10]}'
+    for chunk_size in range(1, 12):
+        assert parse(json_str, 'holds', chunk_size) == [1234567890, 0.000123, -98765e10]
+
+
+def test_iter_json_array_whitespace_split_across_chunks():
+    holds = [{"barcode": "123", "stop": "CPMCK"}, {"barcode": "234", "stop": "MCK"}, 12345, "text"]
+    json_str = json.dumps({"holds": holds}, indent=8)
+    for chunk_size in range(1, 40):
+        assert parse(json_str, 'holds', chunk_size) == holds
+
+
+def test_iter_json_array_empty_or_missing():
+    assert parse('{}', 'holds') == []
+    assert parse('{"holds": []}', 'holds') == []
+    assert parse('{"holds": null}', 'holds') == []
+    assert parse('{"other": [1, 2]}', 'holds') == []
+
+
+def test_iter_json_array_is_incremental():
+    json_str = '{"holds": [{"barcode": "123"}, {"barcode": "234"}, INVALID'
+    entries = iter_json_array(io.StringIO(json_str), 'holds', 4)
+
+    assert next(entries) == {"barcode": "123"}
+    assert next(entries) == {"barcode": "234"}
+    with pytest.raises(JSONDecodeError):
+        next(entries)
+
+
+def test_iter_json_array_invalid_json():
+    with pytest.raises(JSONDecodeError):
+        parse('', 'holds')
+
+    with pytest.raises(JSONDecodeError):
+        parse('[1, 2]', 'holds')
+
+    with pytest.raises(JSONDecodeError):
+        parse('{"holds": [1 2]}', 'holds')
+
+
+def test_iter_json_array_matches_json_load_for_source_responses():
+    for filepath in ['tests/resources/circrequests/valid_src_response.json',
+                     'tests/resources/circrequests/valid_src_modified_response.1.json',
+                     'tests/resources/circrequests/valid_src_response_with_no_entries.json',
+                     'etc/circrequests_FIRST.json']:
+        with open(filepath) as fp:
+            expected = json.load(fp).get('holds', [])
+
+        with open(filepath) as fp:
+            assert list(iter_json_array(fp, 'holds', 16)) == expected
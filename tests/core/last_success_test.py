@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+from caia.core.last_success import get_last_success, read_last_success_lookup, record_last_success, \
+    write_last_success_lookup
+
+
+def test_read_last_success_lookup_with_only_filepath():
+    with tempfile.NamedTemporaryFile(mode="w") as temp_file:
+        temp_file.write("storage/circrequests/source_response_body.json")
+        temp_file.flush()
+
+        filepath, metadata = read_last_success_lookup(temp_file.name)
+        assert filepath == "storage/circrequests/source_response_body.json"
+        assert metadata == {}
+
+
+def test_write_and_read_last_success_lookup():
+    with tempfile.NamedTemporaryFile() as temp_file:
+        write_last_success_lookup(temp_file.name, "storage/source_response_body.json",
+                                  {"snapshot": "storage/source_response_snapshot.bin", "etag": ""})
+
+        with open(temp_file.name) as fp:
+            # The filepath is the first line, so older readers are unaffected
+            assert fp.readline().strip() == "storage/source_response_body.json"
+
+        filepath, metadata = read_last_success_lookup(temp_file.name)
+        assert filepath == "storage/source_response_body.json"
+        # Empty values are omitted
+        assert metadata == {"snapshot": "storage/source_response_snapshot.bin"}
+
+
+def test_record_and_get_last_success():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        last_success_lookup = os.path.join(temp_dir, "last_success.txt")
+        record_last_success(last_success_lookup, "storage/source_response_body.json",
+                            {"endtime": "202007021300", "etag": ""})
+        assert get_last_success(last_success_lookup) == \
+            ("storage/source_response_body.json", {"endtime": "202007021300"})
+
+        # The lookup file is replaced, leaving no temporary files
+        assert os.listdir(temp_dir) == ["last_success.txt"]
+
+        # Changes by another process are picked up
+        with open(last_success_lookup, "w") as fp:
+            fp.write("etc/items_FIRST.json")
+        os.utime(last_success_lookup, ns=(0, 0))
+        assert get_last_success(last_success_lookup) == ("etc/items_FIRST.json", {})
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from caia.core.io import ArtifactWriter
+from caia.core.pipeline import Pipeline
+from caia.core.step import AsyncStep, Step, StepResult, run_step
+
+
+class ValueStep(Step):
+    def __init__(self, value, success=True, delay=0.0, calls=None):
+        self.value = value
+        self.success = success
+        self.delay = delay
+        self.calls = calls
+
+    def execute(self):
+        time.sleep(self.delay)
+        if self.calls is not None:
+            self.calls.append(self.value)
+        errors = [] if self.success else [f"{self.value} failed"]
+        return StepResult(self.success, self.value, errors)
+
+
+class AsyncValueStep(AsyncStep):
+    def __init__(self, value, delay=0.0):
+        self.value = value
+        self.delay = delay
+
+    async def execute_async(self):
+        await asyncio.sleep(self.delay)
+        return StepResult(True, self.value, [])
+
+
+def test_dependency_results_are_passed_to_dependent_steps():
+    pipeline = Pipeline()
+    pipeline.add('a', lambda results: ValueStep(2))
+    pipeline.add('b', lambda results: ValueStep(3))
+    pipeline.add('sum', lambda results: ValueStep(results['a'] + results['b']), depends_on=['a', 'b'])
+
+    step_result = pipeline.run()
+    assert step_result.was_successful()
+    assert step_result.get_result() == {'a': 2, 'b': 3, 'sum': 5}
+
+
+def test_independent_steps_run_concurrently():
+    pipeline = Pipeline()
+    pipeline.add('sync', lambda results: ValueStep('sync', delay=0.3))
+    pipeline.add('async', lambda results: AsyncValueStep('async', delay=0.3))
+    pipeline.add('other_sync', lambda results: ValueStep('other_sync', delay=0.3))
+
+    start = time.monotonic()
+    step_result = pipeline.run()
+    elapsed = time.monotonic() - start
+
+    assert step_result.was_successful()
+    assert step_result.get_result() == {'sync': 'sync', 'async': 'async', 'other_sync': 'other_sync'}
+    assert elapsed < 0.6
+
+
+def test_failed_step_stops_the_pipeline():
+    calls = []
+    pipeline = Pipeline()
+    pipeline.add('a', lambda results: ValueStep('a', success=False, calls=calls))
+    pipeline.add('b', lambda results: ValueStep('b', calls=calls), depends_on=['a'])
+
+    step_result = pipeline.run()
+    assert not step_result.was_successful()
+    assert step_result.get_errors() == ['a failed']
+    assert calls == ['a']
+
+
+def test_failed_step_lets_running_steps_complete():
+    calls = []
+    pipeline = Pipeline()
+    pipeline.add('slow', lambda results: ValueStep('slow', delay=0.2, calls=calls))
+    pipeline.add('failing', lambda results: ValueStep('failing', success=False, calls=calls))
+    pipeline.add('after_slow', lambda results: ValueStep('after_slow', calls=calls), depends_on=['slow'])
+
+    step_result = pipeline.run()
+    assert not step_result.was_successful()
+    assert step_result.get_errors() == ['failing failed']
+    assert step_result.get_result() == {'slow': 'slow'}
+    assert calls == ['failing', 'slow']
+
+
+def test_skipped_steps():
+    calls = []
+    pipeline = Pipeline()
+    pipeline.add('a', lambda results: ValueStep(0, calls=calls))
+    pipeline.add('b', lambda results: ValueStep(1, calls=calls), depends_on=['a'],
+                 when=lambda results: results['a'] > 0)
+    pipeline.add('c', lambda results: ValueStep(2, calls=calls), depends_on=['b'])
+
+    step_result = pipeline.run()
+    assert step_result.was_successful()
+    assert step_result.get_result() == {'a': 0, 'b': None, 'c': 2}
+    assert calls == [0, 2]
+
+
+def test_stop_if():
+    calls = []
+    pipeline = Pipeline()
+    pipeline.add('a', lambda results: ValueStep('a', calls=calls), stop_if=lambda result: result == 'a')
+    pipeline.add('b', lambda results: ValueStep('b', calls=calls), depends_on=['a'])
+
+    step_result = pipeline.run()
+    assert step_result.was_successful()
+    assert step_result.get_result() == {'a': 'a'}
+    assert calls == ['a']
+
+
+def test_step_failure_without_stopping_the_pipeline():
+    pipeline = Pipeline()
+    pipeline.add('a', lambda results: ValueStep('a', success=False), stop_on_failure=False)
+    pipeline.add('b', lambda results: ValueStep(results['a'].get_errors()), depends_on=['a'])
+
+    step_result = pipeline.run()
+    assert step_result.was_successful()
+    assert step_result.get_result()['b'] == ['a failed']
+
+
+def test_artifacts_are_written(tmp_path):
+    filepath = str(tmp_path / 'result.json')
+    pipeline = Pipeline(ArtifactWriter())
+    pipeline.add('a', lambda results: ValueStep({'value': 1}), artifact=(filepath, json.dumps))
+
+    step_result = pipeline.run()
+    assert step_result.was_successful()
+    with open(filepath) as fp:
+        assert json.load(fp) == {'value': 1}
+
+    with pytest.raises(ValueError):
+        Pipeline().add('a', lambda results: ValueStep('a'), artifact=(filepath, json.dumps))
+
+
+def test_exceptions_are_raised():
+    class FailingStep(Step):
+        def execute(self):
+            raise RuntimeError('Step exception')
+
+    pipeline = Pipeline()
+    pipeline.add('a', lambda results: FailingStep())
+
+    with pytest.raises(RuntimeError, match='Step exception'):
+        pipeline.run()
+
+
+def test_steps_must_be_added_after_their_dependencies():
+    pipeline = Pipeline()
+    pipeline.add('a', lambda results: ValueStep('a'))
+
+    with pytest.raises(ValueError):
+        pipeline.add('a', lambda results: ValueStep('a'))
+
+    with pytest.raises(ValueError):
+        pipeline.add('b', lambda results: ValueStep('b'), depends_on=['c'])
+
+
+def test_async_step_can_be_run_synchronously():
+    step_result = run_step(AsyncValueStep('value'))
+    assert step_result.get_result() == 'value'
@@ -0,0 +1,75 @@
+import argparse
+
+from caia.core.command import Command, CommandResult
+from caia.core.scheduler import ScheduledCommand, Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+class RecordingCommand(Command):
+    def __init__(self, name, runs, clock, duration=0.0, exception=None):
+        self.name = name
+        self.runs = runs
+        self.clock = clock
+        self.duration = duration
+        self.exception = exception
+
+    def __call__(self, start_time, args):
+        self.runs.append((self.name, self.clock.time))
+        self.clock.time = self.clock.time + self.duration
+        if self.exception is not None:
+            raise self.exception
+        return CommandResult(True, [])
+
+
+def test_commands_are_run_at_their_intervals():
+    runs = []
+    clock = FakeClock()
+    scheduler = Scheduler([
+        ScheduledCommand('a', RecordingCommand('a', runs, clock), 10),
+        ScheduledCommand('b', RecordingCommand('b', runs, clock), 25),
+    ], clock)
+
+    # The scheduler waits for the next run, so the clock is advanced
+    scheduler.stop_event.wait = lambda timeout: setattr(clock, 'time', clock.time + timeout) or False
+
+    assert scheduler.run(argparse.Namespace(), max_runs=6) == 6
+    assert runs == [('a', 0), ('b', 0), ('a', 10), ('a', 20), ('b', 25), ('a', 30)]
+
+
+def test_missed_runs_are_skipped():
+    runs = []
+    clock = FakeClock()
+    scheduled_command = ScheduledCommand('a', RecordingCommand('a', runs, clock, duration=25), 10)
+    scheduler = Scheduler([scheduled_command], clock)
+    scheduler.stop_event.wait = lambda timeout: setattr(clock, 'time', clock.time + timeout) or False
+
+    scheduler.run(argparse.Namespace(), max_runs=3)
+    assert runs == [('a', 0), ('a', 30), ('a', 60)]
+
+
+def test_failed_runs_do_not_stop_the_scheduler():
+    runs = []
+    clock = FakeClock()
+    scheduled_command = ScheduledCommand('a', RecordingCommand('a', runs, clock, exception=RuntimeError('Failed')), 1)
+    scheduler = Scheduler([scheduled_command], clock)
+    scheduler.stop_event.wait = lambda timeout: setattr(clock, 'time', clock.time + timeout) or False
+
+    assert scheduler.run(argparse.Namespace(), max_runs=2) == 2
+    assert not scheduled_command.last_result.was_successful()
+
+
+def test_stop():
+    runs = []
+    clock = FakeClock()
+    scheduler = Scheduler([ScheduledCommand('a', RecordingCommand('a', runs, clock), 1)], clock)
+    scheduler.stop()
+
+    assert scheduler.run(argparse.Namespace()) == 0
+    assert runs == []
@@ -254,6 +254,54 @@ def test_dest_returns_404_error(mock_server):
         os.remove(temp_success_filename)
 
 
+def test_parallel_sends_dest_returns_404_error_for_new_items(mock_server):
+    with open("tests/resources/items/valid_src_response.json") as file:
+        valid_src_response = file.read()
+
+    with open("tests/resources/items/valid_dest_updated_items_response.json") as file:
+        valid_dest_updated_items_response = file.read()
+
+    # Set up mock server with required behavior
+    imposter = Imposter([
+        Stub(Predicate(path="/src"), Response(body=valid_src_response)),
+        Stub(Predicate(path="/dest/new", method="POST"), Response(status_code=404)),
+        Stub(Predicate(path="/dest/updated", method="POST"), Response(body=valid_dest_updated_items_response)),
+        ])
+
+    # Create a temporary file to use as last success lookup
+    try:
+        [temp_file_handle, temp_success_filename] = tempfile.mkstemp()
+        with open(temp_success_filename, 'w') as f:
+            f.write('etc/items_FIRST.json')
+
+        with tempfile.TemporaryDirectory() as temp_storage_dir, mock_server(imposter) as server:
+            setup_environment(imposter, temp_storage_dir, temp_success_filename)
+            os.environ["ITEMS_PARALLEL_SENDS"] = 'true'
+
+            start_time = '20200521132905'
+            args = []
+
+            command = Command()
+            result = command(start_time, args)
+            assert result.was_successful() is False
+            assert 1 == len(result.get_errors())
+            assert "dest/new" in result.get_errors()[0]
+
+            # The updated items are sent concurrently with the new items
+            assert 3 == len(server.get_actual_requests()[imposter.port])
+            assert_that(server, had_request().with_path("/dest/new").and_method("POST"))
+            assert_that(server, had_request().with_path("/dest/updated").and_method("POST"))
+
+            # The last success is not updated
+            with open(temp_success_filename) as f:
+                assert f.read() == 'etc/items_FIRST.json'
+    finally:
+        os.environ.pop("ITEMS_PARALLEL_SENDS", None)
+        # Clean up the temporary file
+        os.close(temp_file_handle)
+        os.remove(temp_success_filename)
+
+
 def test_dest_returns_unparseable_json_response_for_new_items(mock_server):
     with open("tests/resources/items/valid_src_response.json") as file:
         valid_src_response = file.read()
@@ -1,10 +1,13 @@
 import os
 import tempfile
 
+import requests
+
 from hamcrest import assert_that, has_entries
 from mbtest.imposters import Imposter, Predicate, Response, Stub
 from mbtest.matchers import had_request
 
+import caia.items.steps.query_source_url
 from caia.commands.items import Command
 
 
@@ -64,3 +67,125 @@ def test_successful_job(mock_server):
         # Clean up the temporary file
         os.close(temp_file_handle)
         os.remove(temp_success_filename)
+
+
+def test_successful_job_with_prefetch(mock_server):
+    with open("tests/resources/items/valid_src_iteration_0_response.json") as file:
+        valid_src_iteration_0_response = file.read()
+
+    with open("tests/resources/items/valid_src_iteration_1_response.json") as file:
+        valid_src_iteration_1_response = file.read()
+
+    with open("tests/resources/items/valid_dest_new_items_response.json") as file:
+        valid_dest_new_items_response = file.read()
+
+    with open("tests/resources/items/valid_dest_updated_items_response.json") as file:
+        valid_dest_updated_items_response = file.read()
+
+    # Set up mock server with required behavior
+    imposter = Imposter([
+        Stub(Predicate(path="/src", query={"nextitem": "003375441000010"}),
+             Response(body=valid_src_iteration_1_response)),
+        Stub(Predicate(path="/src",), Response(body=valid_src_iteration_0_response)),
+        Stub(Predicate(path="/dest/new", method="POST"), Response(body=valid_dest_new_items_response)),
+        Stub(Predicate(path="/dest/updated", method="POST"), Response(body=valid_dest_updated_items_response)),
+        ])
+
+    # Create a temporary file to use as last success lookup
+    try:
+        [temp_file_handle, temp_success_filename] = tempfile.mkstemp()
+        with open(temp_success_filename, 'w') as f:
+            f.write('etc/items_FIRST.json')
+
+        with tempfile.TemporaryDirectory() as temp_storage_dir, mock_server(imposter) as server:
+            setup_environment(imposter, temp_storage_dir, temp_success_filename)
+            os.environ["ITEMS_PREFETCH"] = 'true'
+
+            start_time = '20200521132905'
+            args = []
+
+            command = Command()
+            result = command(start_time, args)
+            assert result.was_successful() is True
+
+            assert_that(server, had_request().with_path("/src").with_method("GET").with_query(
+                has_entries({'nextitem': '003375441000010'})).with_times(1))
+            assert_that(server, had_request().with_path("/src").and_method("GET").with_times(2))
+            assert_that(server, had_request().with_path("/dest/new").and_method("POST").with_times(2))
+            assert_that(server, had_request().with_path("/dest/updated").and_method("POST").with_times(2))
+
+            with open(temp_success_filename) as f:
+                assert f.readline().strip().endswith('-2.source_response_body.json')
+    finally:
+        # Clean up the temporary file
+        os.close(temp_file_handle)
+        os.remove(temp_success_filename)
+        os.environ.pop("ITEMS_PREFETCH", None)
+
+
+def test_successful_job_with_failed_prefetch(mock_server, monkeypatch):
+    with open("tests/resources/items/valid_src_iteration_0_response.json") as file:
+        valid_src_iteration_0_response = file.read()
+
+    with open("tests/resources/items/valid_src_iteration_1_response.json") as file:
+        valid_src_iteration_1_response = file.read()
+
+    with open("tests/resources/items/valid_dest_new_items_response.json") as file:
+        valid_dest_new_items_response = file.read()
+
+    with open("tests/resources/items/valid_dest_updated_items_response.json") as file:
+        valid_dest_updated_items_response = file.read()
+
+    # Set up mock server with required behavior
+    imposter = Imposter([
+        Stub(Predicate(path="/src", query={"nextitem": "003375441000010"}),
+             Response(body=valid_src_iteration_1_response)),
+        Stub(Predicate(path="/src",), Response(body=valid_src_iteration_0_response)),
+        Stub(Predicate(path="/dest/new", method="POST"), Response(body=valid_dest_new_items_response)),
+        Stub(Predicate(path="/dest/updated", method="POST"), Response(body=valid_dest_updated_items_response)),
+        ])
+
+    # The first query for the next item (the prefetch) fails with a network
+    # error
+    http_get_request = caia.items.steps.query_source_url.http_get_request
+    failed_queries = []
+
+    def failing_http_get_request(url, headers, query_params=None, *args, **kwargs):
+        if query_params.get('nextitem') and not failed_queries:
+            failed_queries.append(query_params)
+            raise requests.exceptions.ConnectionError("Connection refused")
+        return http_get_request(url, headers, query_params, *args, **kwargs)
+
+    monkeypatch.setattr(caia.items.steps.query_source_url, 'http_get_request', failing_http_get_request)
+
+    # Create a temporary file to use as last success lookup
+    try:
+        [temp_file_handle, temp_success_filename] = tempfile.mkstemp()
+        with open(temp_success_filename, 'w') as f:
+            f.write('etc/items_FIRST.json')
+
+        with tempfile.TemporaryDirectory() as temp_storage_dir, mock_server(imposter) as server:
+            setup_environment(imposter, temp_storage_dir, temp_success_filename)
+            os.environ["ITEMS_PREFETCH"] = 'true'
+
+            start_time = '20200521132905'
+            args = []
+
+            command = Command()
+            result = command(start_time, args)
+            assert result.was_successful() is True
+            assert len(failed_queries) == 1
+
+            # The first page is sent, and the second page is queried again
+            assert_that(server, had_request().with_path("/src").with_method("GET").with_query(
+                has_entries({'nextitem': '003375441000010'})).with_times(1))
+            assert_that(server, had_request().with_path("/dest/new").and_method("POST").with_times(2))
+            assert_that(server, had_request().with_path("/dest/updated").and_method("POST").with_times(2))
+
+            with open(temp_success_filename) as f:
+                assert f.readline().strip().endswith('-2.source_response_body.json')
+    finally:
+        # Clean up the temporary file
+        os.close(temp_file_handle)
+        os.remove(temp_success_filename)
+        os.environ.pop("ITEMS_PREFETCH", None)
@@ -1,5 +1,9 @@
+import os
+import tempfile
+
 import pytest
 
+from caia.core.last_success import record_last_success
 from caia.items.items_job_config import ItemsJobConfig
 from caia.items.steps.get_last_timestamp import GetLastTimestamp
 
@@ -53,3 +57,17 @@ def test_get_last_timestamp_bad_file():
 
     with pytest.raises(FileNotFoundError):
         get_last_timestamp.execute()
+
+
+def test_get_last_timestamp_from_last_success_lookup():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        last_success_lookup = os.path.join(temp_dir, 'items_last_success.txt')
+        record_last_success(last_success_lookup, 'tests/resources/items/non_existent_response.json',
+                            {'endtime': '202010011200'})
+
+        job_config = ItemsJobConfig({'storage_dir': temp_dir, 'last_success_lookup': last_success_lookup}, 'test')
+
+        # The source response of the last success is not read
+        step_result = GetLastTimestamp(job_config).execute()
+        assert step_result.was_successful() is True
+        assert step_result.get_result() == '202010011200'
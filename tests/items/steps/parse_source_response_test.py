@@ -1,3 +1,6 @@
+import os
+
+from caia.core.http import ResponseFile
 from caia.items.steps.parse_source_response import ParseSourceResponse
 
 
@@ -13,3 +16,16 @@ def test_parse_source_response_with_valid_response():
     source_items = step_result.get_result()
     assert 2 == len(source_items.get_new_items())
     assert 2 == len(source_items.get_updated_items())
+
+
+def test_parse_source_response_with_response_file():
+    source_response_file = 'tests/resources/items/valid_src_response.json'
+    response_file = ResponseFile(source_response_file, 200, {}, os.path.getsize(source_response_file))
+
+    parse_source_response = ParseSourceResponse(response_file)
+    step_result = parse_source_response.execute()
+    assert step_result.was_successful() is True
+
+    source_items = step_result.get_result()
+    assert 2 == len(source_items.get_new_items())
+    assert 2 == len(source_items.get_updated_items())
@@ -1,3 +1,5 @@
+import socket
+
 import pytest
 import requests
 from hamcrest import assert_that
@@ -5,7 +7,7 @@ from mbtest.imposters import Imposter, Predicate, Response, Stub
 from mbtest.matchers import had_request
 
 from caia.items.items_job_config import ItemsJobConfig
-from caia.items.steps.query_source_url import QuerySourceUrl
+from caia.items.steps.query_source_url import PrefetchSourceUrl, QuerySourceUrl
 
 
 def test_valid_response_from_server(mock_server):
@@ -83,3 +85,32 @@ def test_server_does_not_exist():
 
     with pytest.raises(requests.exceptions.ConnectionError):
         query_source_url.execute()
+
+
+def test_prefetch_returns_failed_step_result_on_exception(tmp_path):
+    # A port with nothing listening on it, so the connection is refused
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    storage_dir = tmp_path / 'storage'
+    storage_dir.mkdir()
+    config = {
+        'source_url': f"http://127.0.0.1:{port}/items",
+        'storage_dir': str(storage_dir),
+        'last_success_lookup': str(tmp_path / 'items_last_success.txt'),
+        'source_retry_max_attempts': '1'
+    }
+    job_config = ItemsJobConfig(config, 'test')
+    output_filepath = str(storage_dir / 'prefetch.json')
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        QuerySourceUrl(job_config, "20200601", "20200603", "003375441000010", stream_to_file=True,
+                       output_filepath=output_filepath).execute()
+
+    step_result = PrefetchSourceUrl(job_config, "20200601", "20200603", "003375441000010", stream_to_file=True,
+                                    output_filepath=output_filepath).execute()
+
+    assert step_result.was_successful() is False
+    assert "003375441000010" in step_result.get_errors()[0]
+    assert list(storage_dir.iterdir()) == []